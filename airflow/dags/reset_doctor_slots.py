@@ -1,32 +1,82 @@
-from airflow import DAG
-from airflow.operators.python import PythonOperator
+import os
+import logging
 from datetime import datetime, timedelta
+
 import requests
-import logging
+from airflow.decorators import dag, task
+from airflow.operators.python import get_current_context
 
-def reset_slots():
-    url = "http://backend-service:8000/api/doctor/slots/reset"
-    try:
-        response = requests.post(url)
-        logging.info(f"Reset response: {response.status_code} | {response.text}")
-    except Exception as e:
-        logging.error(f"❌ Failed to reset doctor slots: {e}")
+# ---------------------------------------------------------------------
+# 🧩 CONFIGURATION
+# ---------------------------------------------------------------------
+RESET_URL = os.getenv("SLOT_RESET_URL", "http://backend-service:8000/api/doctor/slots/reset")
+# Doctors are split by id % SLOT_RESET_SHARDS; keep it stable within a day
+# so reruns hit the same shard records
+SLOT_RESET_SHARDS = int(os.getenv("SLOT_RESET_SHARDS", 8))
+SLOT_RESET_PARALLELISM = int(os.getenv("SLOT_RESET_PARALLELISM", 4))
+SLOT_RESET_TIMEOUT = int(os.getenv("SLOT_RESET_TIMEOUT", 600))
 
 default_args = {
     'owner': 'airflow',
-    'retries': 1,
-    'retry_delay': timedelta(minutes=5),
+    'retries': 3,
+    'retry_delay': timedelta(minutes=1),
+    'retry_exponential_backoff': True,
+    'max_retry_delay': timedelta(minutes=10),
 }
 
-with DAG(
+
+@dag(
     dag_id='daily_doctor_slot_reset',
     default_args=default_args,
     start_date=datetime(2025, 11, 1),
     schedule_interval='0 14 * * *',  # Every day at 2 PM
     catchup=False,
     tags=['healthcare', 'automation'],
-) as dag:
-    reset_task = PythonOperator(
-        task_id='reset_doctor_slots',
-        python_callable=reset_slots
-    )
+)
+def daily_doctor_slot_reset():
+
+    @task
+    def plan_shards():
+        return list(range(SLOT_RESET_SHARDS))
+
+    @task(max_active_tis_per_dagrun=SLOT_RESET_PARALLELISM)
+    def reset_shard(shard: int):
+        # The run executes at the end of its data interval; that day is the
+        # one being opened and the key that makes retries idempotent
+        run_date = get_current_context()["data_interval_end"].strftime("%Y-%m-%d")
+        params = {"shard": shard, "shards": SLOT_RESET_SHARDS, "run_date": run_date}
+
+        response = requests.post(RESET_URL, params=params, timeout=SLOT_RESET_TIMEOUT)
+        logging.info(f"Reset response (shard {shard}/{SLOT_RESET_SHARDS}): {response.status_code} | {response.text}")
+        # Let failures fail the mapped task so only this shard is retried
+        response.raise_for_status()
+
+        stats = response.json()
+        if stats.get("skipped"):
+            logging.info(f"⏭️ Shard {shard} was already reset for {run_date}")
+        else:
+            logging.info(
+                f"✅ Shard {shard}: reset {stats.get('doctors')} doctors in {stats.get('duration_ms')} ms | "
+                f"{stats.get('slots_opened')} slots opened, {stats.get('slots_deleted')} cleared"
+            )
+        return {"shard": shard, **stats}
+
+    @task(trigger_rule="all_done")
+    def summarize(results):
+        results = [r for r in results if r]
+        doctors = sum(r.get("doctors", 0) for r in results)
+        opened = sum(r.get("slots_opened", 0) for r in results)
+        slowest = max((r.get("duration_ms", 0) for r in results), default=0)
+        logging.info(
+            f"📊 Slot reset: {len(results)}/{SLOT_RESET_SHARDS} shards done | {doctors} doctors | "
+            f"{opened} slots opened | slowest shard {slowest} ms"
+        )
+        missing = sorted(set(range(SLOT_RESET_SHARDS)) - {r["shard"] for r in results})
+        if missing:
+            raise RuntimeError(f"Slot reset shards failed: {missing}")
+        return {"shards": len(results), "doctors": doctors, "slots_opened": opened, "slowest_shard_ms": slowest}
+
+    summarize(reset_shard.expand(shard=plan_shards()))
+
+
+daily_doctor_slot_reset()
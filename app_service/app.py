@@ -3,21 +3,36 @@ import json
 import logging
 from datetime import datetime, date
 import requests
-from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import distinct
 import redis
-import pika
 from typing import List
-from jose import jwt, JWTError
-from auth_utils import verify_token_remote 
+from jose import jwt, JWTError, ExpiredSignatureError
+from auth_utils import verify_token, revocation_cache, claims_cache
 from pydantic import BaseModel
 
-from database import SessionLocal, engine
-from models import Base, Doctor, Patient, Appointment
+from database import SessionLocal, ReadSessionLocal, engine, pool_stats, replicas
+from models import Doctor, Patient
+from events import record_appointment_created
+import slots as slot_engine
+import slot_inventory
+import slot_reset
+import response_cache
+import query_budget
+import doctor_search
+import doctor_directory
+from mediqueue_common import logging_setup
+import metrics
+from mediqueue_common import tracing
 
 from fastapi.middleware.cors import CORSMiddleware
 
+# "sync" serves every route from the threadpool; "async" swaps in the
+# async def handlers from async_routes.py for the hot read/booking paths.
+APP_EXECUTION_MODE = os.getenv("APP_EXECUTION_MODE", "sync").lower()
+
 REDIS_HOST = os.getenv("REDIS_HOST", "redis-service")
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq-service")
 AUTH_BASE_URL = os.getenv("AUTH_BASE_URL", "http://auth-service:8001")
@@ -31,14 +46,8 @@ ALGORITHM = "HS256"
 # ---------------------------------------------------------------------
 # 🧩 LOGGING CONFIGURATION
 # ---------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),  # logs to file
-        logging.StreamHandler()          # logs to console
-    ]
-)
+logging_setup.configure("app_service", "app.log")
+tracing.configure("app_service")
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Healthcare Appointment Service",root_path="/api")
@@ -58,7 +67,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Offset", "X-Next-Cursor", "X-Request-ID"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+# Outermost, so the access record covers everything below it
+app.add_middleware(logging_setup.RequestLogMiddleware)
 
 
 # ---------------------------------------------------------------------
@@ -76,10 +90,14 @@ def get_current_user(Authorization: str = Header(None)):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
 # ---------------------------------------------------------------------
-# 🧩 DATABASE INITIALIZATION
+# 🧩 SLOT INVENTORY BACKFILL
 # ---------------------------------------------------------------------
-Base.metadata.create_all(bind=engine)
-logger.info("✅ Database tables created successfully")
+# The schema itself is managed by Alembic (alembic upgrade head, run as a
+# separate step before the services start; see migrations/).
+with SessionLocal() as _db:
+    _backfilled = slot_engine.backfill_slots(_db)
+    if _backfilled:
+        logger.info(f"✅ Opened slot inventory for {_backfilled} doctors without slot rows")
 
 # ---------------------------------------------------------------------
 # 🧩 REDIS SETUP
@@ -92,6 +110,32 @@ try:
 except Exception as e:
     logger.error(f"❌ Redis connection failed: {e}")
 
+# ---------------------------------------------------------------------
+# 🧩 TOKEN REVOCATION SYNC
+# ---------------------------------------------------------------------
+@app.on_event("startup")
+def start_revocation_sync():
+    # Needed in both verify modes: local checks the mirror directly and
+    # remote relies on it to evict revoked tokens from the claims cache.
+    revocation_cache.start()
+
+# ---------------------------------------------------------------------
+# 🧩 SLOT INVENTORY (Redis mirror of doctor_slots, optional)
+# ---------------------------------------------------------------------
+@app.on_event("startup")
+def reconcile_slot_inventory():
+    if slot_inventory.enabled():
+        with SessionLocal() as db:
+            slot_inventory.reconcile(db)
+    response_cache.invalidate()
+
+# ---------------------------------------------------------------------
+# 🧩 READ REPLICAS
+# ---------------------------------------------------------------------
+@app.on_event("startup")
+def start_replica_checks():
+    replicas.start()
+
 # ---------------------------------------------------------------------
 # 🧩 HELPER FUNCTIONS
 # ---------------------------------------------------------------------
@@ -102,25 +146,24 @@ def get_db():
     finally:
         db.close()
 
-
-def get_rabbit_connection():
+def get_read_db():
+    db = ReadSessionLocal()
     try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=os.getenv("RABBITMQ_HOST", "rabbitmq"))
-        )
-        channel = connection.channel()
-        channel.exchange_declare(exchange="appointments", exchange_type="topic", durable=True)
-        logger.info("✅ Connected to RabbitMQ and exchange declared")
-        return connection, channel
-    except Exception as e:
-        logger.error(f"❌ Failed to connect to RabbitMQ: {e}")
-        raise HTTPException(status_code=500, detail="Failed to connect to RabbitMQ")
+        yield db
+    finally:
+        db.close()
 
 
 # ---------------------------------------------------------------------
 # 🧩 ROUTES
 # ---------------------------------------------------------------------
 
+# Registered first so they take precedence over the sync handlers below
+if APP_EXECUTION_MODE == "async":
+    import async_routes
+    app.include_router(async_routes.router)
+    logger.info("⚡ Async execution mode enabled for /book, /doctors, /doctor/search, /patient")
+
 @app.get("/")
 def home():
     logger.info("🌐 Home endpoint called")
@@ -129,54 +172,66 @@ def home():
 
 
 @app.get("/doctors")
-def get_all_doctors(db: Session = Depends(get_db)):
-    logger.info("📥 GET /doctors called")
-    doctors = db.query(Doctor).all()
-    logger.info(f"Fetched {len(doctors)} doctors from database")
-    return [
-        {
-            "id": d.id,
-            "name": d.name,
-            "specialization": d.specialization,
-            "available_slots": d.available_slots,
-            "booked_slots": d.booked_slots,
-            "daily_limit": d.daily_limit
-        }
-        for d in doctors
-    ]
+def get_all_doctors(
+    limit: int = Query(None, ge=1, le=doctor_directory.DIRECTORY_MAX_PAGE),
+    after_id: int = Query(None, ge=0),
+    fields: str = None,
+    stream: bool = False,
+    # Primary, not a replica: the page is cached until the next invalidate(),
+    # so a lagging read would keep a just-booked slot free for the whole TTL
+    db: Session = Depends(get_db),
+    if_none_match: str = Header(None)
+):
+    logger.info(f"📥 GET /doctors called | limit={limit}, after_id={after_id}, fields={fields}, stream={stream}")
+    try:
+        selected = doctor_directory.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        return StreamingResponse(doctor_directory.stream(replicas.read_engine(), selected, after_id), media_type="application/json")
+
+    def build():
+        payload, headers = doctor_directory.page(db, selected, after_id, limit)
+        logger.info(f"Fetched {len(payload)} doctors from database")
+        return payload, headers
+
+    name = doctor_directory.cache_name(limit, after_id, selected)
+    body, etag, headers = response_cache.get_or_build_with_headers(name, build)
+    return response_cache.json_response(body, etag, if_none_match, headers)
 
 
+# Cached like /doctors, so also built from the primary
 @app.get("/doctor/specializations")
-def get_specializations(db: Session = Depends(get_db)):
+def get_specializations(db: Session = Depends(get_db), if_none_match: str = Header(None)):
     logger.info("📥 GET /doctor/specializations called")
-    specializations = db.query(distinct(Doctor.specialization)).all()
-    logger.info(f"Fetched {len(specializations)} specializations from database")
-    return [s[0] for s in specializations if s[0]]
+
+    def build():
+        specializations = db.query(distinct(Doctor.specialization)).all()
+        logger.info(f"Fetched {len(specializations)} specializations from database")
+        return [s[0] for s in specializations if s[0]]
+
+    body, etag = response_cache.get_or_build("specializations", build)
+    return response_cache.json_response(body, etag, if_none_match)
 
 
 @app.get("/doctor/search")
-def search_doctor(specialization: str = None, name: str = None, db: Session = Depends(get_db)):
-    query = db.query(Doctor)
-    if specialization:
-        query = query.filter(Doctor.specialization.ilike(f"%{specialization}%"))
-    if name:
-        query = query.filter(Doctor.name.ilike(f"%{name}%"))
-    doctors = query.all()
+def search_doctor(
+    response: Response,
+    specialization: str = None,
+    name: str = None,
+    limit: int = Query(doctor_search.DOCTOR_SEARCH_DEFAULT_LIMIT, ge=1, le=doctor_search.DOCTOR_SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    doctors, has_more = doctor_search.search(db, name, specialization, limit, offset)
 
     if not doctors:
         raise HTTPException(status_code=404, detail="No matching doctors found")
 
-    return [
-        {
-            "id": d.id,
-            "name": d.name,
-            "specialization": d.specialization,
-            "available_slots": d.available_slots or [],
-            "booked_slots": d.booked_slots,
-            "daily_limit": d.daily_limit
-        }
-        for d in doctors
-    ]
+    if has_more:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return slot_engine.doctor_summaries(db, doctors)
 
 
 
@@ -189,14 +244,16 @@ def register_patient(
     db: Session = Depends(get_db)
 ):
     logger.info(f"🧾 Register patient endpoint called | name={name}, email={email}")
-    logger.info(f"🪪 Raw Authorization header received: {Authorization}")
 
     # ✅ Verify JWT
     try:
-        payload = verify_token_remote(Authorization)
+        payload = verify_token(Authorization)
         user_id = payload.get("sub")
         role = payload.get("role")
         logger.info(f"🔑 Token verified for user_id={user_id}, role={role}")
+    except HTTPException:
+        # e.g. 503 when revocation state is unavailable
+        raise
     except Exception as e:
         logger.error(f"❌ Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -230,14 +287,16 @@ def book(
 ):
     formatted_time = time
     logger.info(f"🩺 Booking request | doctor_id={doctor_id}, time={formatted_time}")
-    logger.info(f"🪪 Raw Authorization header received: {Authorization}")
 
     # ✅ Verify JWT
     try:
-        payload = verify_token_remote(Authorization)
+        with metrics.book_stage("auth"):
+            payload = verify_token(Authorization)
         user_id = payload.get("sub")
         role = payload.get("role")
         logger.info(f"🔑 Token verified for user_id={user_id}, role={role}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -246,80 +305,74 @@ def book(
         logger.warning(f"🚫 Unauthorized booking attempt by role={role}")
         raise HTTPException(status_code=403, detail="Only patients can book appointments")
 
-    # ✅ Find patient by user_id
-    patient = db.query(Patient).filter(Patient.user_id == user_id).first()
-    if not patient:
-        logger.warning(f"⚠️ Patient not found in DB for user_id={user_id}")
-        raise HTTPException(status_code=404, detail="Patient record not found")
-  
-    key = f"lock:doctor:{doctor_id}:{formatted_time}"
-    if not r.set(key, "locked", nx=True, ex=60):
-        logger.warning(f"⚠️ Lock acquisition failed for {key} — another booking in progress")
-        raise HTTPException(status_code=400, detail="Slot already being booked. Try another time.")
-    logger.info(f"✅ Redis lock acquired for {key}")
-
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
-    if not doctor:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-
-    # ✅ Check slot availability
-    available_slots = doctor.available_slots or []
-    if formatted_time not in available_slots:
-        logger.warning(f"❌ Slot {formatted_time} not available for doctor {doctor_id}")
+    # ✅ Fast path: claim the slot in Redis so losers never reach Postgres
+    with metrics.book_stage("inventory_claim"):
+        claimed = slot_inventory.claim(doctor_id, formatted_time) if slot_inventory.enabled() else slot_inventory.UNKNOWN
+    if claimed == slot_inventory.TAKEN:
+        logger.warning(f"❌ Slot {formatted_time} not available for doctor {doctor_id} (inventory)")
         raise HTTPException(status_code=400, detail=f"Slot {formatted_time} not available")
 
-    # ✅ Create appointment
-    full_time = datetime.combine(date.today(), datetime.strptime(time, "%H:%M").time())
-    new_appointment = Appointment(doctor_id=doctor_id, patient_id=patient.id, time=full_time)
-    db.add(new_appointment)
-
-    updated_slots = [slot for slot in doctor.available_slots if slot != formatted_time]
-    doctor.available_slots = updated_slots
-    doctor.booked_slots += 1
-    db.commit()
-    db.refresh(new_appointment)
-    logger.info(f"✅ Appointment created successfully | appointment_id={new_appointment.id}")
-
-    # 📨 Publish to RabbitMQ
+    db_rejected = False
     try:
-        connection, channel = get_rabbit_connection()
-        message = {
-            "appointment_id": new_appointment.id,
-            "doctor_id": doctor_id,
-            "patient_id": patient.id,
-            "time": formatted_time
-        }
-        channel.basic_publish(
-            exchange="appointments",
-            routing_key="appointment.created",
-            body=json.dumps(message),
-            properties=pika.BasicProperties(delivery_mode=2),
-        )
-        logger.info(f"📤 Message published to RabbitMQ: {message}")
-        connection.close()
-    except Exception as e:
-        logger.error(f"❌ RabbitMQ publish failed: {e}")
-        return {"status": "Booked, but RabbitMQ publish failed", "error": str(e)}
-
-    return {"message": "Appointment booked successfully", "appointment_id": new_appointment.id}
+        full_time = datetime.combine(date.today(), datetime.strptime(time, "%H:%M").time())
+        with query_budget.track("/book", slot_engine.booking_round_trip_budget(db)):
+            # ✅ Claim the slot and insert the appointment (one statement on Postgres)
+            with metrics.book_stage("book"):
+                booked = slot_engine.book_slot(db, doctor_id, formatted_time, user_id, full_time)
+            if booked is None:
+                # Checked before the ROLLBACK, so closing the session costs no extra round trip
+                patient_exists, doctor_exists = db.execute(
+                    slot_engine.booking_failure_statement(doctor_id, user_id)
+                ).one()
+                db.rollback()
+                if not patient_exists:
+                    logger.warning(f"⚠️ Patient not found in DB for user_id={user_id}")
+                    raise HTTPException(status_code=404, detail="Patient record not found")
+                db_rejected = True
+                if not doctor_exists:
+                    raise HTTPException(status_code=404, detail="Doctor not found")
+                logger.warning(f"❌ Slot {formatted_time} not available for doctor {doctor_id}")
+                raise HTTPException(status_code=400, detail=f"Slot {formatted_time} not available")
+            appointment_id, patient_id = booked
+
+            # 📨 Event goes to the outbox in the same transaction; outbox_relay.py publishes it
+            with metrics.book_stage("commit"):
+                record_appointment_created(db, {
+                    "appointment_id": appointment_id,
+                    "doctor_id": doctor_id,
+                    "patient_id": patient_id,
+                    "time": formatted_time
+                })
+                db.commit()
+    except Exception:
+        # Hand the slot back unless the DB says it was really taken
+        if claimed == slot_inventory.CLAIMED and not db_rejected:
+            slot_inventory.release(doctor_id, formatted_time)
+        raise
+    with metrics.book_stage("invalidate"):
+        response_cache.invalidate()
+    logger.info(f"✅ Appointment created successfully | appointment_id={appointment_id}")
+
+    return {"message": "Appointment booked successfully", "appointment_id": appointment_id}
 
 
 @app.get("/patient")
 def get_patient(
     Authorization: str = Header(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Fetch logged-in patient’s details by token.
     """
     logger.info("📥 GET /patient called")
-    logger.info(f"🪪 Raw Authorization header received: {Authorization}")
 
     try:
-        payload = verify_token_remote(Authorization)
+        payload = verify_token(Authorization)
         user_id = payload.get("sub")
         role = payload.get("role")
         logger.info(f"🔑 Token verified for user_id={user_id}, role={role}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -329,6 +382,10 @@ def get_patient(
         raise HTTPException(status_code=403, detail="Only patients can access this endpoint")
 
     patient = db.query(Patient).filter(Patient.user_id == user_id).first()
+    if not patient and db.get_bind() is not engine:
+        # A patient who just registered may not have reached the replica yet
+        with SessionLocal() as primary:
+            patient = primary.query(Patient).filter(Patient.user_id == user_id).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
@@ -354,15 +411,16 @@ def update_doctor_slots(
     db: Session = Depends(get_db)
 ):
     logger.info("🧾 Received request to update doctor slots.")
-    logger.info(f"🪪 Raw Authorization header received: {Authorization}")
     logger.info(f"🪪  requested slots: {slots}")
 
     # ✅ Verify JWT
     try:
-        payload = verify_token_remote(Authorization)
+        payload = verify_token(Authorization)
         user_id = payload.get("sub")
         role = payload.get("role")
         logger.info(f"🔑 Token verified for user_id={user_id}, role={role}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -380,35 +438,78 @@ def update_doctor_slots(
     
     available_slots = slots.available_slots
 
-    # ✅ Update slots
+    # ✅ Update slots (booked slots stay booked)
     old_slots = doctor.available_slots
     doctor.available_slots = available_slots
+    slot_engine.replace_free_slots(db, doctor.id, available_slots)
+    doctor_id = doctor.id
     db.commit()
-    db.refresh(doctor)
+    free_slots = slot_engine.free_slot_times(db, doctor_id)
+    slot_inventory.sync_doctor(db, doctor_id)
+    response_cache.invalidate()
 
     logger.info(
         f"✅ Doctor slots updated successfully for user_id={user_id} | "
-        f"Old slots: {old_slots} → New slots: {doctor.available_slots}"
+        f"Old slots: {old_slots} → New slots: {free_slots}"
     )
 
     return {
         "message": "Doctor slots updated successfully",
-        "doctor_id": doctor.id,
-        "available_slots": doctor.available_slots
+        "doctor_id": doctor_id,
+        "available_slots": free_slots
     }
 
 @app.post("/doctor/slots/reset")
-def reset_doctor_slots(db: Session = Depends(get_db)):
-    logger.info("🕑 Running daily slot reset task...")
-
-    doctors = db.query(Doctor).all()
-    for doc in doctors:
-        doc.available_slots = ["09:00", "09:30", "10:00", "10:30", "11:00"]
-        doc.booked_slots = 0
-    db.commit()
+def reset_doctor_slots(
+    shard: int = Query(0, ge=0),
+    shards: int = Query(1, ge=1),
+    run_date: date = None,
+    force: bool = False,
+    db: Session = Depends(get_db)
+):
+    logger.info(f"🕑 Running daily slot reset task... | shard={shard}/{shards}, run_date={run_date}, force={force}")
 
-    logger.info(f"✅ Reset slots for {len(doctors)} doctors at {datetime.now()}")
-    return {"message": f"Reset slots for {len(doctors)} doctors"}
+    try:
+        stats, skipped = slot_reset.reset_shard(db, run_date, shard, shards, force)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except slot_reset.ResetInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if skipped:
+        return {"message": f"Shard {shard}/{shards} already reset", "skipped": True, **stats}
+
+    slot_inventory.reconcile(db, shard=shard, shards=shards)
+    response_cache.invalidate()
+
+    logger.info(f"✅ Reset slots for {stats['doctors']} doctors (shard {shard}/{shards}) in {stats['duration_ms']} ms")
+    return {"message": f"Reset slots for {stats['doctors']} doctors", "skipped": False, **stats}
+
+@app.get("/auth/cache/stats")
+def get_claims_cache_stats():
+    return claims_cache.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.metrics_response()
+
+@app.get("/metrics/db-pool")
+def get_db_pool_stats():
+    pools = {"sync": pool_stats(engine)}
+    for index, replica_engine in enumerate(replicas.engines):
+        pools[f"replica_{index}"] = pool_stats(replica_engine)
+    if APP_EXECUTION_MODE == "async":
+        from async_database import async_engine, async_replica_engines
+        pools["async"] = pool_stats(async_engine)
+        for index, replica_engine in enumerate(async_replica_engines):
+            pools[f"async_replica_{index}"] = pool_stats(replica_engine)
+    # Upper bound on Postgres connections this pod can open (primary and replicas)
+    pools["max_connections"] = sum(p.get("size", 0) + p.get("max_overflow", 0) for p in pools.values())
+    return pools
+
+@app.get("/metrics/db-replicas")
+def get_db_replica_stats():
+    return replicas.stats()
 
 @app.post("/logout")
 def logout(Authorization: str = Header(None)):
@@ -428,17 +529,20 @@ def logout(Authorization: str = Header(None)):
             logger.warning(f"⚠️ Token already expired for user_id={payload.get('sub')}")
             raise HTTPException(status_code=400, detail="Token already expired")
 
-        # Store token in Redis blacklist with same TTL
-        r.setex(f"blacklist:{token}", ttl, "true")
+        # Store token in Redis blacklist with same TTL and notify other replicas
+        revocation_cache.revoke(token, ttl)
 
         logger.info(f"🚪 User logged out | user_id={payload.get('sub')} | role={payload.get('role')} | token blacklisted for {ttl}s")
         return {"message": "Logged out successfully"}
 
+    except HTTPException:
+        raise
+
     except ExpiredSignatureError:
         logger.warning("⚠️ Logout failed — token already expired")
         raise HTTPException(status_code=400, detail="Token already expired")
 
-    except InvalidTokenError:
+    except JWTError:
         logger.error("❌ Logout failed — invalid token")
         raise HTTPException(status_code=401, detail="Invalid token")
 
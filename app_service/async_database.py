@@ -0,0 +1,39 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from database import DATABASE_URL, DB_REPLICA_URLS, engine_options, replicas
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a DB URL for its asyncio counterpart."""
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Same order as replicas.engines, so replicas.pick() indexes both
+async_replica_engines = [
+    create_async_engine(to_async_url(url), **engine_options(to_async_url(url), is_async=True))
+    for url in DB_REPLICA_URLS
+]
+
+
+def async_read_engine():
+    index = replicas.pick()
+    return async_engine if index is None else async_replica_engines[index]
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncSessionLocal(bind=async_read_engine()) as db:
+        yield db
@@ -0,0 +1,200 @@
+import logging
+from datetime import datetime, date
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from async_database import AsyncSessionLocal, get_async_db, get_async_read_db, async_engine, async_read_engine
+from auth_utils import verify_token_async
+from events import record_appointment_created
+from models import Doctor, Patient
+import slots as slot_engine
+import slot_inventory
+import response_cache
+import query_budget
+import doctor_search
+import doctor_directory
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 ASYNC ROUTES (enabled with APP_EXECUTION_MODE=async)
+# ---------------------------------------------------------------------
+router = APIRouter()
+
+
+async def _verify(Authorization: str):
+    try:
+        payload = await verify_token_async(Authorization)
+        # asyncpg does not coerce str parameters to integer columns
+        user_id = int(payload.get("sub"))
+        role = payload.get("role")
+        logger.info(f"🔑 Token verified for user_id={user_id}, role={role}")
+        return user_id, role
+    except HTTPException:
+        # e.g. 503 when revocation state is unavailable
+        raise
+    except Exception as e:
+        logger.error(f"❌ Token verification failed: {e}")
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+async def _doctor_summaries(db: AsyncSession, doctors):
+    if not doctors:
+        return []
+    rows = (await db.execute(slot_engine.summary_statement([d.id for d in doctors]))).all()
+    return slot_engine.serialize_doctors(doctors, slot_engine.summarize(rows))
+
+
+async def _book_slot(db: AsyncSession, doctor_id: int, slot_time: str, user_id: int, appointment_time):
+    if slot_engine.supports_single_statement_booking(db):
+        return (await db.execute(slot_engine.book_statement(doctor_id, slot_time, user_id, appointment_time))).first()
+    if (await db.execute(slot_engine.reserve_statement(doctor_id, slot_time))).scalar_one_or_none() is None:
+        return None
+    return (await db.execute(slot_engine.appointment_statement(literal(doctor_id), user_id, appointment_time))).first()
+
+
+@router.get("/doctors")
+async def get_all_doctors_async(
+    limit: int = Query(None, ge=1, le=doctor_directory.DIRECTORY_MAX_PAGE),
+    after_id: int = Query(None, ge=0),
+    fields: str = None,
+    stream: bool = False,
+    # Primary, not a replica: the page is cached until the next invalidate()
+    db: AsyncSession = Depends(get_async_db),
+    if_none_match: str = Header(None)
+):
+    logger.info(f"📥 GET /doctors called | limit={limit}, after_id={after_id}, fields={fields}, stream={stream}")
+    try:
+        selected = doctor_directory.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        return StreamingResponse(doctor_directory.stream_async(async_read_engine(), selected, after_id), media_type="application/json")
+
+    async def build():
+        payload, headers = await doctor_directory.page_async(db, selected, after_id, limit)
+        logger.info(f"Fetched {len(payload)} doctors from database")
+        return payload, headers
+
+    name = doctor_directory.cache_name(limit, after_id, selected)
+    body, etag, headers = await response_cache.get_or_build_with_headers_async(name, build)
+    return response_cache.json_response(body, etag, if_none_match, headers)
+
+
+@router.get("/doctor/search")
+async def search_doctor_async(
+    response: Response,
+    specialization: str = None,
+    name: str = None,
+    limit: int = Query(doctor_search.DOCTOR_SEARCH_DEFAULT_LIMIT, ge=1, le=doctor_search.DOCTOR_SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    doctors, has_more = await doctor_search.search_async(db, name, specialization, limit, offset)
+
+    if not doctors:
+        raise HTTPException(status_code=404, detail="No matching doctors found")
+
+    if has_more:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return await _doctor_summaries(db, doctors)
+
+
+@router.post("/book")
+async def book_async(
+    doctor_id: int,
+    time: str,
+    Authorization: str = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    formatted_time = time
+    logger.info(f"🩺 Booking request | doctor_id={doctor_id}, time={formatted_time}")
+
+    with metrics.book_stage("auth"):
+        user_id, role = await _verify(Authorization)
+    if role != "patient":
+        logger.warning(f"🚫 Unauthorized booking attempt by role={role}")
+        raise HTTPException(status_code=403, detail="Only patients can book appointments")
+
+    with metrics.book_stage("inventory_claim"):
+        claimed = await slot_inventory.claim_async(doctor_id, formatted_time) if slot_inventory.enabled() else slot_inventory.UNKNOWN
+    if claimed == slot_inventory.TAKEN:
+        logger.warning(f"❌ Slot {formatted_time} not available for doctor {doctor_id} (inventory)")
+        raise HTTPException(status_code=400, detail=f"Slot {formatted_time} not available")
+
+    db_rejected = False
+    try:
+        full_time = datetime.combine(date.today(), datetime.strptime(time, "%H:%M").time())
+        with query_budget.track("/book", slot_engine.booking_round_trip_budget(db)):
+            with metrics.book_stage("book"):
+                booked = await _book_slot(db, doctor_id, formatted_time, user_id, full_time)
+            if booked is None:
+                # Checked before the ROLLBACK, so closing the session costs no extra round trip
+                patient_exists, doctor_exists = (
+                    await db.execute(slot_engine.booking_failure_statement(doctor_id, user_id))
+                ).one()
+                await db.rollback()
+                if not patient_exists:
+                    logger.warning(f"⚠️ Patient not found in DB for user_id={user_id}")
+                    raise HTTPException(status_code=404, detail="Patient record not found")
+                db_rejected = True
+                if not doctor_exists:
+                    raise HTTPException(status_code=404, detail="Doctor not found")
+                logger.warning(f"❌ Slot {formatted_time} not available for doctor {doctor_id}")
+                raise HTTPException(status_code=400, detail=f"Slot {formatted_time} not available")
+            appointment_id, patient_id = booked
+
+            # 📨 Event goes to the outbox in the same transaction; outbox_relay.py publishes it
+            with metrics.book_stage("commit"):
+                record_appointment_created(db, {
+                    "appointment_id": appointment_id,
+                    "doctor_id": doctor_id,
+                    "patient_id": patient_id,
+                    "time": formatted_time
+                })
+                await db.commit()
+    except Exception:
+        if claimed == slot_inventory.CLAIMED and not db_rejected:
+            await slot_inventory.release_async(doctor_id, formatted_time)
+        raise
+    with metrics.book_stage("invalidate"):
+        await response_cache.invalidate_async()
+    logger.info(f"✅ Appointment created successfully | appointment_id={appointment_id}")
+
+    return {"message": "Appointment booked successfully", "appointment_id": appointment_id}
+
+
+@router.get("/patient")
+async def get_patient_async(
+    Authorization: str = Header(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Fetch logged-in patient’s details by token.
+    """
+    logger.info("📥 GET /patient called")
+
+    user_id, role = await _verify(Authorization)
+    if role != "patient":
+        logger.warning(f"🚫 Unauthorized role access: {role}")
+        raise HTTPException(status_code=403, detail="Only patients can access this endpoint")
+
+    patient = (await db.execute(select(Patient).where(Patient.user_id == user_id))).scalars().first()
+    if not patient and db.get_bind() is not async_engine.sync_engine:
+        # A patient who just registered may not have reached the replica yet
+        async with AsyncSessionLocal() as primary:
+            patient = (await primary.execute(select(Patient).where(Patient.user_id == user_id))).scalars().first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    logger.info(f"✅ Returning patient info for user_id={user_id}")
+    return {
+        "patient_id": patient.id,
+        "name": patient.name,
+        "email": patient.email,
+        "phone": patient.phone
+    }
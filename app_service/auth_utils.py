@@ -1,33 +1,58 @@
 import os, requests
+import httpx
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import time
+import redis
 from fastapi import Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from jose import jwt, JWTError
 import logging
-import logging
-import sys
-# ---------------------------------------------------------------------
-# 🧩 LOGGING CONFIGURATION
-# ---------------------------------------------------------------------
+import metrics
+from mediqueue_common import tracing
+from mediqueue_common import logging_setup
+
+# Handlers are installed by logging_setup.configure() in the service entrypoint
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# Attach handler to write to stdout (ensures Docker can capture)
-handler = logging.StreamHandler(sys.stdout)
-formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
-handler.setFormatter(formatter)
+AUTH_VERIFY_URL = os.getenv("AUTH_VERIFY_URL", "http://auth-service:8001/verify-token")
+AUTH_VERIFY_TIMEOUT = float(os.getenv("AUTH_VERIFY_TIMEOUT", 5))
 
-# Avoid duplicate handlers
-if not logger.handlers:
-    logger.addHandler(handler)
+# "local" decodes the JWT in-process and checks revocation against the
+# Redis-synced mirror below; "remote" keeps calling the auth service.
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "local").lower()
+SECRET_KEY = os.getenv("SECRET_KEY", "xyz")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
-logger.info("✅ auth_utils.py loaded successfully")
+CLAIMS_CACHE_MAX_ENTRIES = int(os.getenv("CLAIMS_CACHE_MAX_ENTRIES", 10000))
 
-AUTH_VERIFY_URL = os.getenv("AUTH_VERIFY_URL", "http://auth-service:8001/verify-token")
+REVOCATION_CHANNEL = "token.revoked"
+REVOCATION_RESYNC_SECONDS = float(os.getenv("REVOCATION_RESYNC_SECONDS", 30))
+REVOCATION_MAX_STALENESS_SECONDS = float(os.getenv("REVOCATION_MAX_STALENESS_SECONDS", 60))
+
+def _forward_headers(auth_header):
+    """Headers for the auth service: the token, the request id and the trace context."""
+    headers = {"Authorization": auth_header}
+    request_id = logging_setup.request_id_var.get()
+    if request_id:
+        headers["X-Request-ID"] = request_id
+    return tracing.inject(headers)
+
+# One keep-alive session for every call to the auth service
+_http = requests.Session()
+_async_http = httpx.AsyncClient(
+    timeout=AUTH_VERIFY_TIMEOUT,
+    limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+)
 
 def get_current_user(authorization: str = Header(None)):
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
 
     try:
-        res = requests.get(AUTH_VERIFY_URL, headers={"Authorization": authorization}, timeout=5)
+        res = _http.get(AUTH_VERIFY_URL, headers={"Authorization": authorization}, timeout=AUTH_VERIFY_TIMEOUT)
         if res.status_code != 200:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
         data = res.json()
@@ -35,21 +60,301 @@ def get_current_user(authorization: str = Header(None)):
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Auth verification failed: {str(e)}")
 
+# ---------------------------------------------------------------------
+# 🧩 CLAIMS CACHE (verified tokens, keyed by token hash)
+# ---------------------------------------------------------------------
+class ClaimsCache:
+    """
+    Bounded LRU of claims returned by the auth service. Entries are keyed by
+    the SHA-256 of the token, expire at the token's `exp` claim and are
+    dropped as soon as the token is revoked.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token hash -> (claims, exp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0      # dropped to stay within max_entries
+        self.expirations = 0    # dropped at the token's exp
+        self.invalidations = 0  # dropped because the token was revoked
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, exp = entry
+            if exp <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token, claims):
+        exp = claims.get("exp")
+        if not exp or exp <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token):
+        with self._lock:
+            if self._entries.pop(self._key(token), None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+claims_cache = ClaimsCache(CLAIMS_CACHE_MAX_ENTRIES)
+
+
 def verify_token_remote(auth_header: str):
-    logger.info(f"🪪 Raw Authorization header received: {auth_header}")
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    token = auth_header.split(" ")[-1]
+    with metrics.VERIFY_TOKEN_DURATION.labels("remote", "cache").time():
+        claims = claims_cache.get(token)
+        if claims is not None and not revocation_cache.is_revoked(token):
+            return claims
+
+    try:
+        with tracing.span("GET /verify-token", kind=tracing.SpanKind.CLIENT, **{"url.full": AUTH_VERIFY_URL}), \
+                metrics.VERIFY_TOKEN_DURATION.labels("remote", "auth_service").time():
+            # Pass the token exactly as received
+            response = _http.get(AUTH_VERIFY_URL, headers=_forward_headers(auth_header), timeout=AUTH_VERIFY_TIMEOUT)
+
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail", "Invalid or expired token"))
+
+        claims = response.json()["claims"]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Auth service error: {e}")
+
+    claims_cache.put(token, claims)
+    return claims
 
+
+async def verify_token_remote_async(auth_header: str):
+    """Non-blocking variant of verify_token_remote for async routes."""
     if not auth_header:
         raise HTTPException(status_code=401, detail="Missing token")
 
+    token = auth_header.split(" ")[-1]
+    with metrics.VERIFY_TOKEN_DURATION.labels("remote", "cache").time():
+        claims = claims_cache.get(token)
+        if claims is not None and not await revocation_cache.is_revoked_async(token):
+            return claims
+
     try:
-        # Pass the token exactly as received
-        headers = {"Authorization": auth_header}
-        response = requests.get(AUTH_VERIFY_URL, headers=headers)
+        with tracing.span("GET /verify-token", kind=tracing.SpanKind.CLIENT, **{"url.full": AUTH_VERIFY_URL}), \
+                metrics.VERIFY_TOKEN_DURATION.labels("remote", "auth_service").time():
+            response = await _async_http.get(AUTH_VERIFY_URL, headers=_forward_headers(auth_header))
 
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail=response.json().get("detail", "Invalid or expired token"))
 
-        return response.json()["claims"]
+        claims = response.json()["claims"]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Auth service error: {e}")
+
+    claims_cache.put(token, claims)
+    return claims
+
+
+# ---------------------------------------------------------------------
+# 🧩 REVOCATION CACHE (mirror of Redis blacklist:{token} keys)
+# ---------------------------------------------------------------------
+class RevocationCache:
+    """
+    Keeps an in-process copy of the logged-out tokens stored in Redis.
+    A background thread loads every `blacklist:*` key on start, applies
+    revocations published on REVOCATION_CHANNEL as they happen and does a
+    full resync every REVOCATION_RESYNC_SECONDS, evicting revoked tokens
+    from the claims cache as it goes. Entries drop out at the
+    token's own expiry. If the mirror has not been refreshed for longer than
+    REVOCATION_MAX_STALENESS_SECONDS, lookups go straight to Redis instead.
+    """
+
+    def __init__(self, redis_host, resync_interval, max_staleness):
+        self.redis_host = redis_host
+        self.resync_interval = resync_interval
+        self.max_staleness = max_staleness
+        self._revoked = {}  # token -> unix time at which the blacklist entry expires
+        self._lock = threading.Lock()
+        self._last_sync = 0.0   # last full reload from Redis
+        self._heartbeat = 0.0   # last time the listener confirmed it is up to date
+        self._client = None
+        self._thread = None
+
+    def _redis(self):
+        if self._client is None:
+            self._client = redis.Redis(host=self.redis_host, port=6379, decode_responses=True, socket_timeout=2)
+        return self._client
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+        logger.info("✅ Revocation cache sync thread started")
+
+    def sync(self):
+        """Reload the full blacklist from Redis."""
+        client = self._redis()
+        keys = list(client.scan_iter(match="blacklist:*", count=1000))
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+        ttls = pipe.execute() if keys else []
+
+        now = time.time()
+        revoked = {
+            key[len("blacklist:"):]: now + ttl
+            for key, ttl in zip(keys, ttls)
+            if ttl and ttl > 0
+        }
+        with self._lock:
+            self._revoked = revoked
+            self._last_sync = self._heartbeat = now
+        logger.info(f"🔄 Revocation cache synced | {len(revoked)} revoked tokens")
+
+    def _run(self):
+        while True:
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REVOCATION_CHANNEL)
+                self.sync()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        event = json.loads(message["data"])
+                        self._add(event["token"], event["expires_at"])
+                    if time.time() - self._last_sync >= self.resync_interval:
+                        self.sync()
+                    # The subscription is live, so the mirror is current
+                    self._heartbeat = time.time()
+            except Exception as e:
+                logger.error(f"❌ Revocation cache sync failed: {e}. Retrying in 5s...")
+                self._client = None
+                time.sleep(5)
+
+    def _add(self, token, expires_at):
+        with self._lock:
+            self._revoked[token] = expires_at
+        claims_cache.invalidate(token)
+
+    def revoke(self, token: str, ttl: int):
+        """Blacklist a token in Redis and tell every replica about it."""
+        expires_at = time.time() + ttl
+        client = self._redis()
+        client.setex(f"blacklist:{token}", ttl, "true")
+        client.publish(REVOCATION_CHANNEL, json.dumps({"token": token, "expires_at": expires_at}))
+        self._add(token, expires_at)
+
+    def is_stale(self) -> bool:
+        """True when lookups have to go to Redis because the listener has fallen behind."""
+        return time.time() - self._heartbeat > self.max_staleness
+
+    def is_revoked(self, token: str) -> bool:
+        now = time.time()
+        if self.is_stale():
+            try:
+                return bool(self._redis().exists(f"blacklist:{token}"))
+            except redis.RedisError as e:
+                logger.error(f"❌ Revocation lookup failed: {e}")
+                raise HTTPException(status_code=503, detail="Token revocation state unavailable")
+
+        with self._lock:
+            expires_at = self._revoked.get(token)
+            if expires_at is None:
+                return False
+            if expires_at <= now:
+                del self._revoked[token]
+                return False
+            return True
+
+    async def is_revoked_async(self, token: str) -> bool:
+        """is_revoked for the event loop: the Redis fallback runs in the threadpool."""
+        if self.is_stale():
+            return await run_in_threadpool(self.is_revoked, token)
+        return self.is_revoked(token)
+
+
+revocation_cache = RevocationCache(
+    redis_host=os.getenv("REDIS_HOST", "redis"),
+    resync_interval=REVOCATION_RESYNC_SECONDS,
+    max_staleness=REVOCATION_MAX_STALENESS_SECONDS,
+)
+
+
+def verify_token_local(auth_header: str):
+    """Validate the HS256 token in-process, without calling the auth service."""
+    if not auth_header or not auth_header.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    token = auth_header.split(" ")[1]
+    with metrics.VERIFY_TOKEN_DURATION.labels("local", "jwt").time():
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        revoked = revocation_cache.is_revoked(token)
+
+    if revoked:
+        logger.warning("🚫 Attempt to use blacklisted token")
+        raise HTTPException(status_code=401, detail="Token is blacklisted (logged out)")
+
+    return payload
+
+
+def verify_token(auth_header: str):
+    """Verify a bearer token using the configured AUTH_VERIFY_MODE."""
+    if AUTH_VERIFY_MODE == "remote":
+        return verify_token_remote(auth_header)
+    return verify_token_local(auth_header)
+
+
+async def verify_token_async(auth_header: str):
+    """
+    Async counterpart of verify_token. Local mode needs no I/O while the
+    revocation mirror is fresh; when it is stale, the Redis lookup keeps
+    the check off the event loop.
+    """
+    if AUTH_VERIFY_MODE == "remote":
+        return await verify_token_remote_async(auth_header)
+    if revocation_cache.is_stale():
+        return await run_in_threadpool(verify_token_local, auth_header)
+    return verify_token_local(auth_header)
@@ -3,35 +3,96 @@ import pika
 import os
 import time
 import logging
+import functools
+from mediqueue_common import logging_setup
+import metrics
+from mediqueue_common import tracing
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import Doctor, Base, Patient
+from sqlalchemy.dialects import postgresql, sqlite
+from database import SessionLocal
+from models import Doctor, Patient, DoctorSlot
+import slots as slot_engine
+import slot_inventory
+import response_cache
+import retry_topology
 
 # ---------------------------------------------------------------------
 # 🧩 LOGGING CONFIGURATION
 # ---------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler("consumer.log"),
-        logging.StreamHandler()
-    ]
-)
+logging_setup.configure("consumer", "consumer.log")
+tracing.configure("consumer")
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------
-# 🧩 DATABASE INITIALIZATION
+# 🧩 CONFIGURATION
 # ---------------------------------------------------------------------
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("✅ Worker database initialized and tables verified")
-except Exception as e:
-    logger.error(f"❌ Database initialization failed: {e}")
+# serial = handle each message on the connection thread (original behaviour)
+# worker = hand messages to a pool of CONSUMER_CONCURRENCY handler threads
+# batch  = collect up to CONSUMER_BATCH_SIZE messages / CONSUMER_BATCH_LINGER_MS
+#          and write them with one INSERT per role
+CONSUMER_MODE = os.getenv("CONSUMER_MODE", "serial").lower()
+CONSUMER_CONCURRENCY = int(os.getenv("CONSUMER_CONCURRENCY", 8))
+# Unacked messages the broker may push to this consumer at once
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", 2 * CONSUMER_CONCURRENCY))
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", 200))
+CONSUMER_BATCH_LINGER_MS = float(os.getenv("CONSUMER_BATCH_LINGER_MS", 50))
+# Prometheus endpoint of the worker (0 disables it) and how often queue depths are polled
+CONSUMER_METRICS_PORT = int(os.getenv("CONSUMER_METRICS_PORT", 9100))
+CONSUMER_METRICS_INTERVAL = float(os.getenv("CONSUMER_METRICS_INTERVAL", 15))
+
+# Every queue gets its own channel, so prefetch and concurrency are set per
+# queue: <PREFIX>_MODE, <PREFIX>_PREFETCH and <PREFIX>_CONCURRENCY override
+# the CONSUMER_* defaults above.
+ConsumerQueue = namedtuple("ConsumerQueue", "queue exchange routing_key mode prefetch concurrency")
+
+
+def _queue_config(queue, exchange, routing_key, prefix, default_mode=None):
+    return ConsumerQueue(
+        queue=queue,
+        exchange=exchange,
+        routing_key=routing_key,
+        mode=os.getenv(f"{prefix}_MODE", default_mode or CONSUMER_MODE).lower(),
+        prefetch=int(os.getenv(f"{prefix}_PREFETCH", CONSUMER_PREFETCH)),
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", CONSUMER_CONCURRENCY)),
+    )
+
+
+CONSUMER_QUEUES = [
+    _queue_config("user_created_queue", "users", "user.created", "USER_CREATED"),
+    # Batching only has a bulk path for user.created
+    _queue_config("appointment_created_queue", "appointments", "appointment.created", "APPOINTMENT_CREATED",
+                  default_mode="worker" if CONSUMER_MODE == "batch" else None),
+]
 
 # ---------------------------------------------------------------------
 # 🧩 FUNCTION TO HANDLE EVENTS
 # ---------------------------------------------------------------------
+def _doctor_values(event_data):
+    profile = event_data.get("profile", {})
+    return {
+        "user_id": event_data.get("user_id"),
+        "name": profile.get("name", event_data.get("email").split("@")[0].capitalize()),
+        "specialization": profile.get("specialization", "General"),
+        "available_slots": list(slot_engine.DEFAULT_SLOT_TEMPLATE),
+        "daily_limit": 5,
+        "booked_slots": 0,
+    }
+
+
+def _patient_values(event_data):
+    profile = event_data.get("profile", {})
+    email = event_data.get("email")
+    return {
+        "user_id": event_data.get("user_id"),
+        "name": profile.get("name", email.split("@")[0].capitalize()),
+        "email": email,
+        "phone": profile.get("phone", "N/A"),
+    }
+
+
 def handle_user_created(event_data):
     """
     Handles user.created events.
@@ -39,51 +100,39 @@ def handle_user_created(event_data):
     """
     user_id = event_data.get("user_id")
     role = event_data.get("role")
-    email = event_data.get("email")
-    profile = event_data.get("profile", {})
 
     db: Session = SessionLocal()
     try:
         if role == "doctor":
-            name = profile.get("name", email.split("@")[0].capitalize())
-            specialization = profile.get("specialization", "General")
+            values = _doctor_values(event_data)
 
-            logger.info(f"👨‍⚕️ Creating doctor record for user_id={user_id}, name={name}, specialization={specialization}")
+            logger.info(f"👨‍⚕️ Creating doctor record for user_id={user_id}, name={values['name']}, specialization={values['specialization']}")
 
             existing = db.query(Doctor).filter(Doctor.user_id == user_id).first()
             if existing:
                 logger.warning(f"⚠️ Doctor already exists for user_id={user_id}")
                 return
 
-            new_doctor = Doctor(
-                user_id=user_id,
-                name=name,
-                specialization=specialization,
-                available_slots=["09:00", "09:30", "10:00", "10:30", "11:00"],
-                daily_limit=5,
-                booked_slots=0
-            )
+            new_doctor = Doctor(**values)
             db.add(new_doctor)
+            db.flush()
+            slot_engine.open_slots(db, new_doctor.id, new_doctor.available_slots)
             db.commit()
+            slot_inventory.sync_doctor(db, new_doctor.id)
+            response_cache.invalidate()
             logger.info(f"✅ Doctor record created successfully for user_id={user_id}")
 
         elif role == "patient":
-            name = profile.get("name", email.split("@")[0].capitalize())
-            phone = profile.get("phone", "N/A")
+            values = _patient_values(event_data)
 
-            logger.info(f"🧍 Creating patient record for user_id={user_id}, name={name}, phone={phone}")
+            logger.info(f"🧍 Creating patient record for user_id={user_id}, name={values['name']}, phone={values['phone']}")
 
             existing = db.query(Patient).filter(Patient.user_id == user_id).first()
             if existing:
                 logger.warning(f"⚠️ Patient already exists for user_id={user_id}")
                 return
 
-            new_patient = Patient(
-                user_id=user_id,
-                name=name,
-                email=email,
-                phone=phone
-            )
+            new_patient = Patient(**values)
             db.add(new_patient)
             db.commit()
             logger.info(f"✅ Patient record created successfully for user_id={user_id}")
@@ -95,10 +144,68 @@ def handle_user_created(event_data):
     except Exception as e:
         db.rollback()
         logger.error(f"❌ Failed to process user.created for user_id={user_id}: {e}")
+        # Let the consumer retry it instead of acking a lost event
+        raise
 
     finally:
         db.close()
 
+def _insert_ignore(db, model):
+    """INSERT ... ON CONFLICT (user_id) DO NOTHING for the session's dialect, or None."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing(index_elements=["user_id"])
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing(index_elements=["user_id"])
+    return None
+
+
+def handle_user_created_batch(events):
+    """
+    Writes a batch of user.created events in one transaction: events are
+    deduplicated by user_id, each role is a single INSERT ... ON CONFLICT
+    DO NOTHING, and the new doctors' slots are opened with one more INSERT.
+    Raises on failure so the caller can fall back to per-message handling.
+    """
+    unique = {}
+    for event_data in events:
+        unique.setdefault(event_data.get("user_id"), event_data)
+    doctors = [_doctor_values(e) for e in unique.values() if e.get("role") == "doctor"]
+    patients = [_patient_values(e) for e in unique.values() if e.get("role") == "patient"]
+
+    db: Session = SessionLocal()
+    try:
+        doctor_insert = _insert_ignore(db, Doctor)
+        if doctor_insert is None:
+            # No ON CONFLICT support: handle the batch one event at a time
+            for event_data in unique.values():
+                handle_user_created(event_data)
+            return
+
+        new_doctors = []
+        if doctors:
+            new_doctors = db.execute(doctor_insert.values(doctors).returning(Doctor.id, Doctor.available_slots)).all()
+            slot_values = [row for doctor_id, template in new_doctors for row in slot_engine.slot_rows(doctor_id, template)]
+            if slot_values:
+                db.execute(insert(DoctorSlot), slot_values)
+        if patients:
+            db.execute(_insert_ignore(db, Patient).values(patients))
+        db.commit()
+
+        for doctor_id, _ in new_doctors:
+            slot_inventory.sync_doctor(db, doctor_id)
+        if new_doctors:
+            response_cache.invalidate()
+        logger.info(
+            f"✅ Batch of {len(events)} user.created events stored | {len(unique)} unique users, "
+            f"{len(new_doctors)} new doctors, {len(patients)} patients"
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 def handle_appointment_created(event_data):
     """Handles appointment.created events."""
     doctor_id = event_data.get("doctor_id")
@@ -107,46 +214,289 @@ def handle_appointment_created(event_data):
 
     db: Session = SessionLocal()
     try:
-        doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        # Doctor and patient in one round trip
+        row = db.execute(
+            select(Doctor.name, Patient.name, Patient.email)
+            .select_from(Doctor)
+            .join(Patient, Patient.id == patient_id)
+            .where(Doctor.id == doctor_id)
+        ).first()
 
-        if not doctor or not patient:
+        if not row:
             logger.warning(f"⚠️ Doctor or patient not found (doctor_id={doctor_id}, patient_id={patient_id})")
             return
 
-        logger.info(f"📅 Appointment confirmed | Doctor={doctor.name}, Patient={patient.name}, Time={time}")
+        doctor_name, patient_name, patient_email = row
+        logger.info(f"📅 Appointment confirmed | Doctor={doctor_name}, Patient={patient_name}, Time={time}")
 
         # Example future action: trigger notification or analytics
-        # send_email(patient.email, f"Your appointment with Dr. {doctor.name} at {time} is confirmed")
+        # send_email(patient_email, f"Your appointment with Dr. {doctor_name} at {time} is confirmed")
 
-        db.commit()
     except Exception as e:
-        db.rollback()
         logger.error(f"❌ Failed to process appointment.created event: {e}")
+        raise
     finally:
         db.close()
 
 # ---------------------------------------------------------------------
 # 🧩 CALLBACK FUNCTION (RabbitMQ Consumer)
 # ---------------------------------------------------------------------
-def callback(ch, method, properties, body):
+def dispatch(data, routing_key=None):
+    # Events published before the payload carried "event" fall back to the routing key
+    event = data.get("event") or routing_key
+    logger.info(f"📥 Received event '{event}': {data}")
+
+    if event == "user.created":
+        handle_user_created(data)
+    elif event == "appointment.created":
+        handle_appointment_created(data)
+    else:
+        logger.warning(f"⚠️ Unknown event type received: {event}")
+
+
+def _span_attributes(queue, routing_key):
+    return {
+        "messaging.system": "rabbitmq",
+        "messaging.destination.name": queue,
+        "messaging.rabbitmq.destination.routing_key": routing_key or "",
+    }
+
+
+def timed_dispatch(queue, data, routing_key=None, properties=None):
+    """
+    dispatch() in a CONSUMER span that continues the publisher's trace
+    (from the message headers), observed in CONSUMER_CALLBACK_DURATION
+    with outcome ok / error.
+    """
+    headers = getattr(properties, "headers", None)
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        data = json.loads(body)
-        event = data.get("event")
-        logger.info(f"📥 Received event '{event}': {data}")
-
-        if event == "user.created":
-            handle_user_created(data)
-        elif event == "appointment.created":
-            handle_appointment_created(data)
+        with tracing.span(f"{queue} process", kind=tracing.SpanKind.CONSUMER, parent=tracing.extract(headers),
+                          **_span_attributes(queue, routing_key),
+                          **{"messaging.retry_count": retry_topology.retry_count(properties)}):
+            dispatch(data, routing_key)
+        outcome = "ok"
+    finally:
+        metrics.CONSUMER_CALLBACK_DURATION.labels(queue, outcome).observe(time.perf_counter() - started)
+
+
+class Settler:
+    """
+    Acks one queue's messages, or routes failures through its retry /
+    dead-letter queues (see retry_topology.py). Always runs on the
+    connection thread. Failed messages are republished on a separate
+    confirm-mode channel before the original is acked; if that publish
+    fails, the original is requeued instead so nothing is lost.
+    """
+
+    def __init__(self, queue, publish_channel):
+        self.queue = queue
+        self.publish_channel = publish_channel
+        self.settled = 0    # read by QueueMonitor for the processing rate
+
+    def _count(self, outcome, n=1):
+        self.settled += n
+        metrics.CONSUMER_MESSAGES.labels(self.queue, outcome).inc(n)
+
+    def ack(self, ch, delivery_tag):
+        ch.basic_ack(delivery_tag=delivery_tag)
+        self._count("acked")
+
+    def ack_batch(self, ch, delivery_tag, count):
+        """Acks every delivery up to delivery_tag with one multiple=True ack."""
+        ch.basic_ack(delivery_tag=delivery_tag, multiple=True)
+        self._count("acked", count)
+
+    def fail(self, ch, method, properties, body, error, retryable=True):
+        try:
+            retry_topology.route_failure(self.publish_channel, self.queue, method, properties, body, error, retryable)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            self._count("failed")
+        except Exception as e:
+            logger.error(f"❌ Could not route failed message to retry/DLQ, requeueing it: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            self._count("requeued")
+
+    def callback(self, ch, method, properties, body):
+        """Serial handler: process on the connection thread, then settle."""
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            logger.error(f"❌ Malformed message: {e}")
+            self.fail(ch, method, properties, body, e, retryable=False)
+            return
+        try:
+            timed_dispatch(self.queue, data, retry_topology.original_routing_key(method, properties), properties)
+        except Exception as e:
+            logger.error(f"❌ Error processing message: {e}")
+            self.fail(ch, method, properties, body, e)
+            return
+        self.ack(ch, method.delivery_tag)
+
+
+class WorkerPool:
+    """
+    Handles messages on a thread pool (CONSUMER_MODE=worker).
+
+    pika channels are not thread-safe, so workers never touch the channel:
+    each ack (or retry/DLQ routing) is scheduled back onto the connection
+    thread with add_callback_threadsafe and sent from inside
+    start_consuming(). basic_qos(prefetch) bounds how many messages are
+    in flight.
+    """
+
+    def __init__(self, connection, settler, concurrency=CONSUMER_CONCURRENCY):
+        self.connection = connection
+        self.settler = settler
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="consumer-worker")
+        self.in_flight = metrics.CONSUMER_IN_FLIGHT.labels(settler.queue)
+
+    def on_message(self, ch, method, properties, body):
+        self.in_flight.inc()
+        self.executor.submit(self._process, ch, method, properties, body)
+
+    def _settle(self, reply):
+        try:
+            reply()
+        finally:
+            self.in_flight.dec()
+
+    def _process(self, ch, method, properties, body):
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            logger.error(f"❌ Malformed message: {e}")
+            reply = functools.partial(self.settler.fail, ch, method, properties, body, e, False)
         else:
-            logger.warning(f"⚠️ Unknown event type received: {event}")
+            try:
+                timed_dispatch(self.settler.queue, data, retry_topology.original_routing_key(method, properties), properties)
+                reply = functools.partial(self.settler.ack, ch, method.delivery_tag)
+            except Exception as e:
+                logger.error(f"❌ Error processing message: {e}")
+                reply = functools.partial(self.settler.fail, ch, method, properties, body, e)
+        try:
+            self.connection.add_callback_threadsafe(functools.partial(self._settle, reply))
+        except Exception as e:
+            # Connection is gone; the broker redelivers the unacked message
+            self.in_flight.dec()
+            logger.error(f"❌ Could not schedule ack for delivery_tag={method.delivery_tag}: {e}")
 
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
 
-    except Exception as e:
-        logger.error(f"❌ Error processing message: {e}")
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+class BatchCollector:
+    """
+    Buffers deliveries (CONSUMER_MODE=batch) and flushes them when
+    batch_size messages have arrived or linger_ms after the first one.
+    All work happens on the connection thread, so the whole batch is
+    acked with a single basic_ack(multiple=True) on the last tag. If the
+    bulk write fails, the batch is handled again one message at a time,
+    so only the events that really fail go to the retry queues.
+    """
+
+    def __init__(self, connection, settler, batch_size=CONSUMER_BATCH_SIZE, linger_ms=CONSUMER_BATCH_LINGER_MS):
+        self.connection = connection
+        self.settler = settler
+        self.batch_size = max(1, batch_size)
+        self.linger = linger_ms / 1000
+        self._pending = []      # (channel, method, properties, body)
+        self._timer = None
+
+    def on_message(self, ch, method, properties, body):
+        self._pending.append((ch, method, properties, body))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.connection.call_later(self.linger, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            try:
+                self.connection.remove_timeout(self._timer)
+            except Exception:
+                pass
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        ch = batch[-1][0]
+        user_items, user_events, others = [], [], []
+        for item in batch:
+            _, method, _, body = item
+            try:
+                data = json.loads(body)
+            except ValueError as e:
+                logger.error(f"❌ Malformed message: {e}")
+                self.settler.fail(*item, e, retryable=False)
+                continue
+            if data.get("event") == "user.created":
+                user_items.append(item)
+                user_events.append(data)
+            else:
+                others.append(item)
+
+        for item in others:
+            self.settler.callback(*item)
+        if not user_events:
+            return
+
+        # One span for the bulk write, linked to the trace of every message in it
+        links = [tracing.link_to(getattr(item[2], "headers", None)) for item in user_items]
+        started = time.perf_counter()
+        try:
+            with tracing.span(f"{self.settler.queue} process batch", kind=tracing.SpanKind.CONSUMER,
+                              links=[link for link in links if link], **_span_attributes(self.settler.queue, "user.created"),
+                              **{"messaging.batch.message_count": len(user_items)}):
+                handle_user_created_batch(user_events)
+        except Exception as e:
+            metrics.CONSUMER_CALLBACK_DURATION.labels(self.settler.queue, "batch_error").observe(time.perf_counter() - started)
+            logger.error(f"❌ Batch write failed, retrying {len(user_items)} messages one by one: {e}")
+            for item in user_items:
+                self.settler.callback(*item)
+            return
+        metrics.CONSUMER_CALLBACK_DURATION.labels(self.settler.queue, "batch_ok").observe(time.perf_counter() - started)
+        # Everything before this tag on the channel has been settled already,
+        # so one multiple=True ack covers the whole batch
+        self.settler.ack_batch(ch, user_items[-1][1].delivery_tag, len(user_items))
+
+# ---------------------------------------------------------------------
+# 🧩 QUEUE METRICS
+# ---------------------------------------------------------------------
+class QueueMonitor:
+    """
+    Every interval seconds, sets the depth gauge of each consumed queue
+    and its DLQ (passive queue_declare) and the processing-rate gauge
+    (messages settled since the last poll per second). Scheduled with
+    call_later, so it runs on the connection thread like the settlers.
+    """
+
+    def __init__(self, connection, channel, settlers, interval=CONSUMER_METRICS_INTERVAL):
+        self.connection = connection
+        self.channel = channel
+        self.settlers = settlers
+        self.interval = interval
+        self._last = {settler.queue: (settler.settled, time.monotonic()) for settler in settlers}
+
+    def start(self):
+        self.connection.call_later(self.interval, self.poll)
+
+    def poll(self):
+        now = time.monotonic()
+        for settler in self.settlers:
+            settled, since = self._last[settler.queue]
+            self._last[settler.queue] = (settler.settled, now)
+            metrics.CONSUMER_PROCESSING_RATE.labels(settler.queue).set((settler.settled - settled) / max(now - since, 1e-9))
+        try:
+            for settler in self.settlers:
+                for name in (settler.queue, retry_topology.dead_letter_queue(settler.queue)):
+                    frame = self.channel.queue_declare(queue=name, passive=True)
+                    metrics.CONSUMER_QUEUE_DEPTH.labels(name).set(frame.method.message_count)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read queue depths: {e}")
+        self.start()
 
 # ---------------------------------------------------------------------
 # 🧩 RABBITMQ CONNECTION (with retry)
@@ -169,22 +519,67 @@ def connect_to_rabbitmq(max_retries=10, delay=5):
 # ---------------------------------------------------------------------
 # 🧩 MAIN CONSUMER LOGIC
 # ---------------------------------------------------------------------
+def _subscribe(connection, config, publish_channel):
+    """Opens a channel for one queue and starts consuming it; returns the channel, its Settler and WorkerPool (if any)."""
+    channel = connection.channel()
+    channel.exchange_declare(exchange=config.exchange, exchange_type="topic", durable=True)
+
+    prefetch = config.prefetch
+    if config.mode == "batch":
+        # The broker must be allowed to hand over a whole batch
+        prefetch = max(prefetch, CONSUMER_BATCH_SIZE)
+    channel.basic_qos(prefetch_count=prefetch)
+
+    channel.queue_declare(queue=config.queue, durable=True)
+    channel.queue_bind(exchange=config.exchange, queue=config.queue, routing_key=config.routing_key)
+    retry_topology.declare(channel, config.queue)
+
+    settler = Settler(config.queue, publish_channel)
+    pool = None
+    on_message = settler.callback
+    if config.mode == "worker":
+        pool = WorkerPool(connection, settler, config.concurrency)
+        on_message = pool.on_message
+    elif config.mode == "batch":
+        on_message = BatchCollector(connection, settler, CONSUMER_BATCH_SIZE, CONSUMER_BATCH_LINGER_MS).on_message
+
+    channel.basic_consume(queue=config.queue, on_message_callback=on_message)
+    logger.info(
+        f"🚀 Worker listening on exchange '{config.exchange}' for event '{config.routing_key}'... "
+        f"| queue={config.queue}, mode={config.mode}, concurrency={config.concurrency if pool else 1}, "
+        f"prefetch={prefetch}, max_retries={retry_topology.CONSUMER_MAX_RETRIES}"
+    )
+    return channel, settler, pool
+
+
 def main():
+    pools = []
     try:
+        if CONSUMER_METRICS_PORT:
+            metrics.serve(CONSUMER_METRICS_PORT)
+            logger.info(f"📈 Metrics exposed on :{CONSUMER_METRICS_PORT}/metrics")
         connection = connect_to_rabbitmq()
-        channel = connection.channel()
-        channel.exchange_declare(exchange="users", exchange_type="topic", durable=True)
-
-        # Declare queue for worker
-        channel.queue_declare(queue="user_created_queue", durable=True)
-        channel.queue_bind(exchange="users", queue="user_created_queue", routing_key="user.created")
+        # Retry / dead-letter publishes are confirmed before the original is acked
+        publish_channel = connection.channel()
+        publish_channel.confirm_delivery()
 
-        logger.info("🚀 Worker listening on exchange 'users' for event 'user.created'...")
-        channel.basic_consume(queue="user_created_queue", on_message_callback=callback)
+        channels, settlers = [], []
+        for config in CONSUMER_QUEUES:
+            channel, settler, pool = _subscribe(connection, config, publish_channel)
+            channels.append(channel)
+            settlers.append(settler)
+            if pool:
+                pools.append(pool)
+        QueueMonitor(connection, connection.channel(), settlers).start()
 
-        channel.start_consuming()
+        # Drives the consumers of every channel on this connection
+        channels[0].start_consuming()
     except Exception as e:
         logger.error(f"❌ Worker failed to start: {e}")
+    finally:
+        for pool in pools:
+            pool.shutdown()
+        logger.info(f"📊 Consumer failure counters: {retry_topology.counters.snapshot()}")
 
 # ---------------------------------------------------------------------
 # 🧩 ENTRY POINT
@@ -0,0 +1,147 @@
+"""
+Inspect and replay the consumer's dead-letter queues.
+
+    python dlq_tool.py stats
+    python dlq_tool.py inspect user_created_queue --limit 5
+    python dlq_tool.py replay user_created_queue --limit 100
+    python dlq_tool.py purge user_created_queue --yes
+
+QUEUE is the consumer queue (e.g. user_created_queue); the tool works on
+its <QUEUE>.dlq. inspect leaves messages in place. replay republishes
+each one to the exchange and routing key it was originally sent to,
+with its retry count reset, and removes it from the DLQ only after the
+broker confirms the republish.
+"""
+import os
+import json
+import argparse
+import pika
+import retry_topology
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
+CONSUMER_QUEUE_NAMES = ["user_created_queue", "appointment_created_queue"]
+
+
+def _connect():
+    return pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
+
+
+def _depth(channel, queue):
+    try:
+        return channel.queue_declare(queue=queue, passive=True).method.message_count
+    except pika.exceptions.ChannelClosedByBroker:
+        return None
+
+
+def stats(args):
+    connection = _connect()
+    try:
+        for queue in args.queues or CONSUMER_QUEUE_NAMES:
+            names = [queue] + [
+                retry_topology.delay_queue(queue, n) for n in range(1, retry_topology.CONSUMER_MAX_RETRIES + 1)
+            ] + [retry_topology.dead_letter_queue(queue)]
+            for name in names:
+                # A passive declare of a missing queue closes the channel
+                depth = _depth(connection.channel(), name)
+                print(f"{name:<40} {'missing' if depth is None else depth}")
+    finally:
+        connection.close()
+
+
+def inspect(args):
+    connection = _connect()
+    channel = connection.channel()
+    dlq = retry_topology.dead_letter_queue(args.queue)
+    try:
+        for _ in range(args.limit):
+            method, properties, body = channel.basic_get(queue=dlq, auto_ack=False)
+            if method is None:
+                break
+            headers = properties.headers or {}
+            print(json.dumps({
+                "delivery_tag": method.delivery_tag,
+                "original_exchange": headers.get(retry_topology.ORIGINAL_EXCHANGE_HEADER),
+                "original_routing_key": headers.get(retry_topology.ORIGINAL_ROUTING_KEY_HEADER),
+                "retries": headers.get(retry_topology.RETRY_COUNT_HEADER, 0),
+                "last_error": headers.get(retry_topology.LAST_ERROR_HEADER),
+                "dead_lettered_at": headers.get(retry_topology.DEAD_LETTERED_AT_HEADER),
+                "body": body.decode(errors="replace"),
+            }, indent=2))
+    finally:
+        # Unacked messages go back to the DLQ when the connection closes
+        connection.close()
+
+
+def replay(args):
+    connection = _connect()
+    channel = connection.channel()
+    channel.confirm_delivery()
+    dlq = retry_topology.dead_letter_queue(args.queue)
+    replayed = 0
+    try:
+        while replayed < args.limit:
+            method, properties, body = channel.basic_get(queue=dlq, auto_ack=False)
+            if method is None:
+                break
+            headers = dict(properties.headers or {})
+            exchange = headers.pop(retry_topology.ORIGINAL_EXCHANGE_HEADER, "")
+            routing_key = headers.pop(retry_topology.ORIGINAL_ROUTING_KEY_HEADER, args.queue)
+            for header in (retry_topology.RETRY_COUNT_HEADER, retry_topology.DEAD_LETTERED_AT_HEADER):
+                headers.pop(header, None)
+
+            channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    content_type=properties.content_type or "application/json",
+                    headers=headers,
+                ),
+            )
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            replayed += 1
+    finally:
+        connection.close()
+    print(f"🔁 Replayed {replayed} message(s) from {dlq}")
+
+
+def purge(args):
+    if not args.yes:
+        raise SystemExit("Refusing to purge without --yes")
+    connection = _connect()
+    try:
+        dlq = retry_topology.dead_letter_queue(args.queue)
+        purged = connection.channel().queue_purge(queue=dlq).method.message_count
+        print(f"🧹 Purged {purged} message(s) from {dlq}")
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = commands.add_parser("stats", help="depth of each queue, its delay queues and its DLQ")
+    stats_parser.add_argument("queues", nargs="*")
+    stats_parser.set_defaults(func=stats)
+
+    for name, func, help_text in (
+        ("inspect", inspect, "print dead-lettered messages without removing them"),
+        ("replay", replay, "republish dead-lettered messages to their original exchange"),
+        ("purge", purge, "drop every message in the DLQ"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("queue")
+        command.set_defaults(func=func)
+        if name in ("inspect", "replay"):
+            command.add_argument("--limit", type=int, default=10 if name == "inspect" else 1000)
+        if name == "purge":
+            command.add_argument("--yes", action="store_true")
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import json
+from sqlalchemy import select
+from models import Doctor
+import slots as slot_engine
+
+# ---------------------------------------------------------------------
+# 🧩 DOCTOR DIRECTORY LISTING
+# ---------------------------------------------------------------------
+# Backs GET /doctors. Three shapes, all ordered by Doctor.id:
+#
+# - full list (no limit / after_id): the original response, cached;
+# - keyset pages: ?limit=N&after_id=<cursor>, the next cursor is returned
+#   in the X-Next-Cursor header while more rows exist;
+# - ?stream=true: a JSON array written chunk by chunk from a server-side
+#   cursor, so memory stays flat however large the table is.
+#
+# ?fields=id,name,... projects the output. Slot data (available_slots,
+# booked_slots) is only queried when one of those fields is requested.
+
+DIRECTORY_MAX_PAGE = int(os.getenv("DIRECTORY_MAX_PAGE", 500))
+DIRECTORY_STREAM_CHUNK = int(os.getenv("DIRECTORY_STREAM_CHUNK", 500))
+
+DOCTOR_FIELDS = ("id", "name", "specialization", "available_slots", "booked_slots", "daily_limit")
+SLOT_FIELDS = {"available_slots", "booked_slots"}
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def parse_fields(fields: str = None):
+    """'name,id' -> ('id', 'name') in response order; raises ValueError on unknown fields."""
+    if not fields:
+        return DOCTOR_FIELDS
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(DOCTOR_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in DOCTOR_FIELDS if f in requested)
+
+
+def cache_name(limit=None, after_id=None, fields=DOCTOR_FIELDS):
+    if limit is None and after_id is None and fields == DOCTOR_FIELDS:
+        return "doctors"
+    return f"doctors:limit={limit}:after={after_id}:fields={','.join(fields)}"
+
+
+def listing_statement(after_id=None, limit=None):
+    """Doctor columns in id order; fetches limit + 1 rows to detect a next page."""
+    query = select(Doctor.id, Doctor.name, Doctor.specialization, Doctor.daily_limit).order_by(Doctor.id)
+    if after_id is not None:
+        query = query.where(Doctor.id > after_id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def needs_slots(fields) -> bool:
+    return not SLOT_FIELDS.isdisjoint(fields)
+
+
+def project(rows, summary, fields):
+    """Builds the response dicts for (id, name, specialization, daily_limit) rows."""
+    result = []
+    for doctor_id, name, specialization, daily_limit in rows:
+        free, booked = summary.get(doctor_id, ([], 0))
+        doctor = {
+            "id": doctor_id,
+            "name": name,
+            "specialization": specialization,
+            "available_slots": free,
+            "booked_slots": booked,
+            "daily_limit": daily_limit,
+        }
+        result.append({f: doctor[f] for f in fields})
+    return result
+
+
+def split_page(rows, limit):
+    """(rows for this page, next cursor or None)."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1][0]
+
+# ---------------------------------------------------------------------
+# 🧩 SYNC HELPERS
+# ---------------------------------------------------------------------
+def page(db, fields, after_id=None, limit=None):
+    """Returns (payload, headers) for one page (or the full list when limit is None)."""
+    rows, next_cursor = split_page(db.execute(listing_statement(after_id, limit)).all(), limit)
+    summary = {}
+    if rows and needs_slots(fields):
+        summary = slot_engine.summarize(db.execute(slot_engine.summary_statement([r[0] for r in rows])).all())
+    headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+    return project(rows, summary, fields), headers
+
+
+def stream(engine, fields, after_id=None, chunk_size=DIRECTORY_STREAM_CHUNK):
+    """
+    Yields a JSON array of doctors. Uses its own connection because the
+    response body is produced after the request's session is closed.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(listing_statement(after_id))
+        yield b"["
+        first = True
+        for rows in result.partitions(chunk_size):
+            summary = {}
+            if needs_slots(fields):
+                summary = slot_engine.summarize(conn.execute(slot_engine.summary_statement([r[0] for r in rows])).all())
+            for doctor in project(rows, summary, fields):
+                yield (b"" if first else b",") + json.dumps(doctor, separators=(",", ":")).encode()
+                first = False
+        yield b"]"
+
+# ---------------------------------------------------------------------
+# 🧩 ASYNC HELPERS
+# ---------------------------------------------------------------------
+async def page_async(db, fields, after_id=None, limit=None):
+    rows, next_cursor = split_page((await db.execute(listing_statement(after_id, limit))).all(), limit)
+    summary = {}
+    if rows and needs_slots(fields):
+        summary = slot_engine.summarize((await db.execute(slot_engine.summary_statement([r[0] for r in rows]))).all())
+    headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+    return project(rows, summary, fields), headers
+
+
+async def stream_async(async_engine, fields, after_id=None, chunk_size=DIRECTORY_STREAM_CHUNK):
+    async with async_engine.connect() as conn:
+        result = await conn.stream(listing_statement(after_id), execution_options={"yield_per": chunk_size})
+        yield b"["
+        first = True
+        async for rows in result.partitions(chunk_size):
+            summary = {}
+            if needs_slots(fields):
+                summary = slot_engine.summarize(
+                    (await conn.execute(slot_engine.summary_statement([r[0] for r in rows]))).all()
+                )
+            for doctor in project(rows, summary, fields):
+                yield (b"" if first else b",") + json.dumps(doctor, separators=(",", ":")).encode()
+                first = False
+        yield b"]"
@@ -0,0 +1,229 @@
+import os
+import time
+import logging
+import threading
+from sqlalchemy import select, case, func
+from models import Doctor
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 DOCTOR SEARCH
+# ---------------------------------------------------------------------
+# Substring search over doctor name and specialization with the same
+# semantics as the old ILIKE '%term%' filters, but index-backed:
+#
+# - Postgres ("sql"): pg_trgm GIN indexes (migration 0002) let
+#   ILIKE '%term%' use a bitmap index scan instead of a sequential scan
+#   (terms of 3+ characters).
+# - anything else ("ngram", e.g. SQLite in dev/tests): an in-process
+#   trigram index over (id, name, specialization), refreshed incrementally
+#   from the doctors table.
+#
+# Both backends rank the same way: a match at the start of the field, then
+# at the start of a word, then anywhere; shorter fields first; then id.
+
+DOCTOR_SEARCH_BACKEND = os.getenv("DOCTOR_SEARCH_BACKEND", "auto").lower()  # auto | sql | ngram
+DOCTOR_SEARCH_DEFAULT_LIMIT = int(os.getenv("DOCTOR_SEARCH_DEFAULT_LIMIT", 50))
+DOCTOR_SEARCH_MAX_LIMIT = int(os.getenv("DOCTOR_SEARCH_MAX_LIMIT", 200))
+DOCTOR_SEARCH_REFRESH_SECONDS = float(os.getenv("DOCTOR_SEARCH_REFRESH_SECONDS", 2.0))
+DOCTOR_SEARCH_REBUILD_SECONDS = float(os.getenv("DOCTOR_SEARCH_REBUILD_SECONDS", 300))
+
+NGRAM_SIZE = 3
+
+def _uses_sql(db) -> bool:
+    if DOCTOR_SEARCH_BACKEND in ("sql", "ngram"):
+        return DOCTOR_SEARCH_BACKEND == "sql"
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _terms(name, specialization):
+    """[(field_index, lowercased term)] for the filters that were given."""
+    terms = []
+    if name:
+        terms.append((0, name.lower()))
+    if specialization:
+        terms.append((1, specialization.lower()))
+    return terms
+
+
+def _rank(value: str, term: str) -> int:
+    """0 = field starts with term, 1 = a word starts with it, 2 = inside a word, -1 = no match."""
+    if value.startswith(term):
+        return 0
+    if (" " + term) in value:
+        return 1
+    return 2 if term in value else -1
+
+# ---------------------------------------------------------------------
+# 🧩 SQL BACKEND (Postgres + pg_trgm)
+# ---------------------------------------------------------------------
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _rank_expr(column, term):
+    escaped = _like_escape(term)
+    lowered = func.lower(func.coalesce(column, ""))
+    return case(
+        (lowered.like(f"{escaped}%", escape="\\"), 0),
+        (lowered.like(f"% {escaped}%", escape="\\"), 1),
+        else_=2,
+    )
+
+
+def search_statement(name=None, specialization=None, limit=DOCTOR_SEARCH_DEFAULT_LIMIT, offset=0):
+    """Ranked, paginated SELECT of Doctor; fetches limit + 1 rows to detect a next page."""
+    columns = (Doctor.name, Doctor.specialization)
+    query = select(Doctor)
+    ranks, lengths = [], []
+    for field, term in _terms(name, specialization):
+        column = columns[field]
+        query = query.where(column.ilike(f"%{_like_escape(term)}%", escape="\\"))
+        ranks.append(_rank_expr(column, term))
+        lengths.append(func.length(column))
+    if ranks:
+        query = query.order_by(sum(ranks[1:], ranks[0]), sum(lengths[1:], lengths[0]))
+    return query.order_by(Doctor.id).limit(limit + 1).offset(offset)
+
+# ---------------------------------------------------------------------
+# 🧩 IN-MEMORY N-GRAM BACKEND
+# ---------------------------------------------------------------------
+class NgramIndex:
+    """
+    Trigram postings (gram -> doctor ids) for name and specialization.
+
+    Terms of NGRAM_SIZE+ characters intersect the postings of their grams
+    to get candidates, which are then checked for a real substring match;
+    shorter terms fall back to scanning the stored fields. New doctors are
+    picked up every DOCTOR_SEARCH_REFRESH_SECONDS (id > last seen id) and
+    the whole index is rebuilt every DOCTOR_SEARCH_REBUILD_SECONDS.
+    """
+
+    def __init__(self, n=NGRAM_SIZE):
+        self.n = n
+        self._lock = threading.Lock()
+        self._fields = {}           # doctor_id -> (name, specialization), lowercased
+        self._postings = ({}, {})   # per field: gram -> set of doctor ids
+        self._last_id = 0
+        self._checked_at = None
+        self._built_at = None
+
+    def grams(self, value: str):
+        return {value[i:i + self.n] for i in range(len(value) - self.n + 1)}
+
+    # -- refresh -------------------------------------------------------
+    def stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= DOCTOR_SEARCH_REFRESH_SECONDS
+
+    def rebuild_due(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at >= DOCTOR_SEARCH_REBUILD_SECONDS
+
+    def refresh_statement(self, full: bool):
+        query = select(Doctor.id, Doctor.name, Doctor.specialization).order_by(Doctor.id)
+        return query if full else query.where(Doctor.id > self._last_id)
+
+    def apply(self, rows, full: bool):
+        with self._lock:
+            if full:
+                fields, postings, last_id = {}, ({}, {}), 0
+            else:
+                fields, postings, last_id = self._fields, self._postings, self._last_id
+            for doctor_id, name, specialization in rows:
+                values = ((name or "").lower(), (specialization or "").lower())
+                fields[doctor_id] = values
+                for field, value in enumerate(values):
+                    for gram in self.grams(value):
+                        postings[field].setdefault(gram, set()).add(doctor_id)
+                last_id = max(last_id, doctor_id)
+            self._fields, self._postings, self._last_id = fields, postings, last_id
+            self._checked_at = time.monotonic()
+            if full:
+                self._built_at = self._checked_at
+                logger.info(f"🔎 Doctor search index built for {len(fields)} doctors")
+
+    # -- query ---------------------------------------------------------
+    def _candidates(self, field: int, term: str):
+        if len(term) < self.n:
+            return None
+        postings = self._postings[field]
+        lists = sorted((postings.get(g, ()) for g in self.grams(term)), key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+    def search(self, name=None, specialization=None, limit=DOCTOR_SEARCH_DEFAULT_LIMIT, offset=0):
+        """Returns (ranked doctor ids for the page, has_more)."""
+        terms = _terms(name, specialization)
+        with self._lock:
+            if not terms:
+                ids = sorted(self._fields)
+                return ids[offset:offset + limit], len(ids) > offset + limit
+
+            pool = None
+            for field, term in terms:
+                candidates = self._candidates(field, term)
+                if candidates is not None:
+                    pool = candidates if pool is None else pool & candidates
+            pool = self._fields.keys() if pool is None else pool
+
+            matches = []
+            for doctor_id in pool:
+                values = self._fields[doctor_id]
+                rank = length = 0
+                for field, term in terms:
+                    field_rank = _rank(values[field], term)
+                    if field_rank < 0:
+                        break
+                    rank += field_rank
+                    length += len(values[field])
+                else:
+                    matches.append((rank, length, doctor_id))
+
+        matches.sort()
+        page = [doctor_id for _, _, doctor_id in matches[offset:offset + limit]]
+        return page, len(matches) > offset + limit
+
+
+index = NgramIndex()
+
+
+def _order(doctors, ids):
+    by_id = {d.id: d for d in doctors}
+    return [by_id[i] for i in ids if i in by_id]
+
+# ---------------------------------------------------------------------
+# 🧩 ENTRY POINTS
+# ---------------------------------------------------------------------
+def search(db, name=None, specialization=None, limit=DOCTOR_SEARCH_DEFAULT_LIMIT, offset=0):
+    """Returns (doctors for the requested page, has_more)."""
+    if _uses_sql(db):
+        doctors = db.execute(search_statement(name, specialization, limit, offset)).scalars().all()
+        return doctors[:limit], len(doctors) > limit
+
+    if index.stale():
+        full = index.rebuild_due()
+        index.apply(db.execute(index.refresh_statement(full)).all(), full)
+    ids, has_more = index.search(name, specialization, limit, offset)
+    if not ids:
+        return [], has_more
+    doctors = db.execute(select(Doctor).where(Doctor.id.in_(ids))).scalars().all()
+    return _order(doctors, ids), has_more
+
+
+async def search_async(db, name=None, specialization=None, limit=DOCTOR_SEARCH_DEFAULT_LIMIT, offset=0):
+    if _uses_sql(db):
+        doctors = (await db.execute(search_statement(name, specialization, limit, offset))).scalars().all()
+        return doctors[:limit], len(doctors) > limit
+
+    if index.stale():
+        full = index.rebuild_due()
+        index.apply((await db.execute(index.refresh_statement(full))).all(), full)
+    ids, has_more = index.search(name, specialization, limit, offset)
+    if not ids:
+        return [], has_more
+    doctors = (await db.execute(select(Doctor).where(Doctor.id.in_(ids)))).scalars().all()
+    return _order(doctors, ids), has_more
@@ -0,0 +1,18 @@
+from models import OutboxEvent
+from mediqueue_common import tracing
+
+
+def record_appointment_created(db, message: dict):
+    """
+    Adds an 'appointment.created' event to the outbox in the caller's
+    transaction. outbox_relay.py publishes it once the booking commits.
+    Works with both sync and async sessions (add() does no I/O).
+    """
+    # consumer.py dispatches on the "event" field
+    payload = {"event": "appointment.created", **message}
+    # The trace context of the request travels with the row, so the
+    # relay's publish and the consumer join the booking's trace
+    event = OutboxEvent(exchange="appointments", routing_key="appointment.created", payload=payload,
+                        headers=tracing.inject() or None)
+    db.add(event)
+    return event
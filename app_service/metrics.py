@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from mediqueue_common import tracing
+# Shared HTTP metrics, re-exported for app.py
+from mediqueue_common.metrics import LATENCY_BUCKETS, MetricsMiddleware, metrics_response  # noqa: F401
+
+# ---------------------------------------------------------------------
+# 🧩 PROMETHEUS METRICS
+# ---------------------------------------------------------------------
+# Served on GET /metrics by the API; the consumer and the outbox relay
+# have no HTTP app and serve it on CONSUMER_METRICS_PORT /
+# OUTBOX_METRICS_PORT instead. HTTP request metrics and the middleware
+# live in mediqueue_common.metrics.
+
+BOOK_STAGE_DURATION = Histogram(
+    "book_stage_duration_seconds",
+    "Time spent in each stage of /book: auth, inventory_claim, book, commit, invalidate",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+VERIFY_TOKEN_DURATION = Histogram(
+    "verify_token_duration_seconds", "Token verification latency",
+    ["mode", "source"], buckets=LATENCY_BUCKETS,
+)
+OUTBOX_PUBLISH_DURATION = Histogram(
+    "outbox_publish_duration_seconds", "Time to publish one outbox batch to RabbitMQ", buckets=LATENCY_BUCKETS,
+)
+OUTBOX_EVENTS_PUBLISHED = Counter("outbox_events_published_total", "Outbox events confirmed by RabbitMQ")
+
+CONSUMER_CALLBACK_DURATION = Histogram(
+    "consumer_callback_duration_seconds", "Time to handle one message (or one batch in batch mode)",
+    ["queue", "outcome"], buckets=LATENCY_BUCKETS,
+)
+CONSUMER_MESSAGES = Counter("consumer_messages_total", "Messages settled by the consumer", ["queue", "outcome"])
+CONSUMER_FAILURES = Counter(
+    "consumer_failures_total", "Failed messages routed to a delay queue or the DLQ", ["queue", "action"],
+)
+CONSUMER_QUEUE_DEPTH = Gauge("consumer_queue_depth", "Ready messages in a queue", ["queue"])
+CONSUMER_PROCESSING_RATE = Gauge(
+    "consumer_processing_rate", "Messages settled per second over the last depth poll", ["queue"],
+)
+CONSUMER_IN_FLIGHT = Gauge("consumer_in_flight", "Messages handed to worker threads and not yet settled", ["queue"])
+
+
+@contextmanager
+def book_stage(stage: str):
+    """Times one /book stage and records it as a span (book.<stage>) of the request's trace."""
+    with tracing.span(f"book.{stage}"), BOOK_STAGE_DURATION.labels(stage).time():
+        yield
+
+
+_serving = False
+
+
+def serve(port: int):
+    """Starts a background /metrics server for worker processes (once per process)."""
+    global _serving
+    if not _serving:
+        start_http_server(port)
+        _serving = True
@@ -0,0 +1,110 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+The tables as Base.metadata.create_all used to create them at service
+startup. Databases built that way already have every table, so each one
+is only created if it is missing; upgrading such a database just records
+this revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    return {
+        "doctors": lambda: op.create_table(
+            "doctors",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False, unique=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("specialization", sa.String()),
+            sa.Column("available_slots", sa.JSON(), nullable=True),
+            sa.Column("daily_limit", sa.Integer()),
+            sa.Column("booked_slots", sa.Integer()),
+        ),
+        "patients": lambda: op.create_table(
+            "patients",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False, unique=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String()),
+            sa.Column("phone", sa.String()),
+        ),
+        "appointments": lambda: op.create_table(
+            "appointments",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("doctor_id", sa.Integer(), sa.ForeignKey("doctors.id")),
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("patients.id")),
+            sa.Column("time", sa.DateTime(), nullable=False),
+            sa.Column("status", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+        ),
+        "doctor_slots": lambda: op.create_table(
+            "doctor_slots",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("doctor_id", sa.Integer(), sa.ForeignKey("doctors.id"), nullable=False),
+            sa.Column("slot_date", sa.Date(), nullable=False),
+            sa.Column("slot_time", sa.String(), nullable=False),
+            sa.Column("state", sa.String(), nullable=False),
+            sa.UniqueConstraint("doctor_id", "slot_date", "slot_time", name="uq_doctor_slot"),
+        ),
+        "outbox_events": lambda: op.create_table(
+            "outbox_events",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("exchange", sa.String(), nullable=False),
+            sa.Column("routing_key", sa.String(), nullable=False),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("published_at", sa.DateTime(), nullable=True),
+        ),
+        "slot_reset_runs": lambda: op.create_table(
+            "slot_reset_runs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("run_date", sa.Date(), nullable=False),
+            sa.Column("shard", sa.Integer(), nullable=False),
+            sa.Column("shards", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("stats", sa.JSON(), nullable=True),
+            sa.Column("started_at", sa.DateTime()),
+            sa.Column("finished_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("run_date", "shard", "shards", name="uq_slot_reset_run"),
+        ),
+    }
+
+
+# (index name, table, columns) for the index=True columns on the models
+_INDEXES = [
+    ("ix_doctors_id", "doctors", ["id"]),
+    ("ix_patients_id", "patients", ["id"]),
+    ("ix_appointments_id", "appointments", ["id"]),
+    ("ix_doctor_slots_id", "doctor_slots", ["id"]),
+    ("ix_outbox_events_id", "outbox_events", ["id"]),
+    ("ix_outbox_events_published_at", "outbox_events", ["published_at"]),
+    ("ix_slot_reset_runs_id", "slot_reset_runs", ["id"]),
+]
+
+
+def upgrade():
+    # Offline (--sql) runs cannot inspect the database; they emit every table
+    existing = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+    for name, create in _tables().items():
+        if name not in existing:
+            create()
+    for index_name, table, columns in _INDEXES:
+        op.create_index(index_name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for index_name, table, _ in reversed(_INDEXES):
+        op.drop_index(index_name, table_name=table, if_exists=True)
+    for name in reversed(list(_tables())):
+        op.drop_table(name)
@@ -0,0 +1,66 @@
+"""indexes for hot lookup columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+- appointments (doctor_id, time): a doctor's appointments by day/time
+- patients (email)
+- pg_trgm GIN indexes on doctors.name / doctors.specialization for the
+  ILIKE '%term%' search in doctor_search.py (Postgres only; these used to
+  be created by doctor_search.ensure_indexes at startup)
+
+patients.user_id and doctors.user_id are already covered by their unique
+constraints. On Postgres the indexes are built CONCURRENTLY so a live
+database keeps taking writes while they build.
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BTREE_INDEXES = [
+    ("ix_appointments_doctor_id_time", "appointments", ["doctor_id", "time"]),
+    ("ix_patients_email", "patients", ["email"]),
+]
+
+TRGM_INDEXES = [
+    ("ix_doctors_name_trgm", "name"),
+    ("ix_doctors_specialization_trgm", "specialization"),
+]
+
+
+def _is_postgres():
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade():
+    if not _is_postgres():
+        for name, table, columns in BTREE_INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+        return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in BTREE_INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, column in TRGM_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON doctors USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    if not _is_postgres():
+        for name, table, _ in BTREE_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, _ in TRGM_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        for name, table, _ in BTREE_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
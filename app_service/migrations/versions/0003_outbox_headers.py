@@ -0,0 +1,26 @@
+"""outbox_events.headers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+AMQP headers stored with each outbox event (the W3C trace context of the
+request that wrote it) and published with it by outbox_relay.py. The
+column is nullable, so adding it does not rewrite the table.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("outbox_events", sa.Column("headers", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("outbox_events") as batch:
+        batch.drop_column("headers")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, JSON, UniqueConstraint, Index
 from datetime import datetime
 from database import Base
 
@@ -8,21 +8,34 @@ class Doctor(Base):
     user_id = Column(Integer, unique=True, nullable=False)
     name = Column(String, nullable=False)
     specialization = Column(String)
+    # The doctor's configured slot times. Bookable inventory lives in
+    # doctor_slots; see slots.py.
     available_slots = Column(JSON, nullable=True)
     daily_limit = Column(Integer, default=10)
     booked_slots = Column(Integer, default=10)
 
+    def to_dict(self, available_slots, booked_slots):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "specialization": self.specialization,
+            "available_slots": available_slots,
+            "booked_slots": booked_slots,
+            "daily_limit": self.daily_limit
+        }
+
 class Patient(Base):
     __tablename__ = "patients"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, unique=True, nullable=False)
     name = Column(String, nullable=False)
-    email = Column(String)
+    email = Column(String, index=True)
     phone = Column(String)
 
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (Index("ix_appointments_doctor_id_time", "doctor_id", "time"),)
     id = Column(Integer,primary_key=True, index=True)
     doctor_id = Column(Integer, ForeignKey("doctors.id"))
     patient_id = Column(Integer, ForeignKey("patients.id"))
@@ -30,3 +43,40 @@ class Appointment(Base):
     status = Column(String, default="scheduled")
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+class DoctorSlot(Base):
+    """One bookable slot. slot_date is the day the inventory was opened."""
+    __tablename__ = "doctor_slots"
+    __table_args__ = (UniqueConstraint("doctor_id", "slot_date", "slot_time", name="uq_doctor_slot"),)
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
+    slot_date = Column(Date, nullable=False)
+    slot_time = Column(String, nullable=False)  # "HH:MM"
+    state = Column(String, nullable=False, default="free")  # free | booked
+
+
+class OutboxEvent(Base):
+    """Event written in the same transaction as the change it describes; drained by outbox_relay.py."""
+    __tablename__ = "outbox_events"
+    id = Column(Integer, primary_key=True, index=True)
+    exchange = Column(String, nullable=False)
+    routing_key = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    headers = Column(JSON, nullable=True)   # AMQP headers to publish with, e.g. the trace context
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    published_at = Column(DateTime, nullable=True, index=True)
+
+
+class SlotResetRun(Base):
+    """One shard of a daily slot reset; makes reruns of a finished shard a no-op."""
+    __tablename__ = "slot_reset_runs"
+    __table_args__ = (UniqueConstraint("run_date", "shard", "shards", name="uq_slot_reset_run"),)
+    id = Column(Integer, primary_key=True, index=True)
+    run_date = Column(Date, nullable=False)
+    shard = Column(Integer, nullable=False)
+    shards = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="running")  # running | completed | failed
+    stats = Column(JSON, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+from mediqueue_common import logging_setup
+import metrics
+from mediqueue_common import tracing
+from datetime import datetime, timedelta
+from concurrent.futures import wait
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import OutboxEvent
+from mediqueue_common.event_publisher import EventPublisher
+
+# ---------------------------------------------------------------------
+# 🧩 LOGGING CONFIGURATION
+# ---------------------------------------------------------------------
+logging_setup.configure("outbox_relay", "outbox_relay.log")
+tracing.configure("outbox_relay")
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 CONFIGURATION
+# ---------------------------------------------------------------------
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 0.5))
+OUTBOX_PUBLISH_TIMEOUT = float(os.getenv("OUTBOX_PUBLISH_TIMEOUT", 10))
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", 24))
+OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", 300))
+OUTBOX_METRICS_PORT = int(os.getenv("OUTBOX_METRICS_PORT", 9101))   # 0 disables the /metrics endpoint
+
+# One connection, whole batches per AMQP transaction
+publisher = EventPublisher(pool_size=1, batch_size=OUTBOX_BATCH_SIZE, linger_ms=5)
+publisher.declare_exchange("appointments", "topic")
+
+# ---------------------------------------------------------------------
+# 🧩 RELAY LOGIC
+# ---------------------------------------------------------------------
+def drain_once(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Publishes one batch of pending outbox events and marks them published.
+    Rows are claimed with FOR UPDATE SKIP LOCKED so several relays can run
+    side by side without publishing the same event twice.
+    """
+    db: Session = SessionLocal()
+    try:
+        events = (
+            db.query(OutboxEvent)
+            .filter(OutboxEvent.published_at.is_(None))
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not events:
+            db.rollback()
+            return 0
+
+        published = 0
+        now = datetime.utcnow()
+        with metrics.OUTBOX_PUBLISH_DURATION.time():
+            pending = []
+            for event in events:
+                # A PRODUCER span in the trace of the request that wrote the row
+                span = tracing.start_span(
+                    f"{event.exchange} publish", kind=tracing.SpanKind.PRODUCER, parent=tracing.extract(event.headers),
+                    **{
+                        "messaging.system": "rabbitmq",
+                        "messaging.destination.name": event.exchange,
+                        "messaging.rabbitmq.destination.routing_key": event.routing_key,
+                        "outbox.event_id": event.id,
+                        "outbox.lag_ms": round((now - event.created_at).total_seconds() * 1000, 1) if event.created_at else -1,
+                    },
+                )
+                headers = tracing.inject(event.headers, span) or None
+                pending.append((event, span, publisher.publish(event.exchange, event.routing_key, event.payload, headers)))
+            # One deadline for the whole batch: the row locks are held until commit,
+            # so a stalled broker costs OUTBOX_PUBLISH_TIMEOUT once, not once per event
+            wait([future for _, _, future in pending], timeout=OUTBOX_PUBLISH_TIMEOUT)
+            for event, span, future in pending:
+                try:
+                    if not future.done():
+                        raise TimeoutError(f"not confirmed within {OUTBOX_PUBLISH_TIMEOUT}s")
+                    future.result()
+                    event.published_at = now
+                    published += 1
+                except Exception as e:
+                    event.attempts += 1
+                    tracing.fail(span, e)
+                    logger.error(f"❌ Failed to publish outbox event id={event.id}: {e}")
+                finally:
+                    span.end()
+        db.commit()
+        metrics.OUTBOX_EVENTS_PUBLISHED.inc(published)
+
+        logger.info(f"📤 Relayed {published}/{len(events)} outbox events")
+        return published
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def purge_published(retention_hours=OUTBOX_RETENTION_HOURS):
+    """Deletes events that were published more than retention_hours ago."""
+    db: Session = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+        deleted = (
+            db.query(OutboxEvent)
+            .filter(OutboxEvent.published_at.isnot(None), OutboxEvent.published_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} published outbox events")
+    finally:
+        db.close()
+
+# ---------------------------------------------------------------------
+# 🧩 MAIN RELAY LOOP
+# ---------------------------------------------------------------------
+def main():
+    if OUTBOX_METRICS_PORT:
+        metrics.serve(OUTBOX_METRICS_PORT)
+        logger.info(f"📈 Metrics exposed on :{OUTBOX_METRICS_PORT}/metrics")
+    publisher.start()
+    logger.info("🚀 Outbox relay started")
+    last_purge = 0.0
+    while True:
+        try:
+            relayed = drain_once()
+            if time.monotonic() - last_purge >= OUTBOX_PURGE_INTERVAL:
+                purge_published()
+                last_purge = time.monotonic()
+        except Exception as e:
+            logger.error(f"❌ Outbox relay iteration failed: {e}")
+            relayed = 0
+        # Keep draining while batches come back full
+        if relayed < OUTBOX_BATCH_SIZE:
+            time.sleep(OUTBOX_POLL_INTERVAL)
+
+# ---------------------------------------------------------------------
+# 🧩 ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 DATABASE ROUND-TRIP BUDGETS
+# ---------------------------------------------------------------------
+# track() counts the round trips (statements, commits and rollbacks) a
+# block of code makes on any engine, async ones included, and compares
+# them with a budget. On request paths QUERY_BUDGET_MODE=warn logs when
+# a hot path starts making more trips than it should; off skips the check.
+#
+# mode="raise" (an AssertionError) is for tests only, passed explicitly to
+# track(). The check runs when the block exits, i.e. after its COMMIT, so
+# raising inside a route would fail a request whose work was already saved.
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "warn").lower()
+if QUERY_BUDGET_MODE not in ("off", "warn"):
+    logger.warning(f"⚠️ QUERY_BUDGET_MODE={QUERY_BUDGET_MODE!r} is not off|warn, using warn")
+    QUERY_BUDGET_MODE = "warn"
+
+# Every active counter: a test's track() around a request also sees the
+# round trips counted by the route's own track()
+_current = ContextVar("query_budget_counters", default=())
+
+
+class QueryCounter:
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.round_trips = 0
+        self.statements = []
+
+    def record(self, what):
+        self.round_trips += 1
+        self.statements.append(what)
+
+
+def _record(what):
+    for counter in _current.get():
+        counter.record(what)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(" ".join(statement.split())[:80])
+
+
+@event.listens_for(Engine, "commit")
+def _on_commit(conn):
+    _record("COMMIT")
+
+
+@event.listens_for(Engine, "rollback")
+def _on_rollback(conn):
+    _record("ROLLBACK")
+
+
+@contextmanager
+def track(name: str, budget: int, mode: str = None):
+    """
+    Counts the round trips made inside the block; yields the QueryCounter.
+    mode: off | warn (default: QUERY_BUDGET_MODE) | raise (tests only).
+    """
+    mode = mode or QUERY_BUDGET_MODE
+    if mode == "off":
+        yield None
+        return
+    counter = QueryCounter(name, budget)
+    token = _current.set(_current.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+    if counter.round_trips > budget:
+        message = (
+            f"{name} made {counter.round_trips} DB round trips (budget {budget}): "
+            + " | ".join(counter.statements)
+        )
+        if mode == "raise":
+            raise AssertionError(message)
+        logger.warning(f"⚠️ {message}")
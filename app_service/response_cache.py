@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import redis
+import redis.asyncio as aioredis
+from fastapi import Response
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 DOCTOR DIRECTORY RESPONSE CACHE
+# ---------------------------------------------------------------------
+# Serialized responses for the doctor directory live in Redis under
+# versioned keys (cache:doctors:v{N}:{name}) with a small per-process
+# copy in front. Any write that changes the directory bumps the version
+# with invalidate(), which orphans every old key at once; replicas notice
+# the new version within RESPONSE_CACHE_LOCAL_TTL seconds. The local copy
+# is an LRU of at most RESPONSE_CACHE_LOCAL_MAX_ENTRIES names, since paged
+# and filtered listings each get their own name.
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_LOCAL_TTL = float(os.getenv("RESPONSE_CACHE_LOCAL_TTL", 1.0))
+RESPONSE_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_LOCAL_MAX_ENTRIES", 256))
+
+VERSION_KEY = "cache:doctors:version"
+
+_redis_host = os.getenv("REDIS_HOST", "redis")
+_client = redis.Redis(host=_redis_host, port=6379, socket_timeout=1)
+_aclient = aioredis.Redis(host=_redis_host, port=6379, socket_timeout=1)
+
+_lock = threading.Lock()
+_version = (None, 0.0)  # (version, fetched_at)
+_local = OrderedDict()  # name -> (version, body, etag, headers), least recently used first
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _encode(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _key(version, name):
+    return f"cache:doctors:v{version}:{name}"
+
+
+def _fresh_version():
+    version, fetched_at = _version
+    if version is not None and time.monotonic() - fetched_at < RESPONSE_CACHE_LOCAL_TTL:
+        return version
+    return None
+
+
+def _remember_version(raw):
+    global _version
+    version = int(raw or 0)
+    with _lock:
+        _version = (version, time.monotonic())
+    return version
+
+
+def _local_hit(name, version):
+    with _lock:
+        entry = _local.get(name)
+        if entry and entry[0] == version:
+            _local.move_to_end(name)
+            return entry[1:]
+    return None
+
+
+def _store_local(name, version, body, etag, headers):
+    with _lock:
+        _local[name] = (version, body, etag, headers)
+        _local.move_to_end(name)
+        while len(_local) > RESPONSE_CACHE_LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def _pack(body: bytes, headers) -> bytes:
+    # Compact JSON never contains a raw newline, so it can separate the parts
+    return _encode(headers) + b"\n" + body
+
+
+def _unpack(raw: bytes):
+    if b"\n" not in raw:
+        return raw, {}  # written by a replica that predates cached headers
+    headers, body = raw.split(b"\n", 1)
+    return body, json.loads(headers)
+
+
+def get_or_build_with_headers(name, build):
+    """
+    Returns (body, etag, headers) for `name`. build() returns
+    (payload, headers); the headers are cached along with the body.
+    """
+    if not RESPONSE_CACHE_ENABLED:
+        payload, headers = build()
+        body = _encode(payload)
+        return body, _etag(body), headers
+    try:
+        version = _fresh_version()
+        if version is None:
+            version = _remember_version(_client.get(VERSION_KEY))
+        hit = _local_hit(name, version)
+        if hit:
+            return hit
+
+        raw = _client.get(_key(version, name))
+        if raw is None:
+            payload, headers = build()
+            body = _encode(payload)
+            _client.set(_key(version, name), _pack(body, headers), ex=RESPONSE_CACHE_TTL)
+        else:
+            body, headers = _unpack(raw)
+        etag = _etag(body)
+        _store_local(name, version, body, etag, headers)
+        return body, etag, headers
+    except redis.RedisError as e:
+        logger.error(f"❌ Response cache unavailable, serving from DB: {e}")
+        payload, headers = build()
+        body = _encode(payload)
+        return body, _etag(body), headers
+
+
+def get_or_build(name, build):
+    """Returns (body, etag) for `name`, calling build() only on a miss."""
+    body, etag, _ = get_or_build_with_headers(name, lambda: (build(), {}))
+    return body, etag
+
+
+async def get_or_build_with_headers_async(name, build):
+    """Async variant of get_or_build_with_headers; build is an async callable."""
+    if not RESPONSE_CACHE_ENABLED:
+        payload, headers = await build()
+        body = _encode(payload)
+        return body, _etag(body), headers
+    try:
+        version = _fresh_version()
+        if version is None:
+            version = _remember_version(await _aclient.get(VERSION_KEY))
+        hit = _local_hit(name, version)
+        if hit:
+            return hit
+
+        raw = await _aclient.get(_key(version, name))
+        if raw is None:
+            payload, headers = await build()
+            body = _encode(payload)
+            await _aclient.set(_key(version, name), _pack(body, headers), ex=RESPONSE_CACHE_TTL)
+        else:
+            body, headers = _unpack(raw)
+        etag = _etag(body)
+        _store_local(name, version, body, etag, headers)
+        return body, etag, headers
+    except redis.RedisError as e:
+        logger.error(f"❌ Response cache unavailable, serving from DB: {e}")
+        payload, headers = await build()
+        body = _encode(payload)
+        return body, _etag(body), headers
+
+
+async def get_or_build_async(name, build):
+    """Async variant of get_or_build; build is an async callable."""
+    async def build_with_headers():
+        return await build(), {}
+
+    body, etag, _ = await get_or_build_with_headers_async(name, build_with_headers)
+    return body, etag
+
+
+def invalidate():
+    """Bumps the directory version; call after any write that changes /doctors."""
+    global _version
+    with _lock:
+        _local.clear()
+        _version = (None, 0.0)
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    try:
+        _client.incr(VERSION_KEY)
+    except redis.RedisError as e:
+        logger.error(f"❌ Response cache invalidation failed: {e}")
+
+
+async def invalidate_async():
+    global _version
+    with _lock:
+        _local.clear()
+        _version = (None, 0.0)
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    try:
+        await _aclient.incr(VERSION_KEY)
+    except redis.RedisError as e:
+        logger.error(f"❌ Response cache invalidation failed: {e}")
+
+
+def json_response(body: bytes, etag: str, if_none_match: str = None, headers=None):
+    """200 with the cached body, or 304 when the client already has it."""
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
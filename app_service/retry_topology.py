@@ -0,0 +1,142 @@
+import os
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+import pika
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 RETRY / DEAD-LETTER TOPOLOGY
+# ---------------------------------------------------------------------
+# For every consumer queue Q:
+#
+#   Q.retry.1 .. Q.retry.N   delay queues, x-message-ttl = base * 2^(n-1);
+#                            expired messages are dead-lettered back to Q
+#                            through the default exchange
+#   Q.dlq                    messages that failed N retries (or can never
+#                            succeed, e.g. malformed JSON)
+#
+# A failed message is republished to its next delay queue with an
+# incremented x-retry-count header and the original is acked, so a DB
+# blip costs a few delayed redeliveries instead of a lost event or a hot
+# requeue loop. Q itself keeps its original arguments, so existing queues
+# do not have to be redeclared. dlq_tool.py inspects and replays Q.dlq.
+
+CONSUMER_MAX_RETRIES = int(os.getenv("CONSUMER_MAX_RETRIES", 5))
+CONSUMER_RETRY_BASE_MS = int(os.getenv("CONSUMER_RETRY_BASE_MS", 1000))
+
+RETRY_COUNT_HEADER = "x-retry-count"
+ORIGINAL_EXCHANGE_HEADER = "x-original-exchange"
+ORIGINAL_ROUTING_KEY_HEADER = "x-original-routing-key"
+LAST_ERROR_HEADER = "x-last-error"
+DEAD_LETTERED_AT_HEADER = "x-dead-lettered-at"
+
+
+def delay_queue(queue: str, attempt: int) -> str:
+    return f"{queue}.retry.{attempt}"
+
+
+def dead_letter_queue(queue: str) -> str:
+    return f"{queue}.dlq"
+
+
+def retry_delay_ms(attempt: int) -> int:
+    return CONSUMER_RETRY_BASE_MS * 2 ** (attempt - 1)
+
+
+def declare(channel, queue: str, max_retries=CONSUMER_MAX_RETRIES):
+    """Declares Q's delay queues and dead-letter queue (idempotent)."""
+    for attempt in range(1, max_retries + 1):
+        channel.queue_declare(
+            queue=delay_queue(queue, attempt),
+            durable=True,
+            arguments={
+                "x-message-ttl": retry_delay_ms(attempt),
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": queue,
+            },
+        )
+    channel.queue_declare(queue=dead_letter_queue(queue), durable=True)
+
+
+class FailureCounters:
+    """Per-queue counts of retried and dead-lettered messages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retried = Counter()
+        self.dead_lettered = Counter()
+
+    def record(self, queue, dead: bool):
+        with self._lock:
+            (self.dead_lettered if dead else self.retried)[queue] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"retried": dict(self.retried), "dead_lettered": dict(self.dead_lettered)}
+
+
+counters = FailureCounters()
+
+
+def retry_count(properties) -> int:
+    headers = (properties.headers if properties else None) or {}
+    return int(headers.get(RETRY_COUNT_HEADER, 0))
+
+
+def original_routing_key(method, properties) -> str:
+    """
+    The routing key the event was first published with. Retried messages
+    come back from their delay queue routed by the queue name instead.
+    """
+    headers = (properties.headers if properties else None) or {}
+    return headers.get(ORIGINAL_ROUTING_KEY_HEADER, method.routing_key)
+
+
+def route_failure(channel, queue, method, properties, body, error, retryable=True, max_retries=CONSUMER_MAX_RETRIES):
+    """
+    Republishes a failed delivery to its next delay queue, or to the DLQ
+    once retries are exhausted (or straight away if not retryable).
+    Returns the queue it was sent to. Must run on the connection thread.
+    """
+    headers = dict((properties.headers if properties else None) or {})
+    headers.setdefault(ORIGINAL_EXCHANGE_HEADER, method.exchange)
+    headers.setdefault(ORIGINAL_ROUTING_KEY_HEADER, method.routing_key)
+    headers[LAST_ERROR_HEADER] = str(error)[:500]
+
+    attempt = retry_count(properties) + 1
+    dead = not retryable or attempt > max_retries
+    if dead:
+        target = dead_letter_queue(queue)
+        headers[DEAD_LETTERED_AT_HEADER] = datetime.utcnow().isoformat()
+    else:
+        target = delay_queue(queue, attempt)
+        headers[RETRY_COUNT_HEADER] = attempt
+
+    channel.basic_publish(
+        exchange="",
+        routing_key=target,
+        body=body,
+        properties=pika.BasicProperties(
+            delivery_mode=2,
+            content_type=getattr(properties, "content_type", None) or "application/json",
+            headers=headers,
+        ),
+    )
+    counters.record(queue, dead)
+    metrics.CONSUMER_FAILURES.labels(queue, "dead_lettered" if dead else "retried").inc()
+    totals = counters.snapshot()
+    if dead:
+        logger.error(
+            f"☠️ Dead-lettered message from {queue} to {target} after {attempt - 1} retries: {error} "
+            f"| dead_lettered={totals['dead_lettered'].get(queue, 0)}"
+        )
+    else:
+        logger.warning(
+            f"🔁 Retry {attempt}/{max_retries} for message from {queue} in {retry_delay_ms(attempt)} ms: {error} "
+            f"| retried={totals['retried'].get(queue, 0)}"
+        )
+    return target
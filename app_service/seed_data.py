@@ -1,5 +1,6 @@
 from database import SessionLocal
-from models import  Doctor, Patient, Appointment
+from models import  Doctor, DoctorSlot, Patient, Appointment
+import slots as slot_engine
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
@@ -8,6 +9,7 @@ db = SessionLocal()
 try:
     # 🧹 Clear all existing data
     db.query(Appointment).delete()
+    db.query(DoctorSlot).delete()
     db.query(Doctor).delete()
     db.query(Patient).delete()
     db.commit()
@@ -41,6 +43,9 @@ try:
     ]
 
     db.add_all(doctors)
+    db.flush()
+    for doctor in doctors:
+        slot_engine.open_slots(db, doctor.id, doctor.available_slots)
     db.commit()
     print("✅ Doctors table seeded")
 
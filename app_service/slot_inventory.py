@@ -0,0 +1,144 @@
+import os
+import logging
+import redis
+import redis.asyncio as aioredis
+import slots as slot_engine
+from models import DoctorSlot
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 REDIS SLOT INVENTORY (SLOT_INVENTORY_MODE=redis)
+# ---------------------------------------------------------------------
+# Mirrors each doctor's free slot times in a Redis set so /book can claim
+# a slot with one Lua call and turn away losers of a flash crowd without
+# touching Postgres. doctor_slots stays authoritative: a successful claim
+# is always followed by the conditional UPDATE in slots.reserve_slot.
+#
+# Every set carries a sentinel member so that a sold-out doctor (empty
+# inventory) is distinguishable from a doctor that was never loaded.
+
+SLOT_INVENTORY_MODE = os.getenv("SLOT_INVENTORY_MODE", "db").lower()
+INVENTORY_KEY_TTL = int(os.getenv("SLOT_INVENTORY_TTL", 36 * 3600))
+SENTINEL = "~"
+
+CLAIMED = 1
+TAKEN = 0
+UNKNOWN = -1
+
+# 1 = claimed, 0 = not free, -1 = no inventory loaded for this doctor
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return -1
+end
+return redis.call('SREM', KEYS[1], ARGV[1])
+"""
+
+# Puts a slot back after a claim whose booking did not go through
+RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return redis.call('SADD', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+def inventory_key(doctor_id: int) -> str:
+    return f"slots:free:{doctor_id}"
+
+
+def enabled() -> bool:
+    return SLOT_INVENTORY_MODE == "redis"
+
+
+_redis_host = os.getenv("REDIS_HOST", "redis")
+_client = redis.Redis(host=_redis_host, port=6379, decode_responses=True, socket_timeout=1)
+_aclient = aioredis.Redis(host=_redis_host, port=6379, decode_responses=True, socket_timeout=1)
+_claim = _client.register_script(CLAIM_SCRIPT)
+_release = _client.register_script(RELEASE_SCRIPT)
+_aclaim = _aclient.register_script(CLAIM_SCRIPT)
+_arelease = _aclient.register_script(RELEASE_SCRIPT)
+
+
+def claim(doctor_id: int, slot_time: str) -> int:
+    """Atomically takes slot_time out of the doctor's inventory."""
+    try:
+        return int(_claim(keys=[inventory_key(doctor_id)], args=[slot_time]))
+    except redis.RedisError as e:
+        logger.error(f"❌ Slot inventory claim failed, falling back to DB: {e}")
+        return UNKNOWN
+
+
+def release(doctor_id: int, slot_time: str):
+    try:
+        _release(keys=[inventory_key(doctor_id)], args=[slot_time])
+    except redis.RedisError as e:
+        logger.error(f"❌ Slot inventory release failed for doctor {doctor_id} {slot_time}: {e}")
+
+
+async def claim_async(doctor_id: int, slot_time: str) -> int:
+    try:
+        return int(await _aclaim(keys=[inventory_key(doctor_id)], args=[slot_time]))
+    except redis.RedisError as e:
+        logger.error(f"❌ Slot inventory claim failed, falling back to DB: {e}")
+        return UNKNOWN
+
+
+async def release_async(doctor_id: int, slot_time: str):
+    try:
+        await _arelease(keys=[inventory_key(doctor_id)], args=[slot_time])
+    except redis.RedisError as e:
+        logger.error(f"❌ Slot inventory release failed for doctor {doctor_id} {slot_time}: {e}")
+
+
+def _load(pipe, doctor_id, free_times):
+    key = inventory_key(doctor_id)
+    pipe.delete(key)
+    pipe.sadd(key, SENTINEL, *free_times)
+    pipe.expire(key, INVENTORY_KEY_TTL)
+
+
+def sync_doctor(db, doctor_id: int):
+    """Reloads one doctor's inventory from doctor_slots."""
+    if not enabled():
+        return
+    free_times = slot_engine.free_slot_times(db, doctor_id)
+    try:
+        pipe = _client.pipeline(transaction=True)
+        _load(pipe, doctor_id, free_times)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"❌ Slot inventory sync failed for doctor {doctor_id}: {e}")
+
+
+def reconcile(db, chunk_size=1000, shard=0, shards=1):
+    """
+    Rebuilds every doctor's inventory (or one reset shard's, doctor_id %
+    shards == shard) from doctor_slots. A slot claimed in
+    Redis but not yet committed may reappear; the DB's conditional UPDATE
+    still rejects the second booking, so this is safe to run at any time.
+    """
+    if not enabled():
+        return 0
+    query = slot_engine.summary_statement()
+    if shards > 1:
+        query = query.where(DoctorSlot.doctor_id % shards == shard)
+    free = {}
+    for doctor_id, slot_time, state in db.execute(query).yield_per(chunk_size):
+        times = free.setdefault(doctor_id, [])
+        if state == slot_engine.SLOT_FREE:
+            times.append(slot_time)
+
+    try:
+        pipe = _client.pipeline(transaction=False)
+        for index, (doctor_id, times) in enumerate(free.items(), start=1):
+            _load(pipe, doctor_id, times)
+            if index % chunk_size == 0:
+                pipe.execute()
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"❌ Slot inventory reconciliation failed: {e}")
+        return 0
+
+    logger.info(f"🔄 Slot inventory reconciled for {len(free)} doctors")
+    return len(free)
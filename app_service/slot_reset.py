@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+from datetime import date, datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, update, delete, insert, func, literal, true, or_, cast, String, Date
+from models import Doctor, DoctorSlot, SlotResetRun
+from slots import SLOT_FREE, DEFAULT_SLOT_TEMPLATE, slot_rows
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 BULK SLOT RESET
+# ---------------------------------------------------------------------
+# Reopens every doctor's slots from their own template
+# (Doctor.available_slots, DEFAULT_SLOT_TEMPLATE when unset) without
+# loading doctors into the session. Doctors are processed in id ranges of
+# RESET_CHUNK_SIZE, one short transaction per range, with three set-based
+# statements each:
+#
+#   UPDATE doctors SET booked_slots = 0 [, available_slots = default]
+#   DELETE FROM doctor_slots WHERE doctor_id in range
+#   INSERT INTO doctor_slots SELECT ... FROM doctors, json_array_elements_text(...)
+#
+# A failed run leaves finished ranges reset and can simply be rerun.
+#
+# The work can be split into shards (doctor id % shards == shard) so the
+# Airflow DAG can run them in parallel and retry one on its own. Each
+# (run_date, shard, shards) is recorded in slot_reset_runs; once it has
+# completed, calling it again for the same day is a no-op and does not
+# wipe bookings made since. While it is running, another call for it gets
+# ResetInProgress; a run still "running" after SLOT_RESET_STALE_SECONDS
+# is assumed to have died with its worker and the next call takes it over.
+
+RESET_CHUNK_SIZE = int(os.getenv("RESET_CHUNK_SIZE", 5000))
+# Longer than the DAG's SLOT_RESET_TIMEOUT, so a live run is never taken over
+SLOT_RESET_STALE_SECONDS = int(os.getenv("SLOT_RESET_STALE_SECONDS", 1800))
+
+
+def _json_elements(dialect: str):
+    """Table-valued function expanding Doctor.available_slots into rows, or None."""
+    if dialect == "postgresql":
+        return func.json_array_elements_text(Doctor.available_slots).table_valued("value").alias("slot")
+    if dialect == "sqlite":
+        return func.json_each(Doctor.available_slots).table_valued("value").alias("slot")
+    return None
+
+
+def _scope(column, low, high, shard, shards):
+    """low <= column <= high, restricted to the shard when sharding."""
+    condition = (column >= low) & (column <= high)
+    if shards > 1:
+        condition = condition & (column % shards == shard)
+    return condition
+
+
+def _reset_range(db, dialect, low, high, shard, shards, slot_date, default_template):
+    """Resets doctors with low <= id <= high; returns (slots_deleted, slots_opened)."""
+    # Doctors without a template get the default one
+    db.execute(
+        update(Doctor)
+        .where(
+            _scope(Doctor.id, low, high, shard, shards),
+            or_(Doctor.available_slots.is_(None), cast(Doctor.available_slots, String).in_(["null", "[]"])),
+        )
+        .values(available_slots=list(default_template))
+    )
+    db.execute(update(Doctor).where(_scope(Doctor.id, low, high, shard, shards)).values(booked_slots=0))
+    deleted = db.execute(delete(DoctorSlot).where(_scope(DoctorSlot.doctor_id, low, high, shard, shards))).rowcount
+
+    elements = _json_elements(dialect)
+    if elements is not None:
+        opened = db.execute(
+            insert(DoctorSlot).from_select(
+                ["doctor_id", "slot_date", "slot_time", "state"],
+                select(Doctor.id, literal(slot_date, Date), elements.c.value, literal(SLOT_FREE))
+                .select_from(Doctor)
+                .join(elements, true())
+                .where(_scope(Doctor.id, low, high, shard, shards))
+                .distinct(),
+            )
+        ).rowcount
+    else:
+        # No JSON table functions: expand the templates client-side
+        rows = []
+        templates = db.execute(select(Doctor.id, Doctor.available_slots).where(_scope(Doctor.id, low, high, shard, shards)))
+        for doctor_id, template in templates:
+            rows.extend(slot_rows(doctor_id, template or [], slot_date))
+        if rows:
+            db.execute(insert(DoctorSlot), rows)
+        opened = len(rows)
+    return deleted, opened
+
+
+def _id_ranges(db, chunk_size, shard, shards):
+    """(low, high, count) id bounds covering chunk_size of the shard's doctors each."""
+    last_id = None
+    while True:
+        query = select(Doctor.id).order_by(Doctor.id).limit(chunk_size)
+        if shards > 1:
+            query = query.where(Doctor.id % shards == shard)
+        if last_id is not None:
+            query = query.where(Doctor.id > last_id)
+        chunk = db.execute(query).scalars().all()
+        if not chunk:
+            return
+        yield chunk[0], chunk[-1], len(chunk)
+        last_id = chunk[-1]
+
+
+def reset_all_slots(db, default_template=DEFAULT_SLOT_TEMPLATE, chunk_size=RESET_CHUNK_SIZE, slot_date=None,
+                    shard=0, shards=1):
+    """
+    Reopens the slots of every doctor in the shard for slot_date (today by
+    default), committing after each chunk. Returns the run's statistics.
+    """
+    started = time.monotonic()
+    slot_date = slot_date or date.today()
+    dialect = db.get_bind().dialect.name
+    stats = {"doctors": 0, "slots_deleted": 0, "slots_opened": 0, "chunks": 0}
+
+    for low, high, count in _id_ranges(db, chunk_size, shard, shards):
+        try:
+            deleted, opened = _reset_range(db, dialect, low, high, shard, shards, slot_date, default_template)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.error(f"❌ Slot reset failed for doctors {low}-{high} (shard {shard}/{shards}) after {stats['doctors']} doctors")
+            raise
+        stats["doctors"] += count
+        stats["slots_deleted"] += deleted
+        stats["slots_opened"] += opened
+        stats["chunks"] += 1
+        logger.info(f"🔁 Reset chunk {stats['chunks']} | shard {shard}/{shards} | doctors {low}-{high} | {opened} slots opened")
+
+    stats["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return stats
+
+
+class ResetInProgress(Exception):
+    pass
+
+
+def _start_run(db, run_date, shard, shards):
+    """Creates the shard's run row for the day, already marked running."""
+    try:
+        run = SlotResetRun(run_date=run_date, shard=shard, shards=shards, status="running", started_at=datetime.utcnow())
+        db.add(run)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ResetInProgress(f"Shard {shard}/{shards} for {run_date} was just started elsewhere")
+    return run
+
+
+def _take_over_run(db, run, stale_seconds):
+    """
+    Marks an existing run row running for this caller. One conditional
+    UPDATE, so of two concurrent callers only one gets the row; a run that
+    is still running counts only once it is stale_seconds old.
+    """
+    status, started = run.status, run.started_at
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    claimed = db.execute(
+        update(SlotResetRun)
+        .where(
+            SlotResetRun.id == run.id,
+            or_(SlotResetRun.status != "running", SlotResetRun.started_at.is_(None), SlotResetRun.started_at < cutoff),
+        )
+        .values(status="running", started_at=datetime.utcnow(), finished_at=None)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        raise ResetInProgress(f"Shard {run.shard}/{run.shards} for {run.run_date} is running (started {started})")
+    if status == "running":
+        logger.warning(f"⚠️ Taking over slot reset shard {run.shard}/{run.shards} for {run.run_date}, stale since {started}")
+
+
+def reset_shard(db, run_date=None, shard=0, shards=1, force=False, stale_seconds=SLOT_RESET_STALE_SECONDS):
+    """
+    Idempotent daily reset of one shard. Returns (stats, skipped): when the
+    shard already completed for run_date (and force is False) the recorded
+    stats are returned and nothing is touched. Raises ResetInProgress while
+    another call is resetting the shard.
+    """
+    if shards < 1 or not 0 <= shard < shards:
+        raise ValueError("shard must satisfy 0 <= shard < shards")
+    run_date = run_date or date.today()
+
+    run = db.query(SlotResetRun).filter_by(run_date=run_date, shard=shard, shards=shards).first()
+    if run is None:
+        run = _start_run(db, run_date, shard, shards)
+    elif run.status == "completed" and not force:
+        logger.info(f"⏭️ Slot reset shard {shard}/{shards} already completed for {run_date}")
+        return run.stats, True
+    else:
+        _take_over_run(db, run, stale_seconds)
+
+    try:
+        stats = reset_all_slots(db, slot_date=run_date, shard=shard, shards=shards)
+    except Exception as e:
+        db.rollback()
+        run.status, run.stats, run.finished_at = "failed", {"error": str(e)}, datetime.utcnow()
+        db.commit()
+        raise
+
+    run.status, run.stats, run.finished_at = "completed", stats, datetime.utcnow()
+    db.commit()
+    return stats, False
@@ -0,0 +1,213 @@
+from datetime import date, datetime
+from sqlalchemy import select, update, delete, insert, func, exists, literal, DateTime
+from models import Doctor, DoctorSlot, Patient, Appointment
+
+# ---------------------------------------------------------------------
+# 🧩 SLOT RESERVATION ENGINE
+# ---------------------------------------------------------------------
+# doctor_slots holds one row per bookable slot. A booking claims its row
+# with a single conditional UPDATE, so bookings for different slots of the
+# same doctor never contend on the doctor row or on a Redis lock.
+#
+# Statement builders are shared by the sync routes and async_routes.py;
+# the sync helpers below execute them on a regular Session.
+#
+# A booking is one statement on Postgres: a data-modifying CTE claims the
+# slot and the INSERT ... SELECT creates the appointment for the patient
+# found by user_id, RETURNING the new ids. The conditional UPDATE already
+# locks the slot row, so no separate SELECT ... FOR UPDATE is needed.
+# Databases without data-modifying CTEs (SQLite) run the same two parts
+# as two statements.
+#
+# The daily reset replaces a doctor's rows with ones dated its run date,
+# but leftovers from another date can coexist with them. A booking claims
+# exactly one row per (doctor, time), the newest, so it never flips an old
+# row along with the current one; the appointment is for today.
+
+SLOT_FREE = "free"
+SLOT_BOOKED = "booked"
+DEFAULT_SLOT_TEMPLATE = ["09:00", "09:30", "10:00", "10:30", "11:00"]
+
+
+def _free_slot_id(doctor_id: int, slot_time: str):
+    """Id of the newest free row for the slot; rows locked by another booking are skipped."""
+    return (
+        select(DoctorSlot.id)
+        .where(
+            DoctorSlot.doctor_id == doctor_id,
+            DoctorSlot.slot_time == slot_time,
+            DoctorSlot.state == SLOT_FREE,
+        )
+        .order_by(DoctorSlot.slot_date.desc())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+
+def reserve_statement(doctor_id: int, slot_time: str):
+    """UPDATE ... SET state='booked' WHERE id = (newest free row) RETURNING id."""
+    return (
+        update(DoctorSlot)
+        .where(DoctorSlot.id == _free_slot_id(doctor_id, slot_time), DoctorSlot.state == SLOT_FREE)
+        .values(state=SLOT_BOOKED)
+        .returning(DoctorSlot.id)
+    )
+
+
+def doctor_count_statement(doctor_id: int):
+    return select(func.count()).select_from(Doctor).where(Doctor.id == doctor_id)
+
+
+def _patient_exists(user_id):
+    return exists().where(Patient.user_id == user_id)
+
+
+def appointment_statement(doctor_id, user_id, appointment_time: datetime, source=None):
+    """INSERT INTO appointments SELECT ... FROM patients WHERE user_id = ... RETURNING id, patient_id."""
+    rows = select(
+        doctor_id,
+        Patient.id,
+        literal(appointment_time, DateTime),
+        literal("scheduled"),
+        literal(datetime.utcnow(), DateTime),
+    ).where(Patient.user_id == user_id)
+    if source is not None:
+        rows = rows.select_from(source)
+    return (
+        insert(Appointment)
+        .from_select(["doctor_id", "patient_id", "time", "status", "created_at"], rows)
+        .returning(Appointment.id, Appointment.patient_id)
+    )
+
+
+def book_statement(doctor_id: int, slot_time: str, user_id, appointment_time: datetime):
+    """
+    Claims the slot and creates the appointment in one statement (Postgres).
+    Returns (appointment_id, patient_id), or no row if the slot is not free
+    or there is no patient for user_id.
+    """
+    reserved = (
+        reserve_statement(doctor_id, slot_time)
+        .where(_patient_exists(user_id))
+        .returning(DoctorSlot.doctor_id)
+        .cte("reserved_slot")
+    )
+    return appointment_statement(reserved.c.doctor_id, user_id, appointment_time, source=reserved).add_cte(reserved)
+
+
+def booking_failure_statement(doctor_id: int, user_id):
+    """(patient exists, doctor exists) — tells a failed booking's 404s from a taken slot."""
+    return select(_patient_exists(user_id), exists().where(Doctor.id == doctor_id))
+
+
+def supports_single_statement_booking(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def booking_round_trip_budget(db) -> int:
+    """Booking statement(s) + outbox INSERT + COMMIT; a failed booking spends
+    the same on booking statement(s) + booking_failure_statement + ROLLBACK."""
+    return 3 if supports_single_statement_booking(db) else 4
+
+
+def summary_statement(doctor_ids=None):
+    query = select(DoctorSlot.doctor_id, DoctorSlot.slot_time, DoctorSlot.state).order_by(DoctorSlot.slot_time)
+    if doctor_ids is not None:
+        query = query.where(DoctorSlot.doctor_id.in_(doctor_ids))
+    return query
+
+
+def summarize(rows):
+    """Folds (doctor_id, slot_time, state) rows into {doctor_id: (free_times, booked_count)}."""
+    summary = {}
+    for doctor_id, slot_time, state in rows:
+        free, booked = summary.get(doctor_id, ([], 0))
+        if state == SLOT_FREE:
+            free.append(slot_time)
+        else:
+            booked += 1
+        summary[doctor_id] = (free, booked)
+    return summary
+
+
+def serialize_doctors(doctors, summary):
+    result = []
+    for d in doctors:
+        free, booked = summary.get(d.id, ([], 0))
+        result.append(d.to_dict(free, booked))
+    return result
+
+
+def slot_rows(doctor_id: int, times, slot_date=None):
+    slot_date = slot_date or date.today()
+    return [
+        {"doctor_id": doctor_id, "slot_date": slot_date, "slot_time": t, "state": SLOT_FREE}
+        for t in dict.fromkeys(times)
+    ]
+
+# ---------------------------------------------------------------------
+# 🧩 SYNC HELPERS
+# ---------------------------------------------------------------------
+def reserve_slot(db, doctor_id: int, slot_time: str):
+    """Claims a free slot; returns its id, or None if it is not free."""
+    return db.execute(reserve_statement(doctor_id, slot_time)).scalar_one_or_none()
+
+
+def book_slot(db, doctor_id: int, slot_time: str, user_id, appointment_time: datetime):
+    """
+    Claims the slot and inserts the appointment; returns (appointment_id,
+    patient_id), or None if nothing was booked (the caller rolls back).
+    """
+    if supports_single_statement_booking(db):
+        return db.execute(book_statement(doctor_id, slot_time, user_id, appointment_time)).first()
+    if reserve_slot(db, doctor_id, slot_time) is None:
+        return None
+    return db.execute(appointment_statement(literal(doctor_id), user_id, appointment_time)).first()
+
+
+def doctor_summaries(db, doctors):
+    """Serializes doctors with their free slot times and booked count."""
+    if not doctors:
+        return []
+    ids = [d.id for d in doctors]
+    return serialize_doctors(doctors, summarize(db.execute(summary_statement(ids)).all()))
+
+
+def free_slot_times(db, doctor_id: int):
+    free, _ = summarize(db.execute(summary_statement([doctor_id])).all()).get(doctor_id, ([], 0))
+    return free
+
+
+def open_slots(db, doctor_id: int, times, slot_date=None):
+    """Adds free slots for a doctor (no-op for an empty list)."""
+    rows = slot_rows(doctor_id, times, slot_date)
+    if rows:
+        db.execute(insert(DoctorSlot), rows)
+
+
+def replace_free_slots(db, doctor_id: int, times):
+    """Makes `times` the doctor's free slots, leaving booked slots untouched."""
+    booked = set(
+        db.execute(
+            select(DoctorSlot.slot_time).where(DoctorSlot.doctor_id == doctor_id, DoctorSlot.state == SLOT_BOOKED)
+        ).scalars()
+    )
+    db.execute(delete(DoctorSlot).where(DoctorSlot.doctor_id == doctor_id, DoctorSlot.state == SLOT_FREE))
+    open_slots(db, doctor_id, [t for t in times if t not in booked])
+
+
+def backfill_slots(db):
+    """
+    Opens slots from Doctor.available_slots for doctors that have no slot
+    rows yet (rows created before doctor_slots existed, or by older seeds).
+    """
+    missing = db.query(Doctor).filter(~exists().where(DoctorSlot.doctor_id == Doctor.id)).all()
+    for doc in missing:
+        open_slots(db, doc.id, doc.available_slots or [])
+    db.commit()
+    return len(missing)
+
+
+def doctor_exists(db, doctor_id: int) -> bool:
+    return db.execute(doctor_count_statement(doctor_id)).scalar() > 0
@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+
+import fakeredis
+import pytest
+import redis
+import redis.asyncio
+
+# app_service modules are imported flat, the way the services run them
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Environment for the modules below, read once at import time
+_workdir = tempfile.mkdtemp(prefix="app_service_tests_")
+os.environ.update(
+    DB_URL=f"sqlite:///{_workdir}/app.db",
+    SECRET_KEY="test-secret",
+    ALGORITHM="HS256",
+    AUTH_VERIFY_MODE="local",
+    APP_EXECUTION_MODE="sync",
+    SLOT_INVENTORY_MODE="db",
+    LOG_MODE="off",
+    TRACING_EXPORTER="off",
+)
+
+# Every Redis client in the service talks to one in-memory server
+_redis_server = fakeredis.FakeServer()
+redis.Redis = lambda *a, **k: fakeredis.FakeRedis(server=_redis_server, decode_responses=k.get("decode_responses", False))
+redis.asyncio.Redis = lambda *a, **k: fakeredis.FakeAsyncRedis(server=_redis_server, decode_responses=k.get("decode_responses", False))
+
+
+@pytest.fixture
+def db_engine():
+    """A fresh schema per test. app.py reads the database at import, so the tables exist first."""
+    from database import Base, engine
+    import models  # noqa: F401  (registers the tables)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    redis.Redis().flushall()
+
+
+@pytest.fixture
+def client(db_engine):
+    from fastapi.testclient import TestClient
+    import app
+
+    # No `with`: startup hooks (publisher, revocation sync, replica checks) stay off
+    return TestClient(app.app)
@@ -0,0 +1,105 @@
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from jose import jwt
+from sqlalchemy import insert, select, func
+from sqlalchemy.orm import Session
+
+import query_budget
+
+SLOT = "09:00"
+
+
+@pytest.fixture
+def seeded(db_engine):
+    import slots
+    from models import Doctor, DoctorSlot, Patient
+
+    with Session(db_engine) as db:
+        db.add(Doctor(id=1, user_id=1, name="Alice Smith", specialization="Cardiology",
+                      available_slots=[SLOT], daily_limit=1, booked_slots=0))
+        db.add(Patient(id=1, user_id=100, name="John", email="john@example.com", phone="555-0100"))
+        db.flush()
+        db.execute(insert(DoctorSlot), slots.slot_rows(1, [SLOT]))
+        db.commit()
+    return db_engine
+
+
+def token(user_id, role="patient"):
+    claims = {"sub": str(user_id), "role": role, "exp": int(time.time()) + 600}
+    return {"Authorization": f"Bearer {jwt.encode(claims, 'test-secret', algorithm='HS256')}"}
+
+
+def book(client, engine, user_id=100, doctor_id=1):
+    """POST /book, failing the test if the request goes over the /book round-trip budget."""
+    import slots
+
+    with Session(engine) as db:
+        budget = slots.booking_round_trip_budget(db)
+    with query_budget.track("POST /book", budget, mode="raise") as counter:
+        response = client.post("/book", params={"doctor_id": doctor_id, "time": SLOT}, headers=token(user_id))
+    return response, counter
+
+
+def appointment_count(engine):
+    from models import Appointment
+
+    with Session(engine) as db:
+        return db.execute(select(func.count()).select_from(Appointment)).scalar()
+
+
+def test_booking_stays_within_budget(client, seeded):
+    response, counter = book(client, seeded)
+
+    assert response.status_code == 200, response.text
+    assert counter.statements[-1] == "COMMIT"
+    assert appointment_count(seeded) == 1
+
+
+def test_taken_slot_stays_within_budget(client, seeded):
+    assert book(client, seeded)[0].status_code == 200
+
+    response, counter = book(client, seeded)
+
+    assert response.status_code == 400
+    assert "ROLLBACK" in counter.statements
+    assert appointment_count(seeded) == 1
+
+
+def test_missing_patient_stays_within_budget(client, seeded):
+    response, counter = book(client, seeded, user_id=999)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Patient record not found"
+    assert appointment_count(seeded) == 0
+    # The slot was handed back: a real patient can still book it
+    assert book(client, seeded)[0].status_code == 200
+
+
+def test_booking_skips_rows_left_from_an_earlier_day(client, seeded):
+    import slots
+    from models import Appointment, DoctorSlot
+
+    earlier = date.today() - timedelta(days=1)
+    with Session(seeded) as db:
+        db.execute(insert(DoctorSlot), slots.slot_rows(1, [SLOT], slot_date=earlier))
+        db.commit()
+
+    assert book(client, seeded)[0].status_code == 200
+
+    with Session(seeded) as db:
+        states = dict(db.execute(select(DoctorSlot.slot_date, DoctorSlot.state)).all())
+        booked_time = db.execute(select(Appointment.time)).scalar_one()
+    # Only today's row is claimed, and the appointment is never in the past
+    assert states == {earlier: slots.SLOT_FREE, date.today(): slots.SLOT_BOOKED}
+    assert booked_time == datetime.combine(date.today(), datetime.strptime(SLOT, "%H:%M").time())
+
+
+def test_budget_overrun_raises(seeded):
+    from models import Doctor
+
+    with pytest.raises(AssertionError, match=r"budget 1\)"):
+        with query_budget.track("two reads", 1, mode="raise"), Session(seeded) as db:
+            db.get(Doctor, 1)
+            db.get(Doctor, 2)
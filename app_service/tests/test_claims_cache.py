@@ -0,0 +1,49 @@
+import time
+
+from auth_utils import ClaimsCache
+
+
+def claims(sub, ttl=600):
+    return {"sub": sub, "exp": time.time() + ttl}
+
+
+def test_least_recently_used_token_is_evicted():
+    cache = ClaimsCache(max_entries=2)
+    cache.put("a", claims("1"))
+    cache.put("b", claims("2"))
+    assert cache.get("a")["sub"] == "1"  # "b" is now the least recently used
+
+    cache.put("c", claims("3"))
+
+    assert cache.get("b") is None
+    assert [cache.get(t)["sub"] for t in ("a", "c")] == ["1", "3"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entry_expires_at_the_token_exp(monkeypatch):
+    cache = ClaimsCache(max_entries=10)
+    cache.put("a", claims("1", ttl=60))
+    now = time.time()
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+
+def test_expired_or_exp_less_claims_are_not_cached():
+    cache = ClaimsCache(max_entries=10)
+    cache.put("old", claims("1", ttl=-1))
+    cache.put("no-exp", {"sub": "2"})
+
+    assert cache.stats()["size"] == 0
+
+
+def test_revoked_token_is_dropped():
+    cache = ClaimsCache(max_entries=10)
+    cache.put("a", claims("1"))
+
+    cache.invalidate("a")
+
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,37 @@
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+class StalledPublisher:
+    """Confirms events for the 'ok' routing key; never answers for the rest."""
+
+    def publish(self, exchange, routing_key, message, headers=None):
+        future = Future()
+        if routing_key == "ok":
+            future.set_result(True)
+        return future
+
+
+def test_stalled_batch_waits_one_deadline(db_engine, monkeypatch):
+    import outbox_relay
+    from models import OutboxEvent
+
+    with Session(db_engine) as db:
+        for routing_key in ["ok"] + ["stalled"] * 5:
+            db.add(OutboxEvent(exchange="appointments", routing_key=routing_key, payload={}))
+        db.commit()
+    monkeypatch.setattr(outbox_relay, "publisher", StalledPublisher())
+    monkeypatch.setattr(outbox_relay, "OUTBOX_PUBLISH_TIMEOUT", 0.2)
+
+    started = time.monotonic()
+    assert outbox_relay.drain_once() == 1
+    # One deadline for the batch, not one per unconfirmed event
+    assert time.monotonic() - started < 0.2 * 3
+
+    with Session(db_engine) as db:
+        rows = db.execute(select(OutboxEvent.routing_key, OutboxEvent.published_at, OutboxEvent.attempts)).all()
+    assert [(key, published is not None, attempts) for key, published, attempts in rows] == \
+        [("ok", True, 0)] + [("stalled", False, 1)] * 5
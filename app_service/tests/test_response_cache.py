@@ -0,0 +1,51 @@
+import response_cache
+
+
+def test_local_tier_evicts_least_recently_used(monkeypatch, db_engine):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_LOCAL_MAX_ENTRIES", 2)
+    response_cache.invalidate()
+
+    for name in ("doctors:page=1", "doctors:page=2"):
+        response_cache.get_or_build(name, lambda: [name])
+    response_cache.get_or_build("doctors:page=1", lambda: ["rebuilt"])
+    response_cache.get_or_build("doctors:page=3", lambda: ["page 3"])
+
+    assert list(response_cache._local) == ["doctors:page=1", "doctors:page=3"]
+
+
+def test_matching_if_none_match_gets_304(client, db_engine):
+    from sqlalchemy.orm import Session
+    from models import Doctor
+
+    with Session(db_engine) as db:
+        db.add(Doctor(id=1, user_id=1, name="Alice Smith", specialization="Cardiology", available_slots=[]))
+        db.commit()
+    response_cache.invalidate()
+
+    first = client.get("/doctor/specializations")
+    etag = first.headers["ETag"]
+    again = client.get("/doctor/specializations", headers={"If-None-Match": etag})
+    listed = client.get("/doctor/specializations", headers={"If-None-Match": f'"other", {etag}'})
+    stale = client.get("/doctor/specializations", headers={"If-None-Match": '"other"'})
+
+    assert first.status_code == 200 and first.json() == ["Cardiology"]
+    assert again.status_code == 304 and again.content == b"" and again.headers["ETag"] == etag
+    assert listed.status_code == 304
+    assert stale.status_code == 200 and stale.json() == ["Cardiology"]
+
+
+def test_changed_directory_gets_a_new_etag(client, db_engine):
+    from sqlalchemy.orm import Session
+    from models import Doctor
+
+    response_cache.invalidate()
+    etag = client.get("/doctor/specializations").headers["ETag"]
+    with Session(db_engine) as db:
+        db.add(Doctor(id=2, user_id=2, name="Bob Jones", specialization="Dermatology", available_slots=[]))
+        db.commit()
+    response_cache.invalidate()
+
+    response = client.get("/doctor/specializations", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import pika
+
+import retry_topology
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, **kwargs):
+        self.published.append(SimpleNamespace(exchange=exchange, routing_key=routing_key, body=body,
+                                              properties=properties))
+
+
+def test_retried_message_keeps_its_original_routing_key():
+    channel = RecordingChannel()
+    first = SimpleNamespace(exchange="appointments", routing_key="appointment.created")
+    retry_topology.route_failure(channel, "appointment_queue", first, pika.BasicProperties(), b"{}", RuntimeError("db"))
+
+    # The delay queue dead-letters the message back to the queue by name
+    retried = SimpleNamespace(exchange="", routing_key="appointment_queue")
+    properties = channel.published[0].properties
+
+    assert channel.published[0].routing_key == "appointment_queue.retry.1"
+    assert retry_topology.original_routing_key(retried, properties) == "appointment.created"
+
+
+def test_first_delivery_uses_the_delivery_routing_key():
+    method = SimpleNamespace(exchange="users", routing_key="user.created")
+
+    assert retry_topology.original_routing_key(method, pika.BasicProperties()) == "user.created"
+    assert retry_topology.original_routing_key(method, None) == "user.created"
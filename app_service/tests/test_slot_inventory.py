@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import slot_inventory
+
+SLOTS = ["09:00", "09:30"]
+
+
+@pytest.fixture
+def inventory(db_engine, monkeypatch):
+    """Doctor 1 with two free slots, loaded into the Redis inventory."""
+    import slots
+    from models import Doctor, DoctorSlot
+
+    monkeypatch.setattr(slot_inventory, "SLOT_INVENTORY_MODE", "redis")
+    with Session(db_engine) as db:
+        db.add(Doctor(id=1, user_id=1, name="Alice Smith", specialization="Cardiology",
+                      available_slots=SLOTS, daily_limit=2, booked_slots=0))
+        db.flush()
+        db.execute(insert(DoctorSlot), slots.slot_rows(1, SLOTS))
+        db.commit()
+        slot_inventory.sync_doctor(db, 1)
+    return db_engine
+
+
+def test_claim_exhausts_the_inventory(inventory):
+    assert [slot_inventory.claim(1, t) for t in SLOTS] == [slot_inventory.CLAIMED] * 2
+    # Sold out: the doctor is still known, every slot is taken
+    assert slot_inventory.claim(1, "09:00") == slot_inventory.TAKEN
+    assert slot_inventory.claim(1, "09:30") == slot_inventory.TAKEN
+
+
+def test_release_puts_a_claimed_slot_back(inventory):
+    assert slot_inventory.claim(1, "09:00") == slot_inventory.CLAIMED
+
+    slot_inventory.release(1, "09:00")
+
+    assert slot_inventory.claim(1, "09:00") == slot_inventory.CLAIMED
+
+
+def test_unloaded_doctor_is_unknown(inventory):
+    assert slot_inventory.claim(2, "09:00") == slot_inventory.UNKNOWN
+    # Releasing into a missing inventory must not create a partial one
+    slot_inventory.release(2, "09:00")
+    assert slot_inventory.claim(2, "09:00") == slot_inventory.UNKNOWN
+
+
+def test_async_claim_and_release(inventory):
+    import asyncio
+
+    async def scenario():
+        first = await slot_inventory.claim_async(1, "09:00")
+        second = await slot_inventory.claim_async(1, "09:00")
+        await slot_inventory.release_async(1, "09:00")
+        return first, second, await slot_inventory.claim_async(1, "09:00")
+
+    assert asyncio.run(scenario()) == (slot_inventory.CLAIMED, slot_inventory.TAKEN, slot_inventory.CLAIMED)
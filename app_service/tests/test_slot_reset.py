@@ -0,0 +1,52 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+RUN_DATE = date(2026, 1, 5)
+
+
+def add_run(engine, status, started_at):
+    from models import SlotResetRun
+
+    with Session(engine) as db:
+        db.add(SlotResetRun(run_date=RUN_DATE, shard=0, shards=2, status=status, started_at=started_at))
+        db.commit()
+
+
+def run_status(engine):
+    from models import SlotResetRun
+
+    with Session(engine) as db:
+        return db.query(SlotResetRun).filter_by(run_date=RUN_DATE, shard=0, shards=2).one().status
+
+
+def test_running_shard_is_not_reset_again(db_engine):
+    import slot_reset
+
+    add_run(db_engine, "running", datetime.utcnow())
+
+    with Session(db_engine) as db, pytest.raises(slot_reset.ResetInProgress):
+        slot_reset.reset_shard(db, RUN_DATE, shard=0, shards=2, force=True)
+    assert run_status(db_engine) == "running"
+
+
+def test_stale_running_shard_is_taken_over(db_engine):
+    import slot_reset
+
+    add_run(db_engine, "running", datetime.utcnow() - timedelta(seconds=slot_reset.SLOT_RESET_STALE_SECONDS + 60))
+
+    with Session(db_engine) as db:
+        stats, skipped = slot_reset.reset_shard(db, RUN_DATE, shard=0, shards=2)
+    assert not skipped
+    assert run_status(db_engine) == "completed"
+
+
+def test_completed_shard_is_skipped(db_engine):
+    import slot_reset
+
+    with Session(db_engine) as db:
+        first, _ = slot_reset.reset_shard(db, RUN_DATE, shard=0, shards=2)
+        again, skipped = slot_reset.reset_shard(db, RUN_DATE, shard=0, shards=2)
+    assert skipped
+    assert again == first
@@ -0,0 +1,51 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+
+def doctor_event(user_id, name):
+    return {"user_id": user_id, "role": "doctor", "email": f"{name}@hospital.com",
+            "profile": {"name": name, "specialization": "Cardiology"}}
+
+
+def patient_event(user_id, name):
+    return {"user_id": user_id, "role": "patient", "email": f"{name}@example.com", "profile": {"name": name}}
+
+
+def counts(engine):
+    from models import Doctor, DoctorSlot, Patient
+
+    with Session(engine) as db:
+        return {
+            model.__tablename__: db.execute(select(func.count()).select_from(model)).scalar()
+            for model in (Doctor, Patient, DoctorSlot)
+        }
+
+
+def test_duplicate_user_ids_in_a_batch_are_written_once(db_engine):
+    import consumer
+    import slots
+
+    consumer.handle_user_created_batch([
+        doctor_event(1, "alice"),
+        patient_event(100, "john"),
+        doctor_event(1, "alice"),    # redelivered in the same batch
+        patient_event(100, "john"),
+        patient_event(101, "jane"),
+    ])
+
+    assert counts(db_engine) == {
+        "doctors": 1, "patients": 2, "doctor_slots": len(slots.DEFAULT_SLOT_TEMPLATE),
+    }
+
+
+def test_replayed_batch_does_not_duplicate_users_or_slots(db_engine):
+    import consumer
+
+    batch = [doctor_event(1, "alice"), patient_event(100, "john")]
+    consumer.handle_user_created_batch(batch)
+    before = counts(db_engine)
+
+    # ON CONFLICT DO NOTHING: rows from the first delivery are left alone
+    consumer.handle_user_created_batch(batch + [patient_event(101, "jane")])
+
+    assert counts(db_engine) == {**before, "patients": before["patients"] + 1}
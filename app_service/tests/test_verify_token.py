@@ -0,0 +1,50 @@
+import time
+
+from fastapi import HTTPException
+from jose import jwt
+
+import auth_utils
+
+
+def token(user_id, role="patient"):
+    claims = {"sub": str(user_id), "role": role, "exp": int(time.time()) + 600}
+    return {"Authorization": f"Bearer {jwt.encode(claims, 'test-secret', algorithm='HS256')}"}
+
+
+def test_revocation_outage_is_503_not_401(client, db_engine, monkeypatch):
+    def unavailable(token):
+        raise HTTPException(status_code=503, detail="Token revocation state unavailable")
+
+    monkeypatch.setattr(auth_utils.revocation_cache, "is_revoked", unavailable)
+
+    response = client.get("/patient", headers=token(100))
+
+    assert response.status_code == 503
+
+
+def test_bad_token_is_still_401(client, db_engine):
+    response = client.get("/patient", headers={"Authorization": "Bearer not-a-jwt"})
+
+    assert response.status_code == 401
+
+
+def test_stale_revocation_lookup_runs_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    class RecordingRedis:
+        def exists(self, key):
+            lookups.append(threading.current_thread())
+            return 0
+
+    lookups = []
+    monkeypatch.setattr(auth_utils.revocation_cache, "_heartbeat", 0.0)
+    monkeypatch.setattr(auth_utils.revocation_cache, "_redis", RecordingRedis)
+
+    async def verify():
+        return await auth_utils.verify_token_async(token(100)["Authorization"]), threading.current_thread()
+
+    payload, loop_thread = asyncio.run(verify())
+
+    assert payload["sub"] == "100"
+    assert len(lookups) == 1 and lookups[0] is not loop_thread
@@ -1,15 +1,20 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Header
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import Base, engine, get_db
+from database import Base, engine, get_db, pool_stats
 from models import User
 from schemas import UserCreate, Token, UserLogin
-from auth_utils import hash_password, verify_password, create_access_token, verify_token
+from auth_utils import create_access_token, verify_token
+from password_pool import password_pool, PasswordPoolBusy
 from datetime import timedelta
-import pika, json, os
-from pika import BasicProperties
+import json, os
 from datetime import datetime
 import logging
+from mediqueue_common import logging_setup
+import metrics
+from mediqueue_common import tracing
 import redis
+from mediqueue_common.event_publisher import publisher
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -29,7 +34,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+# Outermost, so the access record covers everything below it
+app.add_middleware(logging_setup.RequestLogMiddleware)
 
 
 # Create tables
@@ -38,29 +48,50 @@ Base.metadata.create_all(bind=engine)
 # ---------------------------------------------------------------------
 # 🧩 LOGGING CONFIGURATION
 # ---------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler("auth_service.log"),
-        logging.StreamHandler()
-    ]
-)
+logging_setup.configure("auth_service", "auth_service.log")
+tracing.configure("auth_service")
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------
+# 🧩 RABBITMQ PUBLISHER (long-lived, shared by all requests)
+# ---------------------------------------------------------------------
+publisher.declare_exchange("users", "topic")
+
+@app.on_event("startup")
+def start_event_publisher():
+    publisher.start()
+
+@app.on_event("shutdown")
+def stop_event_publisher():
+    publisher.close()
+
+# ---------------------------------------------------------------------
+# 🧩 PASSWORD POOL (bcrypt in worker processes)
+# ---------------------------------------------------------------------
+@app.on_event("startup")
+def start_password_pool():
+    password_pool.start()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    password_pool.close()
+
+def password_pool_busy(busy: PasswordPoolBusy):
+    logger.warning(f"🚦 Password pool over its wait budget — rejecting request ({busy})")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many logins in progress, please retry",
+        headers={"Retry-After": str(busy.retry_after)},
+    )
+
 @app.get("/")
 def home():
     return {"message": "Auth service is running"}
 
 
 def publish_user_created_event(user, profile):
-    """Publishes a 'user.created' event to the RabbitMQ exchange."""
+    """Queues a 'user.created' event on the shared RabbitMQ publisher."""
     try:
-        rabbit_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
-        connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbit_host))
-        channel = connection.channel()
-        channel.exchange_declare(exchange="users", exchange_type="topic", durable=True)
-
         event = {
             "event": "user.created",
             "user_id": user.id,
@@ -70,14 +101,9 @@ def publish_user_created_event(user, profile):
             "timestamp": datetime.utcnow().isoformat()
         }
 
-        channel.basic_publish(
-            exchange="users",
-            routing_key="user.created",
-            body=json.dumps(event),
-            properties=BasicProperties(delivery_mode=2),
-        )
-        logger.info(f"📤 Published event to RabbitMQ: {event}")
-        connection.close()
+        # The consumer continues the /register trace from the message headers
+        publisher.publish("users", "user.created", event, headers=tracing.inject() or None)
+        logger.info(f"📤 Queued event for RabbitMQ: {event}")
     except Exception as e:
         logger.error(f"❌ Failed to publish user.created event: {e}")
 
@@ -85,22 +111,35 @@ def publish_user_created_event(user, profile):
 # ---------------------------------------------------------------------
 # 🧩 REGISTER ENDPOINT
 # ---------------------------------------------------------------------
+# /register and /login are async: bcrypt is awaited from the password
+# pool and the (short) database calls go to the threadpool, so neither
+# holds a worker thread while a hash is being computed.
+def find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+def save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
 @app.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     logger.info(f"🧾 Registration request received for {user.email} (role={user.role})")
 
     # Check for existing user
-    existing = db.query(User).filter(User.email == user.email).first()
+    existing = await run_in_threadpool(find_user, db, user.email)
     if existing:
         logger.warning(f"⚠️ Registration failed — Email already registered: {user.email}")
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Hash password and store user
-    hashed_pw = hash_password(user.password)
+    try:
+        hashed_pw = await password_pool.hash(user.password)
+    except PasswordPoolBusy as busy:
+        raise password_pool_busy(busy)
     new_user = User(email=user.email, hashed_password=hashed_pw, role=user.role)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(save_user, db, new_user)
     logger.info(f"✅ User created successfully in DB with ID {new_user.id}")
 
     # Prepare profile data (optional)
@@ -120,11 +159,23 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 # ---------------------------------------------------------------------
 # 🧩 LOGIN ENDPOINT (with Logging)
 # ---------------------------------------------------------------------
+def store_rehash(db: Session, db_user: User, new_hash: str):
+    """Best effort: a failed write only means the upgrade is retried on the next login."""
+    user_id = db_user.id
+    try:
+        db_user.hashed_password = new_hash
+        db.commit()
+        metrics.PASSWORD_REHASHES.inc()
+        logger.info(f"🔁 Password rehashed with the current bcrypt cost for user_id={user_id}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Failed to store rehashed password for user_id={user_id}: {e}")
+
 @app.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
     logger.info(f"🔐 Login attempt for {user.email}")
 
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await run_in_threadpool(find_user, db, user.email)
 
     # Invalid email
     if not db_user:
@@ -135,17 +186,27 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         )
 
     # Invalid password
-    if not verify_password(user.password, db_user.hashed_password):
+    try:
+        valid, new_hash = await password_pool.verify(user.password, db_user.hashed_password)
+    except PasswordPoolBusy as busy:
+        raise password_pool_busy(busy)
+    if not valid:
         logger.warning(f"❌ Login failed — Incorrect password for {user.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
 
+    user_id, role = db_user.id, db_user.role
+
+    # Hash made with an older BCRYPT_ROUNDS: store the upgraded one
+    if new_hash:
+        await run_in_threadpool(store_rehash, db, db_user, new_hash)
+
     # Create JWT
-    token_data = {"sub": str(db_user.id), "role": db_user.role}
+    token_data = {"sub": str(user_id), "role": role}
     token = create_access_token(token_data)
-    logger.info(f"✅ Login successful | user_id={db_user.id}, role={db_user.role}")
+    logger.info(f"✅ Login successful | user_id={user_id}, role={role}")
 
     return {"access_token": token, "token_type": "bearer"}
 
@@ -158,7 +219,9 @@ def verify_token_endpoint(Authorization: str = Header(None)):
     
     token = Authorization.split(" ")[1]
     # 🚨 Check if token is blacklisted
-    if r.get(f"blacklist:{token}"):
+    with tracing.span("redis GET blacklist", **{"db.system": "redis"}):
+        blacklisted = r.get(f"blacklist:{token}")
+    if blacklisted:
         logger.warning("🚫 Attempt to use blacklisted token")
         raise HTTPException(status_code=401, detail="Token is blacklisted (logged out)")
 
@@ -170,3 +233,13 @@ def verify_token_endpoint(Authorization: str = Header(None)):
 @app.get("/healthz")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.metrics_response()
+
+@app.get("/metrics/db-pool")
+def get_db_pool_stats():
+    stats = pool_stats(engine)
+    stats["max_connections"] = stats.get("size", 0) + stats.get("max_overflow", 0)
+    return stats
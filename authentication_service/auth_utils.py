@@ -2,20 +2,22 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 import os
+import metrics
 
 
 
 SECRET_KEY = os.getenv("SECRET_KEY", "xyz")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+# bcrypt cost (log2 of the key-expansion rounds); each +1 doubles the CPU per
+# hash. Hashes made with another cost are rehashed on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated = "auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated = "auto", bcrypt__rounds = BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plan_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plan_password, hashed_password)
+    with metrics.PASSWORD_HASH_DURATION.labels("hash").time():
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -0,0 +1,24 @@
+from prometheus_client import Counter, Gauge, Histogram
+# Shared HTTP metrics, re-exported for app.py
+from mediqueue_common.metrics import LATENCY_BUCKETS, MetricsMiddleware, metrics_response  # noqa: F401
+
+# ---------------------------------------------------------------------
+# 🧩 PROMETHEUS METRICS
+# ---------------------------------------------------------------------
+# Served on GET /metrics. HTTP request metrics and the middleware live in
+# mediqueue_common.metrics.
+
+# bcrypt dominates /login and /register, so it gets its own timer
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify latency", ["operation"], buckets=LATENCY_BUCKETS,
+)
+PASSWORD_POOL_WAIT = Histogram(
+    "password_pool_wait_seconds", "Time a bcrypt job waited for a free password pool process",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+PASSWORD_POOL_PENDING = Gauge("password_pool_pending", "bcrypt jobs queued or running in the password pool")
+PASSWORD_POOL_JOB_SECONDS = Gauge("password_pool_job_seconds", "Running estimate of one bcrypt call, used for admission")
+PASSWORD_POOL_REJECTED = Counter(
+    "password_pool_rejected_total", "Logins/registrations turned away because the password pool was full", ["operation"],
+)
+PASSWORD_REHASHES = Counter("password_rehashes_total", "Password hashes upgraded to BCRYPT_ROUNDS on login")
@@ -0,0 +1,152 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import auth_utils
+import metrics
+
+# ---------------------------------------------------------------------
+# 🧩 PASSWORD POOL (bcrypt off the request workers)
+# ---------------------------------------------------------------------
+# One bcrypt hash/verify is ~100–300 ms of pure CPU. Run on the API's
+# threadpool, a login storm holds every worker thread (and the GIL), and
+# /verify-token — called by app_service on every request — queues behind
+# it. /login and /register therefore hand bcrypt to a small process pool
+# and await the result, so the event loop and the threadpool stay free.
+#
+# PASSWORD_POOL_WORKERS: bcrypt processes (0 = run in the threadpool, as
+#   before; for tiny deployments and scripts).
+# PASSWORD_POOL_MAX_WAIT_SECONDS: admission is a queue-wait budget. A job
+#   is accepted while the backlog ahead of it (pending jobs / workers x
+#   the measured time per bcrypt call) would start it within this many
+#   seconds, so a burst is queued as long as its logins still finish in
+#   reasonable time, however slow the CPU or high BCRYPT_ROUNDS. Past
+#   that, /login and /register answer 503 with a Retry-After of roughly
+#   how long the excess backlog takes to clear.
+# PASSWORD_POOL_MAX_PENDING: hard cap on queued + running jobs, whatever
+#   the estimate says.
+logger = logging.getLogger(__name__)
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_POOL_MAX_WAIT_SECONDS = float(os.getenv("PASSWORD_POOL_MAX_WAIT_SECONDS", 5))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 256))
+
+# Weight of the newest bcrypt timing in the running estimate
+_SMOOTHING = 0.2
+
+
+class PasswordPoolBusy(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Run inside the pool's processes: plain passlib calls, no metrics (those
+# would land in the child's registry, which nobody scrapes). Each returns
+# (result, seconds of bcrypt work) so the parent can price the queue.
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _hash(password):
+    return _timed(auth_utils.pwd_context.hash, password)
+
+
+def _verify_and_update(password, hashed):
+    return _timed(auth_utils.pwd_context.verify_and_update, password, hashed)
+
+
+def _warm():
+    # Also a first measurement of the bcrypt cost on this CPU
+    return _hash("warm-up")[1]
+
+
+class PasswordPool:
+    """
+    Bounded bcrypt executor shared by the /login and /register handlers.
+
+    hash() and verify() are awaited from the event loop; admission is
+    checked before anything is queued, so a rejected request costs no
+    bcrypt work at all.
+    """
+
+    def __init__(self, workers=PASSWORD_POOL_WORKERS, max_wait=PASSWORD_POOL_MAX_WAIT_SECONDS,
+                 max_pending=PASSWORD_POOL_MAX_PENDING):
+        self.workers = workers
+        # Threadpool mode: bcrypt releases the GIL, so up to one call per core
+        self.parallelism = workers if workers > 0 else (os.cpu_count() or 1)
+        self.max_wait = max_wait
+        self.max_pending = max(1, max_pending)
+        self._executor = None
+        # Only touched from the event loop thread
+        self._pending = 0
+        self._job_seconds = None
+
+    def start(self):
+        if self._executor or self.workers <= 0:
+            return
+        # Forkserver children start from a clean process, not a fork of one
+        # running the publisher, logging and tracing threads
+        context = multiprocessing.get_context("forkserver")
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        # Start every process now so the first logins don't pay for it
+        for future in [self._executor.submit(_warm) for _ in range(self.workers)]:
+            self._observe(future.result())
+        logger.info(f"🔐 Password pool started | workers={self.workers}, max_wait={self.max_wait}s, "
+                    f"bcrypt_rounds={auth_utils.BCRYPT_ROUNDS}, bcrypt_ms={self._job_seconds * 1000:.0f}")
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _observe(self, seconds):
+        if self._job_seconds is None:
+            self._job_seconds = seconds
+        else:
+            self._job_seconds += _SMOOTHING * (seconds - self._job_seconds)
+        metrics.PASSWORD_POOL_JOB_SECONDS.set(self._job_seconds)
+
+    def expected_wait(self):
+        """Seconds a job submitted now would wait for a free process (0 before the first timing)."""
+        return self._pending / self.parallelism * (self._job_seconds or 0)
+
+    def _admit(self, operation):
+        wait = self.expected_wait()
+        if self._pending < self.max_pending and wait <= self.max_wait:
+            return
+        metrics.PASSWORD_POOL_REJECTED.labels(operation).inc()
+        retry_after = max(1, math.ceil(wait - self.max_wait))
+        raise PasswordPoolBusy(f"{self._pending} password jobs pending (~{wait:.1f}s wait)", retry_after)
+
+    async def _run(self, operation, fn, *args):
+        self._admit(operation)
+        self._pending += 1
+        metrics.PASSWORD_POOL_PENDING.inc()
+        started = time.perf_counter()
+        try:
+            # executor None: the loop's default threadpool (workers=0)
+            result, seconds = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            metrics.PASSWORD_POOL_PENDING.dec()
+        metrics.PASSWORD_HASH_DURATION.labels(operation).observe(seconds)
+        # Whatever the round trip took beyond the bcrypt call itself
+        metrics.PASSWORD_POOL_WAIT.labels(operation).observe(max(0.0, time.perf_counter() - started - seconds))
+        self._observe(seconds)
+        return result
+
+    async def hash(self, password):
+        return await self._run("hash", _hash, password)
+
+    async def verify(self, password, hashed):
+        """(valid, new_hash); new_hash is set when the stored cost differs from BCRYPT_ROUNDS."""
+        return await self._run("verify", _verify_and_update, password, hashed)
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# authentication_service modules are imported flat, the way the service runs them
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Environment for the modules below, read once at import time
+os.environ.update(
+    BCRYPT_ROUNDS="4",
+    LOG_MODE="off",
+    TRACING_EXPORTER="off",
+)
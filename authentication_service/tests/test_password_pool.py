@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import metrics
+from password_pool import PasswordPool, PasswordPoolBusy
+
+
+def pool(pending, job_seconds=1.0, workers=2, max_wait=5.0, max_pending=256):
+    """A pool with `pending` jobs in flight, each priced at job_seconds of bcrypt."""
+    p = PasswordPool(workers=workers, max_wait=max_wait, max_pending=max_pending)
+    p._pending, p._job_seconds = pending, job_seconds
+    return p
+
+
+def rejected(operation):
+    return metrics.PASSWORD_POOL_REJECTED.labels(operation)._value.get()
+
+
+def test_admitted_while_the_queue_fits_the_wait_budget():
+    # 10 jobs over 2 processes at 1 s each: the next one starts in 5 s
+    pool(pending=10)._admit("verify")
+
+
+def test_rejected_past_the_wait_budget_with_retry_after():
+    before = rejected("verify")
+
+    with pytest.raises(PasswordPoolBusy) as busy:
+        pool(pending=20)._admit("verify")
+
+    # 10 s of backlog against a 5 s budget
+    assert busy.value.retry_after == 5
+    assert rejected("verify") == before + 1
+
+
+def test_barely_over_budget_still_says_retry_in_a_second():
+    with pytest.raises(PasswordPoolBusy) as busy:
+        pool(pending=11)._admit("hash")
+
+    assert busy.value.retry_after == 1
+
+
+def test_hard_cap_applies_whatever_the_estimate():
+    with pytest.raises(PasswordPoolBusy):
+        pool(pending=8, job_seconds=0.001, max_pending=8)._admit("hash")
+
+
+def test_unmeasured_pool_admits_up_to_the_cap():
+    pool(pending=100, job_seconds=None)._admit("hash")
+
+
+def test_rejected_job_costs_no_bcrypt_work(monkeypatch):
+    calls = []
+    p = pool(pending=20, workers=0)
+    monkeypatch.setattr(p, "_observe", calls.append)
+
+    with pytest.raises(PasswordPoolBusy):
+        asyncio.run(p.hash("secret"))
+
+    assert calls == [] and p._pending == 20
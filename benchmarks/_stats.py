@@ -0,0 +1,7 @@
+"""Summary statistics shared by the benchmark and report scripts."""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile (pct in 0-100) of a non-empty sequence."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,255 @@
+"""
+In-memory stand-in for the slice of pika's BlockingConnection API used by
+app_service/consumer.py and the services' event publishers, for
+benchmarks that should not need RabbitMQ.
+
+It models what matters for consumer throughput and retries: direct/topic
+routing on exact keys, per-consumer prefetch (basic_qos), delivery tags,
+ack/nack (including multiple=True), add_callback_threadsafe, passive
+queue_declare (message_count), and queue x-message-ttl with
+x-dead-letter-exchange / x-dead-letter-routing-key. tx_select/tx_commit
+are accepted but publishes are applied immediately.
+Nothing is persisted and there is no network latency.
+"""
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+Method = namedtuple("Method", "delivery_tag routing_key exchange redelivered consumer_tag")
+DeclareOk = namedtuple("DeclareOk", "queue message_count consumer_count")
+Frame = namedtuple("Frame", "method")
+
+
+class Broker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues = {}        # name -> deque of (exchange, routing_key, body, properties)
+        self.arguments = {}     # name -> queue arguments
+        self.bindings = []      # (exchange, queue, routing_key)
+        self.expiry = {}        # name -> deque of expiry times, parallel to queues[name] (TTL queues)
+        self.consumed = set()
+        self.stop_when_drained = True
+        self.acked = 0
+        self.nacked = 0
+
+    def declare_queue(self, name, arguments=None):
+        with self.lock:
+            self.queues.setdefault(name, deque())
+            self.arguments[name] = arguments or {}
+
+    def bind(self, exchange, name, routing_key):
+        with self.lock:
+            self.bindings.append((exchange, name, routing_key))
+
+    def publish(self, exchange, routing_key, body, properties=None):
+        with self.lock:
+            self._route(exchange, routing_key, body, properties)
+
+    def _route(self, exchange, routing_key, body, properties):
+        if exchange == "":
+            targets = [routing_key]
+        else:
+            targets = [q for e, q, key in self.bindings if e == exchange and key in (routing_key, "#")]
+        for name in targets:
+            self.queues.setdefault(name, deque()).append((exchange, routing_key, body, properties))
+            ttl = self.arguments.get(name, {}).get("x-message-ttl")
+            if ttl is not None:
+                self.expiry.setdefault(name, deque()).append(time.monotonic() + ttl / 1000)
+
+    def expire(self):
+        """Dead-letters messages whose queue TTL has passed."""
+        with self.lock:
+            now = time.monotonic()
+            for name, deadlines in self.expiry.items():
+                arguments = self.arguments.get(name, {})
+                while deadlines and deadlines[0] <= now:
+                    deadlines.popleft()
+                    exchange, routing_key, body, properties = self.queues[name].popleft()
+                    if "x-dead-letter-exchange" in arguments:
+                        self._route(
+                            arguments["x-dead-letter-exchange"],
+                            arguments.get("x-dead-letter-routing-key", routing_key),
+                            body,
+                            properties,
+                        )
+
+    def preload(self, name, bodies, exchange="", routing_key=None):
+        self.declare_queue(name, self.arguments.get(name))
+        with self.lock:
+            self.queues[name].extend((exchange, routing_key or name, body, None) for body in bodies)
+
+    def pending(self):
+        """Messages still headed for a consumer (consumed queues plus TTL queues)."""
+        with self.lock:
+            return sum(len(q) for name, q in self.queues.items() if name in self.consumed or name in self.expiry)
+
+    def depth(self, name):
+        with self.lock:
+            return len(self.queues.get(name, ()))
+
+
+class StandInChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.is_open = True
+        self.prefetch = 0
+        self._consumers = []    # (queue, callback, tag)
+        self._unacked = {}      # delivery_tag -> (consumer index, message)
+        self._next_tag = 1
+        self._stopping = False
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    # -- topology ------------------------------------------------------
+    def exchange_declare(self, exchange, exchange_type="topic", durable=False, **kwargs):
+        pass
+
+    def queue_declare(self, queue, durable=False, arguments=None, passive=False, **kwargs):
+        if not passive:
+            self.broker.declare_queue(queue, arguments)
+        return Frame(DeclareOk(queue, self.broker.depth(queue), 0))
+
+    def queue_bind(self, queue, exchange, routing_key=None, **kwargs):
+        self.broker.bind(exchange, queue, routing_key)
+
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, **kwargs):
+        tag = f"ctag-{len(self._consumers) + 1}"
+        self._consumers.append((queue, on_message_callback, tag))
+        self.broker.consumed.add(queue)
+        return tag
+
+    def confirm_delivery(self):
+        pass
+
+    def tx_select(self):
+        pass
+
+    def tx_commit(self):
+        pass
+
+    # -- messages ------------------------------------------------------
+    def basic_publish(self, exchange, routing_key, body, properties=None, **kwargs):
+        self.broker.publish(exchange, routing_key, body, properties)
+
+    def basic_get(self, queue, auto_ack=False):
+        with self.broker.lock:
+            if not self.broker.queues.get(queue):
+                return None, None, None
+            message = self.broker.queues[queue].popleft()
+        exchange, routing_key, body, properties = message
+        delivery_tag = self._next_tag
+        self._next_tag += 1
+        if not auto_ack:
+            self._unacked[delivery_tag] = (None, (queue, message))
+        return Method(delivery_tag, routing_key, exchange, False, None), properties, body
+
+    def _settle(self, delivery_tag, multiple):
+        tags = [t for t in self._unacked if t <= delivery_tag] if multiple else [delivery_tag]
+        return [self._unacked.pop(t) for t in tags if t in self._unacked]
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self.broker.acked += len(self._settle(delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        for _, (name, message) in self._settle(delivery_tag, multiple):
+            self.broker.nacked += 1
+            if requeue:
+                self.broker.queues[name].appendleft(message)
+
+    def basic_reject(self, delivery_tag=0, requeue=True):
+        self.basic_nack(delivery_tag, requeue=requeue)
+
+    def _in_flight(self, index):
+        return sum(1 for consumer, _ in self._unacked.values() if consumer == index)
+
+    def _deliver(self):
+        delivered = False
+        for index, (name, callback, tag) in enumerate(self._consumers):
+            while not self.prefetch or self._in_flight(index) < self.prefetch:
+                with self.broker.lock:
+                    if not self.broker.queues.get(name):
+                        break
+                    message = self.broker.queues[name].popleft()
+                delivery_tag = self._next_tag
+                self._next_tag += 1
+                self._unacked[delivery_tag] = (index, (name, message))
+                exchange, routing_key, body, properties = message
+                callback(self, Method(delivery_tag, routing_key, exchange, False, tag), properties, body)
+                delivered = True
+        return delivered
+
+    def start_consuming(self):
+        # Like pika, one start_consuming() drives every channel's consumers
+        channels = self.connection.channels
+        while not self._stopping:
+            self.broker.expire()
+            delivered = any([channel._deliver() for channel in channels])
+            self.connection.process_data_events(time_limit=0 if delivered else 0.001)
+            if self.broker.stop_when_drained and self.broker.pending() == 0:
+                self.connection.process_data_events(time_limit=0)
+                if self.broker.pending() == 0 and not any(channel._unacked for channel in channels):
+                    break
+
+    def stop_consuming(self):
+        self._stopping = True
+
+    def close(self):
+        self.is_open = False
+
+
+class StandInConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.channels = []
+        self._callbacks = queue.Queue()
+
+    def channel(self):
+        channel = StandInChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def add_callback_threadsafe(self, callback):
+        if not self.is_open:
+            raise RuntimeError("connection is closed")
+        self._callbacks.put(callback)
+
+    def call_later(self, delay, callback):
+        timer = threading.Timer(delay, self.add_callback_threadsafe, args=(callback,))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def remove_timeout(self, timer):
+        timer.cancel()
+
+    def process_data_events(self, time_limit=0):
+        """Runs queued thread-safe callbacks, waiting up to time_limit for the first."""
+        deadline = time.monotonic() + (time_limit or 0)
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                callback = self._callbacks.get(timeout=remaining) if remaining > 0 else self._callbacks.get_nowait()
+            except queue.Empty:
+                return
+            callback()
+            deadline = 0  # drain the rest without waiting
+
+    def sleep(self, duration):
+        self.process_data_events(time_limit=duration)
+
+    def close(self):
+        # Like the broker, hand unacked deliveries back to their queues
+        for channel in self.channels:
+            for tag in sorted(channel._unacked, reverse=True):
+                _, (name, message) = channel._unacked.pop(tag)
+                with self.broker.lock:
+                    self.broker.queues[name].appendleft(message)
+        self.is_open = False
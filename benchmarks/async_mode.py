@@ -0,0 +1,94 @@
+"""
+Load benchmark for app_service's sync vs async execution modes.
+
+Start two copies of app_service against the same database, one per mode:
+
+    APP_EXECUTION_MODE=sync  uvicorn app:app --port 8000
+    APP_EXECUTION_MODE=async uvicorn app:app --port 8002
+
+then drive both with the same concurrency and compare:
+
+    python benchmarks/async_mode.py --sync-url http://localhost:8000 \
+        --async-url http://localhost:8002 --path /doctors --concurrency 200
+
+Pass --token to exercise authenticated routes such as /patient.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from _stats import percentile
+
+
+async def run_load(base_url, path, total, concurrency, token=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def print_report(label, result):
+    print(
+        f"{label:<6} {result['throughput_rps']:>9.1f} req/s | "
+        f"p50 {result['p50_ms']:>7.1f} ms | p95 {result['p95_ms']:>7.1f} ms | "
+        f"p99 {result['p99_ms']:>7.1f} ms | errors {result['errors']}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-url", help="base URL of an app_service running with APP_EXECUTION_MODE=sync")
+    parser.add_argument("--async-url", help="base URL of an app_service running with APP_EXECUTION_MODE=async")
+    parser.add_argument("--path", default="/doctors")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--token", help="JWT for authenticated routes")
+    args = parser.parse_args()
+
+    results = {}
+    for label, url in (("sync", args.sync_url), ("async", args.async_url)):
+        if url:
+            results[label] = await run_load(url, args.path, args.requests, args.concurrency, args.token)
+            print_report(label, results[label])
+
+    if len(results) == 2:
+        gain = results["async"]["throughput_rps"] / results["sync"]["throughput_rps"]
+        print(f"async/sync throughput: {gain:.2f}x at concurrency {args.concurrency}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Throughput benchmark for app_service/consumer.py's consumer modes, using
+the in-memory broker in amqp_standin.py instead of RabbitMQ.
+
+A burst of user.created events is preloaded into user_created_queue and
+consumer.main() runs until it has acked all of them:
+
+    # handlers replaced by a fixed delay standing in for DB round trips
+    python benchmarks/consumer_throughput.py --messages 2000 --handler-ms 5
+
+    # real handlers against a throwaway database
+    python benchmarks/consumer_throughput.py --db-url postgresql://.../bench --messages 5000
+
+batch mode only makes sense with real handlers; with the simulated delay
+it times one handler call per batch.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from amqp_standin import Broker, StandInConnection
+
+
+def make_events(count, offset):
+    events = []
+    for i in range(count):
+        user_id = offset + i
+        role = "doctor" if i % 5 == 0 else "patient"
+        events.append(json.dumps({
+            "event": "user.created",
+            "user_id": user_id,
+            "email": f"user{user_id}@bench.local",
+            "role": role,
+            "profile": {"name": f"Bench User {user_id}", "specialization": "General", "phone": "555-0100"},
+        }))
+    return events
+
+
+def run_mode(consumer, mode, events, concurrency, prefetch, batch_size):
+    broker = Broker()
+    broker.preload("user_created_queue", events, exchange="users", routing_key="user.created")
+    consumer.connect_to_rabbitmq = lambda *args, **kwargs: StandInConnection(broker)
+    consumer.CONSUMER_BATCH_SIZE = batch_size
+    consumer.CONSUMER_METRICS_PORT = 0
+    consumer.CONSUMER_QUEUES = [
+        q._replace(mode=mode, prefetch=prefetch, concurrency=concurrency) for q in consumer.CONSUMER_QUEUES
+    ]
+
+    started = time.perf_counter()
+    consumer.main()
+    elapsed = time.perf_counter() - started
+    return {"acked": broker.acked, "nacked": broker.nacked, "seconds": elapsed, "rate": len(events) / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--modes", default="serial,worker,batch")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--prefetch", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--handler-ms", type=float, default=5.0,
+                        help="simulated handler latency; ignored when --db-url is given")
+    parser.add_argument("--db-url", help="run the real handlers against this (throwaway) database")
+    args = parser.parse_args()
+
+    os.environ["DB_URL"] = args.db_url or "sqlite:////tmp/consumer_bench.db"
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app_service"))
+    import logging
+    import consumer
+    from database import engine
+    from models import Base
+
+    if args.db_url is None:
+        # Throwaway SQLite file; a --db-url database is expected to be migrated
+        Base.metadata.create_all(bind=engine)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if not args.db_url:
+        def simulated(event_data):
+            time.sleep(args.handler_ms / 1000)
+        consumer.handle_user_created = simulated
+        consumer.handle_user_created_batch = simulated
+    # Redis-backed caches are not part of what is being measured
+    consumer.slot_inventory.sync_doctor = lambda db, doctor_id: None
+    consumer.response_cache.invalidate = lambda: None
+
+    results = {}
+    for round_index, mode in enumerate(m.strip() for m in args.modes.split(",")):
+        events = make_events(args.messages, offset=10_000_000 + round_index * args.messages)
+        results[mode] = run_mode(consumer, mode, events, args.concurrency, args.prefetch, args.batch_size)
+        r = results[mode]
+        print(f"{mode:<8} {r['rate']:>9.1f} msg/s | {r['seconds']:>6.2f}s | acked {r['acked']} | nacked {r['nacked']}")
+
+    if "serial" in results and len(results) > 1:
+        for mode, r in results.items():
+            if mode != "serial":
+                print(f"{mode}/serial throughput: {r['rate'] / results['serial']['rate']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Load suite for the booking, directory, search and auth flows.
+
+Starts app_service and authentication_service as two local uvicorn
+processes against throwaway SQLite databases (or the databases given
+with --app-db-url / --auth-db-url), with fakeredis standing in for Redis
+and amqp_standin.py for RabbitMQ. Each process seeds synthetic doctors,
+patients and users, then every scenario is driven by concurrent HTTP
+clients and reported as throughput, 2xx throughput, the share of 503
+rejections (load shedding) and p50/p95/p99 over all responses:
+
+    pip install -e common fakeredis
+    python benchmarks/load_suite.py
+    python benchmarks/load_suite.py --doctors 2000 --patients 20000 --concurrency 64 \\
+        --scenarios booking,browse,search --app-mode async --inventory redis
+    python benchmarks/load_suite.py --verify-mode remote --query-budget warn --json results.json
+
+Scenarios:
+  booking  every request books one of doctor 1's slots, each client with
+           its own patient token: one 200 per slot, 400 for the rest
+  browse   GET /doctors keyset pages, every 10th request
+           /doctor/specializations
+  search   GET /doctor/search by name, then by specialization
+  login    POST /login for random seeded users (a 503 is retried after
+           its Retry-After) while one client keeps calling /verify-token,
+           reported on its own row next to an idle /verify-token baseline
+
+Database and service logs go to the work directory (--keep keeps it);
+with --query-budget warn, app.log lists every /book that went over its
+round-trip budget (the budget itself is asserted in app_service/tests).
+Postgres databases are seeded only when empty, so give each run a fresh
+one if the booking numbers should be comparable.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import itertools
+import statistics
+import subprocess
+import tempfile
+from collections import Counter
+
+import httpx
+
+from _stats import percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, "..", "app_service")
+AUTH_DIR = os.path.join(HERE, "..", "authentication_service")
+
+SCENARIOS = ["booking", "browse", "search", "login"]
+SECRET_KEY = "load-suite-secret"
+ALGORITHM = "HS256"
+PASSWORD = "load-suite-password"
+LOGIN_MAX_ATTEMPTS = 10
+PROBE_PAUSE = 0.05
+
+SLOT_TIMES = [f"{8 + i // 2:02d}:{(i % 2) * 30:02d}" for i in range(16)]
+SPECIALIZATIONS = [
+    "Cardiology", "Dermatology", "Neurology", "Pediatrics", "Oncology", "Orthopedics",
+    "Psychiatry", "Radiology", "Urology", "Endocrinology", "Gastroenterology", "General",
+]
+FIRST_NAMES = ["Alice", "Bruno", "Chen", "Dana", "Elif", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kemi", "Lars"]
+LAST_NAMES = ["Smith", "Garcia", "Okafor", "Novak", "Tanaka", "Kowalski", "Haddad", "Silva", "Berg", "Moreau"]
+
+
+def doctor_name(i):
+    return f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]} {i}"
+
+
+# Auth user ids: doctors are 1..doctors, patients doctors+1..doctors+patients
+def user_email(user_id, doctors):
+    return f"doctor{user_id}@bench.local" if user_id <= doctors else f"patient{user_id - doctors}@bench.local"
+
+
+# ---------------------------------------------------------------------
+# 🧩 SERVICE PROCESSES
+# ---------------------------------------------------------------------
+def _patch_stand_ins():
+    import fakeredis
+    import pika
+    import redis
+    import redis.asyncio
+    from amqp_standin import Broker, StandInConnection
+
+    server = fakeredis.FakeServer()
+    redis.Redis = lambda *a, **k: fakeredis.FakeRedis(server=server, decode_responses=k.get("decode_responses", False))
+    redis.asyncio.Redis = lambda *a, **k: fakeredis.FakeAsyncRedis(server=server, decode_responses=k.get("decode_responses", False))
+    broker = Broker()
+    pika.BlockingConnection = lambda *a, **k: StandInConnection(broker)
+
+
+def seed_app(doctors, patients):
+    # Schema through the real migrations; in a subprocess so Alembic's
+    # logging setup does not touch this process
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=APP_DIR, check=True)
+
+    from sqlalchemy import insert
+    from database import SessionLocal
+    from models import Doctor, DoctorSlot, Patient
+    import slots
+
+    with SessionLocal() as db:
+        if db.query(Doctor.id).first() is not None:
+            return
+        db.execute(insert(Doctor), [
+            {"id": i, "user_id": i, "name": doctor_name(i), "specialization": SPECIALIZATIONS[i % len(SPECIALIZATIONS)],
+             "available_slots": SLOT_TIMES, "daily_limit": len(SLOT_TIMES), "booked_slots": 0}
+            for i in range(1, doctors + 1)
+        ])
+        db.execute(insert(DoctorSlot), [row for i in range(1, doctors + 1) for row in slots.slot_rows(i, SLOT_TIMES)])
+        db.execute(insert(Patient), [
+            {"id": j, "user_id": doctors + j, "name": f"Patient {j}", "email": user_email(doctors + j, doctors),
+             "phone": "555-0100"}
+            for j in range(1, patients + 1)
+        ])
+        db.commit()
+
+
+def seed_auth(doctors, patients):
+    from sqlalchemy import insert
+    from database import Base, SessionLocal, engine
+    from models import User
+    from auth_utils import hash_password
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.query(User.id).first() is not None:
+            return
+        # One hash for everyone: same cost per login, no minutes of seeding
+        hashed = hash_password(PASSWORD)
+        db.execute(insert(User), [
+            {"id": user_id, "email": user_email(user_id, doctors), "hashed_password": hashed,
+             "role": "doctor" if user_id <= doctors else "patient"}
+            for user_id in range(1, doctors + patients + 1)
+        ])
+        db.commit()
+
+
+def serve(service, port, doctors, patients):
+    """Child process: seeds one service's database and serves it on port."""
+    _patch_stand_ins()
+    service_dir = APP_DIR if service == "app" else AUTH_DIR
+    sys.path.insert(0, os.path.abspath(service_dir))
+    (seed_app if service == "app" else seed_auth)(doctors, patients)
+
+    import uvicorn
+    import app as service_app
+    # log_config=None keeps the service's own logging pipeline
+    uvicorn.run(service_app.app, host="127.0.0.1", port=port, log_config=None, access_log=False)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url, process, log_path, timeout=180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path) as log:
+                sys.exit(f"{url} exited with {process.returncode}:\n{log.read()[-3000:]}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{url} did not come up within {timeout}s (see {log_path})")
+
+
+def start_services(args, workdir):
+    auth_port, app_port = _free_port(), _free_port()
+    base_env = dict(
+        os.environ, SECRET_KEY=SECRET_KEY, ALGORITHM=ALGORITHM, PYTHONUNBUFFERED="1",
+        LOG_MODE=args.log_mode, TRACING_EXPORTER="off",
+    )
+    envs = {
+        "auth": dict(base_env, DATABASE_URL=args.auth_db_url or f"sqlite:///{workdir}/auth.db",
+                     LOG_FILE=f"{workdir}/auth_service.log"),
+        "app": dict(base_env, DB_URL=args.app_db_url or f"sqlite:///{workdir}/app.db", LOG_FILE=f"{workdir}/app.log",
+                    AUTH_VERIFY_MODE=args.verify_mode, AUTH_VERIFY_URL=f"http://127.0.0.1:{auth_port}/verify-token",
+                    APP_EXECUTION_MODE=args.app_mode, SLOT_INVENTORY_MODE=args.inventory),
+    }
+    if args.query_budget:
+        envs["app"]["QUERY_BUDGET_MODE"] = args.query_budget
+
+    processes = []
+    for service, port in (("auth", auth_port), ("app", app_port)):
+        log_path = os.path.join(workdir, f"{service}.out")
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", service, "--port", str(port),
+                 "--doctors", str(args.doctors), "--patients", str(args.patients)],
+                cwd=workdir, env=envs[service], stdout=log, stderr=subprocess.STDOUT,
+            )
+        processes.append(process)
+        _wait_ready(f"http://127.0.0.1:{port}/", process, log_path)
+    return processes, f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{auth_port}"
+
+
+# ---------------------------------------------------------------------
+# 🧩 LOAD DRIVER
+# ---------------------------------------------------------------------
+def summarize(name, latencies, statuses, elapsed):
+    ok = sum(count for status, count in statuses.items() if str(status).startswith("2"))
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        # Requests answered 2xx per second; a shed request is fast but did no work
+        "ok_rps": ok / elapsed if elapsed else 0.0,
+        "rejected_pct": 100 * statuses.get(503, 0) / len(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+async def drive(name, client, total, concurrency, request, stop=None, pause=0):
+    """
+    Sends `total` requests (or, with stop, until stop is set) from
+    `concurrency` clients; request(i) returns the i-th request's coroutine.
+    pause: seconds each client idles between requests (not timed).
+    """
+    latencies, statuses = [], Counter()
+    numbers = itertools.count()
+
+    async def worker():
+        while True:
+            i = next(numbers)
+            if (stop is None and i >= total) or (stop is not None and stop.is_set()):
+                return
+            started = time.perf_counter()
+            try:
+                status = (await request(client, i)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            if pause:
+                await asyncio.sleep(pause)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, statuses, time.perf_counter() - started)
+
+
+def _token(user_id, role):
+    from jose import jwt
+    return jwt.encode({"sub": str(user_id), "role": role, "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def _client(base_url, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+
+
+# ---------------------------------------------------------------------
+# 🧩 SCENARIOS
+# ---------------------------------------------------------------------
+async def booking(args, app_url, auth_url):
+    headers = [
+        {"Authorization": f"Bearer {_token(args.doctors + j, 'patient')}"}
+        for j in range(1, min(args.patients, args.concurrency * 4) + 1)
+    ]
+
+    def request(client, i):
+        params = {"doctor_id": 1, "time": SLOT_TIMES[i % len(SLOT_TIMES)]}
+        return client.post("/book", params=params, headers=headers[i % len(headers)])
+
+    async with _client(app_url, args.concurrency) as client:
+        result = await drive("booking (1 doctor)", client, args.requests, args.concurrency, request)
+    booked = result["statuses"].get("200", 0)
+    result["check"] = f"{booked}/{len(SLOT_TIMES)} slots booked" + (" — DOUBLE BOOKED" if booked > len(SLOT_TIMES) else "")
+    return [result]
+
+
+async def browse(args, app_url, auth_url):
+    rng = random.Random(1)
+
+    def request(client, i):
+        if i % 10 == 9:
+            return client.get("/doctor/specializations")
+        return client.get("/doctors", params={"limit": 50, "after_id": rng.randrange(max(1, args.doctors - 50))})
+
+    async with _client(app_url, args.concurrency) as client:
+        return [await drive("browse", client, args.requests, args.concurrency, request)]
+
+
+async def search(args, app_url, auth_url):
+    def request(client, i):
+        if i % 2:
+            return client.get("/doctor/search", params={"specialization": SPECIALIZATIONS[i % len(SPECIALIZATIONS)]})
+        return client.get("/doctor/search", params={"name": FIRST_NAMES[i % len(FIRST_NAMES)][:3]})
+
+    async with _client(app_url, args.concurrency) as client:
+        return [await drive("search", client, args.requests, args.concurrency, request)]
+
+
+async def login(args, app_url, auth_url):
+    rng = random.Random(2)
+    users = args.doctors + args.patients
+    probe_headers = {"Authorization": f"Bearer {_token(args.doctors + 1, 'patient')}"}
+
+    def verify(client, i):
+        return client.get("/verify-token", headers=probe_headers)
+
+    attempts = Counter()
+
+    async def log_in(client, i):
+        # Like a real client: a 503 is retried after its Retry-After, so
+        # latency is end to end and shedding shows up as retries
+        user_id = rng.randint(1, users)
+        for attempt in range(LOGIN_MAX_ATTEMPTS):
+            response = await client.post("/login", json={"email": user_email(user_id, args.doctors), "password": PASSWORD})
+            attempts[response.status_code] += 1
+            if response.status_code != 503 or attempt == LOGIN_MAX_ATTEMPTS - 1:
+                return response
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+    async with _client(auth_url, args.concurrency + 1) as client:
+        # The probe is paced, so on a small machine it doesn't take CPU from
+        # the logins in proportion to how fast it is answered
+        idle = await drive("verify-token (idle)", client, args.login_requests, 1, verify, pause=PROBE_PAUSE)
+        stop = asyncio.Event()
+
+        async def storm():
+            try:
+                return await drive("login storm", client, args.login_requests, args.concurrency, log_in)
+            finally:
+                stop.set()
+
+        storm_result, probe = await asyncio.gather(
+            storm(), drive("verify-token under login", client, 0, 1, verify, stop=stop, pause=PROBE_PAUSE),
+        )
+    total = sum(attempts.values())
+    storm_result["rejected_pct"] = 100 * attempts[503] / total if total else 0.0
+    storm_result["check"] = f"{attempts[503]} of {total} /login attempts answered 503 and retried after Retry-After"
+    return [idle, storm_result, probe]
+
+
+# ---------------------------------------------------------------------
+# 🧩 REPORT
+# ---------------------------------------------------------------------
+def print_report(results):
+    print(f"\n{'scenario':<26} {'requests':>8} {'req/s':>9} {'2xx/s':>9} {'503 %':>6} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for result in results:
+        statuses = " ".join(f"{status}:{count}" for status, count in result["statuses"].items())
+        print(f"{result['scenario']:<26} {result['requests']:>8} {result['throughput_rps']:>9.1f} "
+              f"{result['ok_rps']:>9.1f} {result['rejected_pct']:>6.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}  {statuses}")
+        if result.get("check"):
+            print(f"{'':<26} {result['check']}")
+
+
+async def run(args, app_url, auth_url):
+    results = []
+    for name in args.scenarios.split(","):
+        results.extend(await globals()[name](args, app_url, auth_url))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per booking/browse/search scenario")
+    parser.add_argument("--login-requests", type=int, default=200, help="logins in the storm (each one is a bcrypt verify)")
+    parser.add_argument("--app-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--verify-mode", choices=["local", "remote"], default="local")
+    parser.add_argument("--inventory", choices=["db", "redis"], default="db", help="SLOT_INVENTORY_MODE")
+    parser.add_argument("--query-budget", choices=["off", "warn"], help="QUERY_BUDGET_MODE for app_service")
+    parser.add_argument("--log-mode", choices=["queue", "sync", "off"], default="queue")
+    parser.add_argument("--app-db-url", help="app_service database (default: SQLite in the work directory)")
+    parser.add_argument("--auth-db-url", help="authentication_service database (default: SQLite)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory (databases and logs)")
+    parser.add_argument("--serve", choices=["app", "auth"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.doctors, args.patients)
+        return
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="load_suite_")
+    print(f"⏳ Seeding {args.doctors} doctors / {args.patients} patients and starting services in {workdir}")
+    processes, app_url, auth_url = start_services(args, workdir)
+    try:
+        results = asyncio.run(run(args, app_url, auth_url))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(f"app_mode={args.app_mode} verify_mode={args.verify_mode} inventory={args.inventory} "
+          f"concurrency={args.concurrency}")
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("serve", "port")},
+                       "results": results}, out, indent=2)
+    if args.keep:
+        print(f"\nWork directory kept: {workdir}")
+    else:
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
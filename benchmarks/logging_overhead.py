@@ -0,0 +1,113 @@
+"""
+/book latency with each logging pipeline (common/mediqueue_common/logging_setup.py).
+
+Every configuration runs in its own process, since logging is set up at
+import time. Each one loads app_service in-process against a throwaway
+SQLite database (Redis replaced by fakeredis), seeds doctors with open
+slots and one patient, then books them one by one through the ASGI app:
+
+    pip install fakeredis
+    python benchmarks/logging_overhead.py --bookings 2000
+
+Console output from the app goes to /dev/null; the log file goes to a
+temporary directory, so both handler writes are still paid for.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _stats import percentile
+
+CONFIGS = [
+    ("off", {"LOG_MODE": "off"}),
+    ("sync text", {"LOG_MODE": "sync", "LOG_FORMAT": "text"}),
+    ("queue text", {"LOG_MODE": "queue", "LOG_FORMAT": "text"}),
+    ("queue json", {"LOG_MODE": "queue", "LOG_FORMAT": "json"}),
+    ("queue json 10%", {"LOG_MODE": "queue", "LOG_FORMAT": "json", "LOG_INFO_SAMPLE_RATE": "0.1"}),
+]
+
+SLOTS_PER_DOCTOR = 20
+
+
+def child(bookings, workdir):
+    import fakeredis
+    import redis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+    redis.Redis = lambda *a, **k: fakeredis.FakeRedis(server=server, decode_responses=k.get("decode_responses", False))
+    redis.asyncio.Redis = lambda *a, **k: fakeredis.FakeAsyncRedis(server=server, decode_responses=k.get("decode_responses", False))
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app_service"))
+    os.chdir(workdir)
+    from database import SessionLocal, engine
+    from models import Base, Doctor, Patient
+    import slots
+
+    Base.metadata.create_all(bind=engine)
+    times = [f"{8 + i // 4:02d}:{(i % 4) * 15:02d}" for i in range(SLOTS_PER_DOCTOR)]
+    doctors = -(-bookings // SLOTS_PER_DOCTOR)
+    with SessionLocal() as db:
+        for i in range(doctors):
+            doctor = Doctor(user_id=1000 + i, name=f"Doctor {i}", specialization="General",
+                            available_slots=times, daily_limit=len(times), booked_slots=0)
+            db.add(doctor)
+            db.flush()
+            slots.open_slots(db, doctor.id, times)
+        db.add(Patient(user_id=1, name="Bench Patient", email="bench@example.com", phone="555-0100"))
+        db.commit()
+
+    from fastapi.testclient import TestClient
+    from jose import jwt
+    import app as app_module
+    from auth_utils import SECRET_KEY, ALGORITHM
+
+    token = jwt.encode({"sub": "1", "role": "patient", "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    with TestClient(app_module.app) as client:
+        for n in range(bookings):
+            params = {"doctor_id": n // SLOTS_PER_DOCTOR + 1, "time": times[n % SLOTS_PER_DOCTOR]}
+            started = time.perf_counter()
+            response = client.post("/book", params=params, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.text
+    with open(os.path.join(workdir, "latencies.json"), "w") as out:
+        json.dump(latencies, out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.bookings, os.getcwd())
+        return
+
+    print(f"{'logging':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    baseline = None
+    for label, env in CONFIGS:
+        with tempfile.TemporaryDirectory() as workdir:
+            child_env = dict(os.environ, DB_URL=f"sqlite:///{workdir}/bench.db", LOG_FILE=f"{workdir}/app.log",
+                             AUTH_VERIFY_MODE="local", QUERY_BUDGET_MODE="off", **env)
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--bookings", str(args.bookings)],
+                cwd=workdir, env=child_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+            )
+            with open(os.path.join(workdir, "latencies.json")) as results:
+                latencies = json.load(results)
+        p50 = percentile(latencies, 50)
+        baseline = baseline or p50
+        print(f"{label:<16} {p50:>8.3f} {percentile(latencies, 95):>8.3f} {percentile(latencies, 99):>8.3f} "
+              f"{statistics.mean(latencies):>8.3f}  ({p50 / baseline:.2f}x p50 of off)")
+
+
+if __name__ == "__main__":
+    main()
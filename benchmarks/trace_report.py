@@ -0,0 +1,107 @@
+"""
+Summarise spans written with TRACING_EXPORTER=file (or console output
+saved to a file) and show the slowest traces end to end.
+
+    python trace_report.py traces.jsonl
+    python trace_report.py app_traces.jsonl auth_traces.jsonl consumer_traces.jsonl --slowest 5
+    python trace_report.py traces.jsonl --root "POST /book"
+
+Files from several services can be passed together; spans are grouped
+by trace id. The summary gives p50/p95/p99 per span name; each of the
+slowest traces (by the duration of its root span) is printed as a tree
+with every span's start offset and duration, so the hop that made an
+outlier slow stands out.
+"""
+import json
+import argparse
+from collections import defaultdict
+from datetime import datetime
+
+from _stats import percentile
+
+
+def _time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def load(paths):
+    spans = []
+    for path in paths:
+        with open(path) as lines:
+            for line in lines:
+                line = line.strip()
+                if not line.startswith("{"):
+                    continue
+                raw = json.loads(line)
+                start = _time(raw["start_time"])
+                spans.append({
+                    "trace_id": raw["context"]["trace_id"],
+                    "span_id": raw["context"]["span_id"],
+                    "parent_id": raw.get("parent_id"),
+                    "name": raw["name"],
+                    "service": raw.get("resource", {}).get("attributes", {}).get("service.name", "?"),
+                    "start": start,
+                    "duration_ms": (_time(raw["end_time"]) - start) * 1000,
+                    "error": raw.get("status", {}).get("status_code") == "ERROR",
+                })
+    return spans
+
+
+def summary(spans):
+    by_name = defaultdict(list)
+    for span in spans:
+        by_name[(span["service"], span["name"])].append(span["duration_ms"])
+    print(f"{'service':<14} {'span':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for (service, name), durations in sorted(by_name.items(), key=lambda item: -percentile(item[1], 99)):
+        print(f"{service:<14} {name[:40]:<40} {len(durations):>7} {percentile(durations, 50):>9.2f} "
+              f"{percentile(durations, 95):>9.2f} {percentile(durations, 99):>9.2f}")
+
+
+def _print_tree(span, children, origin, depth=0):
+    marker = " ❌" if span["error"] else ""
+    print(f"  {'  ' * depth}{span['name']} [{span['service']}] "
+          f"+{(span['start'] - origin) * 1000:.1f}ms {span['duration_ms']:.2f}ms{marker}")
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start"]):
+        _print_tree(child, children, origin, depth + 1)
+
+
+def slowest(spans, count, root_name=None):
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+
+    roots = []
+    for trace_spans in traces.values():
+        ids = {span["span_id"] for span in trace_spans}
+        # Spans whose parent is not in the files (or who have none) are roots
+        for span in trace_spans:
+            if span["parent_id"] not in ids and (root_name is None or span["name"] == root_name):
+                roots.append((span, trace_spans))
+
+    for root, trace_spans in sorted(roots, key=lambda item: -item[0]["duration_ms"])[:count]:
+        children = defaultdict(list)
+        for span in trace_spans:
+            children[span["parent_id"]].append(span)
+        end = max(span["start"] + span["duration_ms"] / 1000 for span in trace_spans)
+        print(f"\ntrace {root['trace_id']} | root {root['duration_ms']:.2f}ms | "
+              f"end to end {(end - root['start']) * 1000:.2f}ms | {len(trace_spans)} spans")
+        _print_tree(root, children, root["start"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--slowest", type=int, default=10, help="number of slowest traces to print")
+    parser.add_argument("--root", help="only traces whose root span has this name, e.g. 'POST /book'")
+    args = parser.parse_args()
+
+    spans = load(args.files)
+    if not spans:
+        print("No spans found")
+        return
+    summary(spans)
+    slowest(spans, args.slowest, args.root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Code shared by app_service and authentication_service. Installed into
+both images (see their Dockerfiles); for local runs:
+
+    pip install -e common
+
+db_pool: SQLAlchemy pool settings, timed pools and pool_stats()
+event_publisher: long-lived RabbitMQ publisher
+logging_setup: queue-backed logging and the request-id access middleware
+metrics: HTTP request metrics, their middleware and the /metrics response
+tracing: OpenTelemetry setup, spans and trace-context propagation
+"""
@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# ---------------------------------------------------------------------
+# 🧩 CONNECTION POOL
+# ---------------------------------------------------------------------
+# Each pod holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections per
+# engine (app_service: the sync engine, in async mode the async one, and
+# one per read replica), so replicas * that must stay under Postgres
+# max_connections.
+# DB_PGBOUNCER=true hands pooling to PgBouncer (transaction mode): no
+# client-side pool and no server-side prepared statements.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class PoolWaitStats:
+    """Checkout counts and time spent waiting for a free connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def record(self, wait_ms, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_ms_total, 3),
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+            }
+
+
+class _TimedPoolMixin:
+    """Times QueuePool._do_get, i.e. how long a request blocked on the pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.wait_stats.record((time.perf_counter() - started) * 1000)
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine kwargs for the pool settings above."""
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    if DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+        if is_async and url.startswith("postgresql"):
+            # asyncpg prepares statements per connection, which PgBouncer's
+            # transaction mode cannot route back to the same backend
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def build_engine(url: str, **kwargs):
+    return create_engine(url, **engine_options(url), **kwargs)
+
+
+def pool_stats(engine) -> dict:
+    """Occupancy and wait-time numbers for an engine's pool."""
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__, "pgbouncer": DB_PGBOUNCER}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "timeout_seconds": pool.timeout(),
+        })
+    if getattr(pool, "wait_stats", None) is not None:
+        stats.update(pool.wait_stats.snapshot())
+    return stats
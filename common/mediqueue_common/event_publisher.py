@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+import pika
+
+# ---------------------------------------------------------------------
+# 🧩 SHARED RABBITMQ PUBLISHER
+# ---------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
+PUBLISHER_POOL_SIZE = int(os.getenv("PUBLISHER_POOL_SIZE", 2))
+PUBLISHER_BATCH_SIZE = int(os.getenv("PUBLISHER_BATCH_SIZE", 1))
+PUBLISHER_LINGER_MS = float(os.getenv("PUBLISHER_LINGER_MS", 0))
+PUBLISHER_MAX_QUEUE = int(os.getenv("PUBLISHER_MAX_QUEUE", 10000))
+PUBLISHER_MAX_RETRIES = int(os.getenv("PUBLISHER_MAX_RETRIES", 5))
+
+_Outgoing = namedtuple("_Outgoing", "exchange routing_key body properties future")
+
+
+class PublisherQueueFull(Exception):
+    pass
+
+
+class EventPublisher:
+    """
+    Long-lived RabbitMQ publisher shared by every request.
+
+    publish() only enqueues the event and returns a Future, so the request
+    path never waits on the broker. A pool of I/O threads, each owning one
+    BlockingConnection and channel, delivers the events:
+
+    - batch_size == 1: every message is sent with publisher confirms;
+    - batch_size  > 1: up to batch_size messages (waiting at most linger_ms
+      for the batch to fill) are sent in one AMQP transaction, so a whole
+      batch costs a single broker round trip.
+
+    Broken connections are reopened with exponential backoff and the batch
+    is retried up to max_retries times before its futures fail.
+    """
+
+    def __init__(self, host=RABBITMQ_HOST, pool_size=PUBLISHER_POOL_SIZE, batch_size=PUBLISHER_BATCH_SIZE,
+                 linger_ms=PUBLISHER_LINGER_MS, max_queue=PUBLISHER_MAX_QUEUE, max_retries=PUBLISHER_MAX_RETRIES):
+        self.host = host
+        self.pool_size = max(1, pool_size)
+        self.batch_size = max(1, batch_size)
+        self.linger = linger_ms / 1000
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._exchanges = {}
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._closing = threading.Event()
+
+    def declare_exchange(self, exchange, exchange_type="topic"):
+        """Register an exchange to be declared on every (re)connect."""
+        self._exchanges[exchange] = exchange_type
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self._closing.clear()
+            for index in range(self.pool_size):
+                thread = threading.Thread(target=self._run, args=(index,), name=f"event-publisher-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"✅ Event publisher started | pool_size={self.pool_size} batch_size={self.batch_size}")
+
+    def close(self, timeout=5.0):
+        """Flush what is queued (up to timeout) and stop the I/O threads."""
+        self._closing.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def publish(self, exchange, routing_key, message, headers=None):
+        if not self._threads:
+            self.start()
+        future = Future()
+        properties = pika.BasicProperties(
+            delivery_mode=2,
+            content_type="application/json",
+            headers=headers,
+        )
+        try:
+            self._queue.put_nowait(_Outgoing(exchange, routing_key, json.dumps(message), properties, future))
+        except queue.Full:
+            raise PublisherQueueFull("Event publisher queue is full")
+        return future
+
+    # -----------------------------------------------------------------
+    # I/O threads
+    # -----------------------------------------------------------------
+    def _connect(self):
+        connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.host, heartbeat=30))
+        channel = connection.channel()
+        for exchange, exchange_type in self._exchanges.items():
+            channel.exchange_declare(exchange=exchange, exchange_type=exchange_type, durable=True)
+        if self.batch_size > 1:
+            channel.tx_select()
+        else:
+            channel.confirm_delivery()
+        return connection, channel
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, channel, batch):
+        for item in batch:
+            channel.basic_publish(
+                exchange=item.exchange,
+                routing_key=item.routing_key,
+                body=item.body,
+                properties=item.properties,
+            )
+        if self.batch_size > 1:
+            channel.tx_commit()
+
+    def _run(self, index):
+        connection = channel = None
+        while not (self._closing.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                # Idle: let pika service heartbeats on the open connection
+                if connection is not None and connection.is_open:
+                    try:
+                        connection.process_data_events(time_limit=0)
+                    except Exception:
+                        connection = channel = None
+                continue
+
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    if channel is None or channel.is_closed:
+                        connection, channel = self._connect()
+                    self._deliver(channel, batch)
+                    for item in batch:
+                        item.future.set_result(True)
+                    break
+                except Exception as e:
+                    logger.warning(f"❌ Publish failed (try {attempt}/{self.max_retries}): {e}")
+                    try:
+                        if connection is not None and connection.is_open:
+                            connection.close()
+                    except Exception:
+                        pass
+                    connection = channel = None
+                    time.sleep(min(0.1 * 2 ** attempt, 5))
+            else:
+                logger.error(f"🚨 Dropping {len(batch)} event(s) after {self.max_retries} failed publish attempts")
+                for item in batch:
+                    item.future.set_exception(RuntimeError("RabbitMQ publish failed"))
+
+        if connection is not None and connection.is_open:
+            connection.close()
+
+
+publisher = EventPublisher()
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# ---------------------------------------------------------------------
+# 🧩 LOGGING PIPELINE
+# ---------------------------------------------------------------------
+# LOG_MODE=queue (default): loggers only put records on an in-memory
+#   queue (QueueHandler); a QueueListener thread formats them and does
+#   the file/console writes, so request threads never block on I/O.
+# LOG_MODE=sync: the old behaviour, handlers write on the calling thread.
+# LOG_MODE=off: records are dropped (benchmarks only).
+#
+# LOG_FORMAT=text keeps the "time | LEVEL | message" lines; json writes
+# one JSON object per line, tagged with the service and request id.
+# LOG_INFO_SAMPLE_RATE < 1 keeps only that share of the INFO records
+# logged while a request is being served; warnings and errors, the
+# per-request access line and everything outside requests are kept.
+
+LOG_MODE = os.getenv("LOG_MODE", "queue").lower()            # queue | sync | off
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()         # text | json
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", 1.0))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+request_id_var = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "always_log", "sampled",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the current request id and samples in-request INFO records."""
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        # In sync mode every handler runs this; decide once per record
+        sampled = getattr(record, "sampled", None)
+        if sampled is not None:
+            return sampled
+        request_id = request_id_var.get()
+        record.request_id = request_id
+        record.sampled = not (
+            request_id is not None
+            and self.sample_rate < 1.0
+            and record.levelno == logging.INFO
+            and not getattr(record, "always_log", False)
+            and random.random() >= self.sample_rate
+        )
+        return record.sampled
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the queue is full the record is dropped and counted."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_configured = None
+_listener = None
+
+
+def configure(service: str, log_file: str = None):
+    """Installs the root handlers for a service process (idempotent)."""
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = service
+    root = logging.getLogger()
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    if LOG_MODE == "off":
+        logging.disable(logging.CRITICAL)
+        return
+
+    formatter = JsonFormatter(service) if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    outputs = [logging.StreamHandler(sys.stdout)]
+    log_file = os.getenv("LOG_FILE", log_file)
+    if log_file:
+        outputs.append(logging.FileHandler(log_file))
+    for handler in outputs:
+        handler.setFormatter(formatter)
+
+    context_filter = RequestContextFilter(LOG_INFO_SAMPLE_RATE)
+    if LOG_MODE == "sync":
+        for handler in outputs:
+            handler.addFilter(context_filter)
+            root.addHandler(handler)
+        return
+
+    # The filter runs on the calling thread, where the request context
+    # is visible and before a sampled-out record costs anything more
+    queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(context_filter)
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *outputs, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Flushes queued records; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ---------------------------------------------------------------------
+# 🧩 REQUEST LOGGING MIDDLEWARE
+# ---------------------------------------------------------------------
+class RequestLogMiddleware:
+    """
+    Pure ASGI middleware: gives each request an id (X-Request-ID if the
+    caller sent one), exposes it to every record logged while serving the
+    request, echoes it back as a response header, and writes one
+    structured access record per request.
+    """
+
+    def __init__(self, app, logger_name="access"):
+        self.app = app
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.logger.info(
+                f"{scope['method']} {scope['path']} {status} {duration_ms}ms",
+                extra={
+                    "always_log": True,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": duration_ms,
+                },
+            )
+            request_id_var.reset(token)
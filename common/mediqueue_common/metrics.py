@@ -0,0 +1,53 @@
+import time
+from prometheus_client import Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from fastapi import Response
+
+# ---------------------------------------------------------------------
+# 🧩 SHARED PROMETHEUS METRICS
+# ---------------------------------------------------------------------
+# HTTP request metrics and the /metrics response used by both APIs. Each
+# service keeps its own metrics in its metrics.py, built on
+# LATENCY_BUCKETS. Route labels use the route template (/doctor/{id},
+# not /doctor/42) so label cardinality stays bounded.
+
+# Sub-millisecond buckets for in-process stages, up to 10s for slow requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served")
+
+
+def metrics_response():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware observing HTTP_REQUEST_DURATION for every request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            # Set by the router once a route matched
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
@@ -0,0 +1,171 @@
+import os
+import logging
+from contextlib import contextmanager
+from opentelemetry import trace, propagate
+from opentelemetry.trace import Link, SpanKind, Status, StatusCode
+from mediqueue_common import logging_setup
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------
+# 🧩 TRACING (OpenTelemetry)
+# ---------------------------------------------------------------------
+# A booking goes app_service -> auth /verify-token -> Redis -> Postgres
+# -> outbox -> RabbitMQ -> consumer. Each hop opens a span and hands the
+# W3C trace context (traceparent header) to the next one: HTTP headers on
+# the auth call, the outbox row's headers column and the AMQP message
+# headers, so every span of one booking shares a trace id.
+#
+# TRACING_EXPORTER=off (default): nothing is recorded, but an incoming
+#   traceparent is still passed on, so upstream traces stay connected.
+# TRACING_EXPORTER=console|file: one JSON span per line on stdout or
+#   appended to TRACING_FILE (trace_report.py summarises the file).
+# TRACING_EXPORTER=otlp: OTLP/HTTP to the collector at
+#   OTEL_EXPORTER_OTLP_ENDPOINT.
+# TRACING_SAMPLE_RATIO: share of new traces recorded; a caller's sampling
+#   decision is always followed.
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "off").lower()     # off | console | file | otlp
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", 1.0))
+
+tracer = trace.get_tracer("mediqueue")
+
+_configured = None
+
+
+def _exporter():
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    def one_line(span):
+        return span.to_json(indent=None) + os.linesep
+
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter(formatter=one_line)
+    if TRACING_EXPORTER == "file":
+        return ConsoleSpanExporter(out=open(TRACING_FILE, "a", buffering=1), formatter=one_line)
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER={TRACING_EXPORTER!r}")
+
+
+def configure(service: str):
+    """Installs the tracer provider for a service process (idempotent)."""
+    global _configured
+    if _configured or TRACING_EXPORTER == "off":
+        return
+    _configured = service
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+    )
+    # Spans are exported from a background thread, in batches
+    provider.add_span_processor(BatchSpanProcessor(_exporter()))
+    trace.set_tracer_provider(provider)
+    logger.info(f"🔭 Tracing enabled | exporter={TRACING_EXPORTER}, sample_ratio={TRACING_SAMPLE_RATIO}")
+
+
+# ---------------------------------------------------------------------
+# 🧩 SPANS AND CONTEXT PROPAGATION
+# ---------------------------------------------------------------------
+@contextmanager
+def span(name, kind=SpanKind.INTERNAL, parent=None, links=None, **attributes):
+    """
+    Runs the block in a span, child of the current span or of `parent`
+    (a context returned by extract()). Exceptions are recorded on it.
+    """
+    with tracer.start_as_current_span(name, context=parent, kind=kind, links=links, attributes=attributes) as current:
+        yield current
+
+
+def start_span(name, kind=SpanKind.INTERNAL, parent=None, **attributes):
+    """Starts a span without making it current; the caller must end() it."""
+    return tracer.start_span(name, context=parent, kind=kind, attributes=attributes)
+
+
+def fail(current, error):
+    """Marks a span started with start_span() as failed."""
+    current.record_exception(error)
+    current.set_status(Status(StatusCode.ERROR, str(error)))
+
+
+def inject(headers=None, current=None):
+    """
+    Returns a copy of headers with the trace context of `current` (default:
+    the active span) added, for HTTP requests, outbox rows and AMQP messages.
+    """
+    headers = dict(headers or {})
+    context = trace.set_span_in_context(current) if current is not None else None
+    propagate.inject(headers, context=context)
+    return headers
+
+
+def extract(headers):
+    """Trace context carried by HTTP or AMQP headers (empty if there is none)."""
+    return propagate.extract(headers or {})
+
+
+def link_to(headers):
+    """A Link to the span that sent these headers, or None (batch consumers)."""
+    span_context = trace.get_current_span(extract(headers)).get_span_context()
+    return Link(span_context) if span_context.is_valid else None
+
+
+# ---------------------------------------------------------------------
+# 🧩 TRACING MIDDLEWARE
+# ---------------------------------------------------------------------
+class TracingMiddleware:
+    """
+    Pure ASGI middleware: one SERVER span per request, continuing the
+    caller's trace when it sent a traceparent header. The span carries
+    the request id from RequestLogMiddleware (which must wrap this one),
+    so traces and log lines can be joined. FastAPI releases with built-in
+    telemetry open the server span themselves; then only the request id
+    is added to theirs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = logging_setup.request_id_var.get()
+        outer = trace.get_current_span()
+        if outer.is_recording():
+            if request_id:
+                outer.set_attribute("request.id", request_id)
+            return await self.app(scope, receive, send)
+
+        carrier = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        with span(f"{method} {scope['path']}", kind=SpanKind.SERVER, parent=extract(carrier),
+                  **{"http.request.method": method, "url.path": scope["path"]}) as current:
+            if request_id:
+                current.set_attribute("request.id", request_id)
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Set by the router once a route matched
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    current.update_name(f"{method} {route}")
+                    current.set_attribute("http.route", route)
+                current.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    current.set_status(Status(StatusCode.ERROR))